@@ -0,0 +1,181 @@
+"""End-to-end campaign throughput against the local SMTP sink.
+
+Generates synthetic contact sheets, runs the full CampaignEngine pipeline
+(streamed contact loading, templating, SMTP delivery, failure report) and
+reports messages/sec, p50/p99 per-message send latency and peak RSS. Each
+size runs in its own process so peak RSS is per run.
+
+Usage: python benchmarks/bench_campaign.py [--rows 1000 10000 100000] [--tls ssl]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir))
+sys.path.insert(0, BENCH_DIR)
+
+import pandas as pd  # noqa: E402
+
+from execute import CampaignEngine  # noqa: E402
+from smtp_sink import SMTPSink  # noqa: E402
+
+DEFAULT_TEMPLATE = os.path.join(BENCH_DIR, os.pardir, 'templates', 'GEN.html')
+USERNAME = 'bench@example.com'
+PASSWORD = 'bench-password'
+
+
+def write_contacts(path, rows, invalid_rate=0.01):
+    """Synthetic contact sheet with a sprinkling of invalid addresses"""
+    emails = [f'contact{i}@example.com' for i in range(rows)]
+    for i in range(0, rows, max(1, int(1 / invalid_rate)) if invalid_rate else rows + 1):
+        emails[i] = f'not-an-email-{i}'
+    df = pd.DataFrame({
+        'Email Contacto': emails,
+        'Nombre Contacto': [f'Contacto {i}' for i in range(rows)],
+        'Nombre Empresa': [f'Empresa {i % 997} S.A.' for i in range(rows)],
+    })
+    if path.endswith('.csv'):
+        df.to_csv(path, index=False)
+    elif path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class TimedCampaignEngine(CampaignEngine):
+    """Records how long each SMTP delivery takes"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def _send_job(self, session, job):
+        start = time.perf_counter()
+        try:
+            return super()._send_job(session, job)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def run_once(args):
+    """Run one campaign (in this process) against a sink at args.port and print JSON stats"""
+    workdir = args.workdir
+    config = {
+        'excel_file': args.contacts,
+        'html_template': args.template,
+        'sender_email': USERNAME,
+        'sender_name': 'Benchmark',
+        'password': PASSWORD,
+        'subject': 'Propuesta para {{Nombre Empresa}}',
+        'smtp_server': '127.0.0.1',
+        'smtp_port': args.port,
+        'smtp_security': args.tls,
+        'smtp_ca_file': args.ca_file,
+        'connections': args.connections,
+        'rate_limits': {'per_minute': None, 'per_hour': None, 'per_day': None},
+        # Short pauses, so injected 451s exercise the backoff without stalling the run
+        'throttle_backoff': 0.5,
+        'throttle_backoff_max': 2,
+        'check_domains': False,  # The synthetic contacts' domain has no real mail server
+        'failure_log': os.path.join(workdir, f'failed_{args.rows}.csv'),
+        'failure_report': os.path.join(workdir, f'failed_{args.rows}.xlsx'),
+        'journal_file': os.path.join(workdir, f'journal_{args.rows}.db'),
+        'suppression_file': os.path.join(workdir, f'suppression_{args.rows}.db'),
+        'metrics_file': os.path.join(workdir, f'metrics_{args.rows}.json'),
+    }
+    engine = TimedCampaignEngine(config, on_event=lambda event, data: None)
+    start = time.perf_counter()
+    summary = engine.run()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(engine.latencies)
+    print(json.dumps({
+        'rows': args.rows,
+        'sent': summary['sent'],
+        'failed': summary['failed'],
+        'seconds': elapsed,
+        'msgs_per_sec': summary['sent'] / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': engine.metrics.summary()['stages'],
+    }))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--format', choices=('csv', 'xlsx', 'parquet'), default='csv')
+    parser.add_argument('--template', default=DEFAULT_TEMPLATE)
+    parser.add_argument('--connections', type=int, default=3)
+    parser.add_argument('--tls', choices=('none', 'ssl', 'starttls'), default='none')
+    parser.add_argument('--latency', type=float, default=0.0, help="Sink seconds added to every reply")
+    parser.add_argument('--data-latency', type=float, default=0.0, help="Sink seconds added to the DATA reply")
+    parser.add_argument('--temp-fail-rate', type=float, default=0.0)
+    parser.add_argument('--perm-fail-rate', type=float, default=0.0)
+    parser.add_argument('--json', action='store_true', help="Print one JSON object per run")
+    parser.add_argument('--stages', action='store_true', help="Also print the per-stage timing breakdown")
+    # Internal: a single run in a child process
+    parser.add_argument('--run-once', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--contacts', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--ca-file', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_once:
+        args.rows = args.rows[0]
+        run_once(args)
+        return
+
+    sink = SMTPSink(tls=args.tls, users={USERNAME: PASSWORD}, latency=args.latency,
+                    data_latency=args.data_latency, temp_fail_rate=args.temp_fail_rate,
+                    perm_fail_rate=args.perm_fail_rate)
+    with sink, tempfile.TemporaryDirectory(prefix='bench-campaign-') as workdir:
+        if not args.json:
+            print(f"{'rows':>8} {'sent':>8} {'failed':>7} {'seconds':>8} {'msgs/s':>8} "
+                  f"{'p50 ms':>7} {'p99 ms':>7} {'RSS MB':>7}")
+        for rows in args.rows:
+            contacts = os.path.join(workdir, f'contacts_{rows}.{args.format}')
+            write_contacts(contacts, rows)
+            command = [sys.executable, os.path.abspath(__file__), '--run-once',
+                       '--rows', str(rows), '--contacts', contacts, '--template', args.template,
+                       '--port', str(sink.port), '--tls', args.tls,
+                       '--connections', str(args.connections), '--workdir', workdir]
+            if sink.cert_file:
+                command += ['--ca-file', sink.cert_file]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(f"{result['rows']:>8} {result['sent']:>8} {result['failed']:>7} "
+                      f"{result['seconds']:>8.2f} {result['msgs_per_sec']:>8.1f} "
+                      f"{result['p50_ms']:>7.2f} {result['p99_ms']:>7.2f} {result['peak_rss_mb']:>7.1f}")
+                if args.stages:
+                    for stage, timing in result['stages'].items():
+                        print(f"{'':>8} {stage:<10} {timing['count']:>8} x {timing['mean'] * 1000:8.3f} ms "
+                              f"(p99 {timing['p99'] * 1000:.3f} ms, {timing['sum']:.2f}s total)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Contact sheet load time: parsing the Excel file vs the contact cache.
+
+Usage: python benchmarks/bench_contact_load.py [--rows 1000 10000 100000] [--format xlsx]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_campaign import write_contacts  # noqa: E402
+from execute import iter_contact_chunks  # noqa: E402
+
+
+def load(path, cache_dir):
+    start = time.perf_counter()
+    rows = sum(len(chunk) for chunk in iter_contact_chunks(path, cache_dir=cache_dir))
+    return rows, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--format', choices=('xlsx', 'xls'), default='xlsx')
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>8} {'parse s':>9} {'first load s':>13} {'cached s':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory(prefix='bench-contacts-') as workdir:
+        for rows in args.rows:
+            path = os.path.join(workdir, f'contacts_{rows}.{args.format}')
+            write_contacts(path, rows)
+            cache_dir = os.path.join(workdir, f'cache_{rows}')
+            _, parse = load(path, None)
+            _, first = load(path, cache_dir)
+            _, cached = load(path, cache_dir)
+            print(f"{rows:>8} {parse:>9.3f} {first:>13.3f} {cached:>9.4f} {parse / cached:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
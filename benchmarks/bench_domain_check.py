@@ -0,0 +1,66 @@
+"""Recipient domain check: serial vs concurrent lookups vs the domain cache.
+
+Looks up the domains of a synthetic contact list against the local DNS
+stub, where a share of the domains are typos with no records, and checks
+that exactly those contacts are dropped.
+
+Usage: python benchmarks/bench_domain_check.py [--domains 200] [--contacts 20000] [--latency 0.02]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir))
+sys.path.insert(0, BENCH_DIR)
+
+from dns_stub import DNSStub, mx_domain  # noqa: E402
+from execute import DNSResolver, DomainChecker  # noqa: E402
+
+
+def run(contacts, resolver, cache_file, workers):
+    checker = DomainChecker(cache_file, resolver=resolver.lookup, workers=workers)
+    start = time.perf_counter()
+    kept = sum(1 for _ in checker.filter(contacts))
+    checker.save()
+    return kept, checker, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--domains', type=int, default=200)
+    parser.add_argument('--contacts', type=int, default=20000)
+    parser.add_argument('--typo-rate', type=float, default=0.1, help="Share of domains with no DNS records")
+    parser.add_argument('--latency', type=float, default=0.02, help="DNS stub seconds per answer")
+    parser.add_argument('--workers', type=int, default=32)
+    args = parser.parse_args(argv)
+
+    domains = [f'company{i}.example' for i in range(args.domains)]
+    typos = set(domains[::max(1, round(1 / args.typo_rate))] if args.typo_rate else [])
+    zones = {domain: mx_domain(domain) for domain in domains if domain not in typos}
+    contacts = [{'Email Contacto': f'contact{i}@{domains[i % len(domains)]}'} for i in range(args.contacts)]
+    expected = sum(1 for contact in contacts if contact['Email Contacto'].rpartition('@')[2] not in typos)
+
+    print(f"{len(contacts)} contacts, {len(domains)} domains ({len(typos)} without records), "
+          f"{args.latency * 1000:.0f} ms per DNS answer")
+    print(f"{'run':<22} {'seconds':>8} {'queries':>8} {'kept':>7} {'dropped':>8}")
+    with DNSStub(zones, latency=args.latency) as stub, tempfile.TemporaryDirectory(prefix='bench-dns-') as workdir:
+        resolver = DNSResolver([stub.address])
+        runs = [('serial, cold cache', 'serial.json', 1),
+                (f'{args.workers} workers, cold cache', 'cache.json', args.workers),
+                (f'{args.workers} workers, warm cache', 'cache.json', args.workers)]
+        for label, cache_name, workers in runs:
+            queries = len(stub.queries)
+            kept, checker, seconds = run(contacts, resolver, os.path.join(workdir, cache_name), workers)
+            print(f"{label:<22} {seconds:>8.3f} {len(stub.queries) - queries:>8} {kept:>7} "
+                  f"{checker.stats['dropped']:>8}")
+            if kept != expected:
+                print(f"  expected {expected} contacts to be kept")
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
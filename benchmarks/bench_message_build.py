@@ -0,0 +1,80 @@
+"""Per-message build cost: email package (MIMEMultipart) vs MessageBuilder.
+
+The last row sends the built template (inlined CSS, minified HTML, plain-text
+part), whose average size is the per-message payload on the wire.
+
+Usage: python benchmarks/bench_message_build.py [--messages N] [--template PATH]
+"""
+import argparse
+import os
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from execute import CompiledTemplate, MessageBuilder, TemplateBuild  # noqa: E402
+
+DEFAULT_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'templates', 'GEN.html')
+SENDER_EMAIL = 'sender@example.com'
+SENDER_NAME = 'Campaign Sender'
+SUBJECT = 'Propuesta para {{Nombre Empresa}}'
+
+
+def contacts(count):
+    for i in range(count):
+        yield {'Email Contacto': f'contact{i}@example.com',
+               'Nombre Contacto': f'Contacto Número {i}',
+               'Nombre Empresa': f'Empresa {i} S.A.'}
+
+
+def build_mime(html_template, subject_template, contact):
+    """What the campaign did before MessageBuilder"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject_template.render(contact)
+    msg['From'] = formataddr((SENDER_NAME, SENDER_EMAIL))
+    msg['To'] = contact['Email Contacto']
+    msg.attach(MIMEText(html_template.render(contact), 'html'))
+    return msg.as_bytes()
+
+
+def build_raw(builder, contact):
+    return builder.render(contact, contact['Email Contacto'])
+
+
+def measure(label, build, count):
+    start = time.perf_counter()
+    size = 0
+    for contact in contacts(count):
+        size += len(build(contact))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<16} {count} messages in {elapsed:.3f}s  "
+          f"{elapsed / count * 1e6:8.1f} us/message  ({size / count / 1024:.1f} KB avg)")
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--template', default=DEFAULT_TEMPLATE)
+    args = parser.parse_args(argv)
+
+    with open(args.template, encoding='utf-8') as f:
+        source = f.read()
+    html_template = CompiledTemplate(source)
+    subject_template = CompiledTemplate(SUBJECT, escape=False)
+    builder = MessageBuilder(SENDER_EMAIL, SENDER_NAME, html_template, subject_template)
+
+    before = measure('MIMEMultipart', lambda c: build_mime(html_template, subject_template, c), args.messages)
+    after = measure('MessageBuilder', lambda c: build_raw(builder, c), args.messages)
+    print(f"speedup: {before / after:.1f}x")
+
+    build = TemplateBuild.get(source)
+    built = MessageBuilder(SENDER_EMAIL, SENDER_NAME, CompiledTemplate(build.html), subject_template,
+                           text_template=CompiledTemplate(build.text, escape=False))
+    measure('TemplateBuild', lambda c: build_raw(built, c), args.messages)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Startup time: module import cost and time to first window, against a budget.
+
+Runs ``python -X importtime -c "import execute"`` in fresh interpreters and
+reports the median import time with the slowest direct imports. Then it times
+a cold start until the first window is drawn (or, with no display, until
+``execute.py --help`` has printed). Exits 1 when the median cold start is
+over ``--budget`` seconds, so it can gate CI.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--budget 1.0]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+SCRIPT = os.path.join(REPO_DIR, 'execute.py')
+
+# Builds the real window, draws it once and exits
+FIRST_WINDOW = """
+import tkinter as tk
+import execute
+root = tk.Tk()
+app = execute.EmailCampaignApp(root)
+root.update()
+print('window', flush=True)
+root.destroy()
+"""
+
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us, depth)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # " name", then two more spaces per level
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def import_profile(runs):
+    """Median cumulative import time of execute (seconds) and its slowest direct imports"""
+    totals = []
+    children = {}
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import execute'],
+                                cwd=REPO_DIR, capture_output=True, text=True, check=True)
+        modules = parse_importtime(result.stderr)
+        totals.append(modules['execute'][1] / 1e6)
+        for name, (_, cumulative, depth) in modules.items():
+            if depth == 1:  # Imported by execute itself
+                children.setdefault(name, []).append(cumulative / 1e6)
+    slowest = sorted(((statistics.median(times), name) for name, times in children.items()), reverse=True)
+    return statistics.median(totals), slowest
+
+
+def has_display():
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'):
+        return False
+    try:
+        import tkinter
+        tkinter.Tk().destroy()
+        return True
+    except Exception:
+        return False
+
+
+def time_to_ready(command, marker=None):
+    """Wall time from launching ``command`` until it prints ``marker`` (or exits)"""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=REPO_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    for line in process.stdout:
+        if marker is None or line.strip() == marker:
+            break
+    elapsed = time.perf_counter() - start
+    process.stdout.close()
+    process.wait()
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=1.0, help="Allowed seconds to first window / CLI output")
+    parser.add_argument('--top', type=int, default=8, help="How many of the slowest imports to list")
+    args = parser.parse_args(argv)
+
+    total, slowest = import_profile(args.runs)
+    print(f"import execute: {total * 1000:.0f} ms (median of {args.runs})")
+    for seconds, name in slowest[:args.top]:
+        print(f"  {name:<28} {seconds * 1000:7.1f} ms")
+
+    if has_display():
+        label = "first window"
+        times = [time_to_ready([sys.executable, '-c', FIRST_WINDOW], 'window') for _ in range(args.runs)]
+    else:
+        label = "CLI --help (no display)"
+        times = [time_to_ready([sys.executable, SCRIPT, '--help']) for _ in range(args.runs)]
+    cold_start = statistics.median(times)
+    verdict = "OK" if cold_start <= args.budget else "OVER BUDGET"
+    print(f"time to {label}: {cold_start * 1000:.0f} ms (budget {args.budget * 1000:.0f} ms) {verdict}")
+    return 0 if cold_start <= args.budget else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Local DNS stand-in for the recipient domain check.
+
+Answers MX, A and AAAA queries over UDP from a fixed table of domains:
+NXDOMAIN for domains not in it, an empty answer for record types a domain
+doesn't have. Can add latency to every answer, and answer chosen domains
+with SERVFAIL or not at all, to see how the campaign copes.
+
+Usage: python benchmarks/dns_stub.py --port 5353 --domain example.com [--latency 0.05]
+"""
+import argparse
+import ipaddress
+import socketserver
+import threading
+import time
+
+TYPES = {1: 'A', 15: 'MX', 28: 'AAAA'}
+SERVFAIL = 2
+NXDOMAIN = 3
+
+
+def encode_name(name):
+    return b''.join(bytes([len(label)]) + label.encode('ascii') for label in name.rstrip('.').split('.') if label) + b'\x00'
+
+
+def mx_domain(domain):
+    """Zone entry for a domain with an MX and an A record, as most mail domains have"""
+    return {'MX': [(10, f'mx.{domain}')], 'A': ['127.0.0.1']}
+
+
+class DNSStubHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        data, sock = self.request
+        stub = self.server.stub
+        if len(data) < 12:
+            return
+        offset = 12
+        labels = []
+        while data[offset]:
+            labels.append(data[offset + 1:offset + 1 + data[offset]].decode('ascii', 'replace'))
+            offset += data[offset] + 1
+        question = data[12:offset + 5]
+        qtype = int.from_bytes(data[offset + 1:offset + 3], 'big')
+        name = '.'.join(labels).lower()
+        with stub.lock:
+            stub.queries.append((name, TYPES.get(qtype, qtype)))
+        if name in stub.drop:
+            return
+        stub.delay()
+
+        rcode, answers = 0, []
+        if name in stub.servfail:
+            rcode = SERVFAIL
+        elif name not in stub.zones:
+            rcode = NXDOMAIN
+        else:
+            for value in stub.zones[name].get(TYPES.get(qtype), []):
+                if qtype == 15:
+                    preference, exchange = value
+                    rdata = preference.to_bytes(2, 'big') + encode_name(exchange)
+                else:
+                    rdata = ipaddress.ip_address(value).packed
+                # Name is a pointer to the question (offset 12)
+                answers.append(b'\xc0\x0c' + qtype.to_bytes(2, 'big') + b'\x00\x01'
+                               + stub.ttl.to_bytes(4, 'big') + len(rdata).to_bytes(2, 'big') + rdata)
+        header = data[:2] + bytes([0x81, 0x80 | rcode]) + b'\x00\x01' + len(answers).to_bytes(2, 'big') + b'\x00' * 4
+        sock.sendto(header + question + b''.join(answers), self.client_address)
+
+
+class _ThreadingServer(socketserver.ThreadingUDPServer):
+    daemon_threads = True
+
+
+class DNSStub:
+    """Threaded local DNS server; use as a context manager
+
+    ``zones`` maps domains to their records: ``{'MX': [(10, 'mx.host')],
+    'A': ['127.0.0.1'], 'AAAA': ['::1']}``. ``servfail`` domains get
+    SERVFAIL, ``drop`` domains get no answer. ``latency`` is added before
+    every answer. Queries received are listed in ``queries``.
+    """
+
+    def __init__(self, zones=None, host='127.0.0.1', port=0, latency=0.0, servfail=(), drop=(), ttl=300):
+        self.zones = {domain.lower(): records for domain, records in (zones or {}).items()}
+        self.latency = latency
+        self.servfail = set(servfail)
+        self.drop = set(drop)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.queries = []
+        self.server = _ThreadingServer((host, port), DNSStubHandler)
+        self.server.stub = self
+        self.host, self.port = self.server.server_address[:2]
+        self.thread = None
+
+    @property
+    def address(self):
+        return f"{self.host}:{self.port}"
+
+    def delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='dns-stub', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5353)
+    parser.add_argument('--domain', action='append', default=[], help="Domain with MX and A records (repeatable)")
+    parser.add_argument('--a-only', action='append', default=[], help="Domain with only an A record (repeatable)")
+    parser.add_argument('--servfail', action='append', default=[], help="Domain answered with SERVFAIL (repeatable)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every answer")
+    args = parser.parse_args(argv)
+
+    zones = {domain: mx_domain(domain) for domain in args.domain}
+    zones.update({domain: {'A': ['127.0.0.1']} for domain in args.a_only})
+    with DNSStub(zones, args.host, args.port, latency=args.latency, servfail=args.servfail) as stub:
+        print(f"DNS stub listening on {stub.address} ({len(zones)} domains)")
+        try:
+            while True:
+                time.sleep(5)
+                print(f"{len(stub.queries)} queries")
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""Local SMTP stand-in for benchmarks and dry runs.
+
+Accepts mail on localhost without delivering it, with knobs to make it
+behave like a real provider: per-command latency, implicit TLS or
+STARTTLS with a throwaway self-signed certificate, AUTH PLAIN/LOGIN, and
+injected temporary (4xx) or permanent (5xx) failures.
+
+Usage: python benchmarks/smtp_sink.py --port 2525 [--tls ssl] [--latency 0.02]
+"""
+import argparse
+import base64
+import os
+import random
+import socketserver
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+
+
+def make_self_signed_cert(directory, hostname='localhost'):
+    """Create a self-signed certificate with the openssl CLI, returning (cert, key) paths"""
+    cert = os.path.join(directory, 'sink-cert.pem')
+    key = os.path.join(directory, 'sink-key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-keyout', key, '-out', cert, '-subj', f'/CN={hostname}',
+         '-addext', f'subjectAltName=DNS:{hostname},IP:127.0.0.1'],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+
+class SinkStats:
+    """Counters shared by all sink connections"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.messages = 0
+        self.recipients = 0
+        self.bytes = 0
+        self.rejected = 0
+        self.deferred = 0
+        self.stored = []
+
+    def snapshot(self):
+        with self.lock:
+            return {'connections': self.connections, 'logins': self.logins,
+                    'messages': self.messages, 'recipients': self.recipients,
+                    'bytes': self.bytes, 'rejected': self.rejected, 'deferred': self.deferred}
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """One client connection speaking enough ESMTP for smtplib"""
+
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.stats.lock:
+            sink.stats.connections += 1
+        self.authenticated = not sink.users
+        self.mail_from = None
+        self.rcpts = []
+        if sink.tls == 'ssl':
+            self.start_tls()
+        self.reply('220 localhost ESMTP sink ready')
+
+        while True:
+            line = self.rfile.readline(65536)
+            if not line:
+                return
+            command, _, arg = line.decode('utf-8', 'replace').rstrip('\r\n').partition(' ')
+            command = command.upper()
+            sink.delay()
+            handler = getattr(self, f'smtp_{command}', None)
+            if handler is None:
+                self.reply('502 5.5.2 Command not implemented')
+            elif handler(arg) is False:
+                return
+
+    def reply(self, text):
+        self.wfile.write(text.encode('utf-8') + b'\r\n')
+        self.wfile.flush()
+
+    def start_tls(self):
+        self.connection = self.server.sink.ssl_context.wrap_socket(self.connection, server_side=True)
+        self.rfile = self.connection.makefile('rb')
+        self.wfile = self.connection.makefile('wb')
+
+    def smtp_EHLO(self, arg):
+        sink = self.server.sink
+        lines = ['localhost', 'SIZE 52428800', '8BITMIME']
+        if sink.pipelining:
+            lines.append('PIPELINING')
+        if sink.rcpt_max:
+            lines.append(f'LIMITS RCPTMAX={sink.rcpt_max}')
+        if sink.tls == 'starttls' and not isinstance(self.connection, ssl.SSLSocket):
+            lines.append('STARTTLS')
+        if sink.users:
+            lines.append('AUTH PLAIN LOGIN')
+        for line in lines[:-1]:
+            self.reply(f'250-{line}')
+        self.reply(f'250 {lines[-1]}')
+
+    def smtp_HELO(self, arg):
+        self.reply('250 localhost')
+
+    def smtp_STARTTLS(self, arg):
+        if self.server.sink.tls != 'starttls':
+            self.reply('502 5.5.1 STARTTLS not offered')
+            return
+        self.reply('220 2.0.0 Ready to start TLS')
+        self.start_tls()
+
+    def smtp_AUTH(self, arg):
+        sink = self.server.sink
+        mechanism, _, initial = arg.partition(' ')
+        mechanism = mechanism.upper()
+        if mechanism == 'PLAIN':
+            if not initial:
+                self.reply('334 ')
+                initial = self.rfile.readline().decode('ascii', 'replace').strip()
+            try:
+                _, username, password = base64.b64decode(initial).decode('utf-8').split('\0')
+            except ValueError:
+                self.reply('501 5.5.2 Malformed AUTH PLAIN')
+                return
+        elif mechanism == 'LOGIN':
+            try:
+                if initial:
+                    username = base64.b64decode(initial).decode('utf-8')
+                else:
+                    self.reply('334 VXNlcm5hbWU6')
+                    username = base64.b64decode(self.rfile.readline().strip()).decode('utf-8')
+                self.reply('334 UGFzc3dvcmQ6')
+                password = base64.b64decode(self.rfile.readline().strip()).decode('utf-8')
+            except ValueError:
+                self.reply('501 5.5.2 Malformed AUTH LOGIN')
+                return
+        else:
+            self.reply('504 5.5.4 Unrecognized authentication type')
+            return
+
+        if sink.users.get(username) != password:
+            self.reply('535 5.7.8 Authentication credentials invalid')
+            return
+        self.authenticated = True
+        with sink.stats.lock:
+            sink.stats.logins += 1
+        self.reply('235 2.7.0 Authentication successful')
+
+    def smtp_MAIL(self, arg):
+        if not self.authenticated:
+            self.reply('530 5.7.0 Authentication required')
+            return
+        self.mail_from = arg
+        self.rcpts = []
+        self.reply('250 2.1.0 OK')
+
+    def smtp_RCPT(self, arg):
+        sink = self.server.sink
+        if self.mail_from is None:
+            self.reply('503 5.5.1 Need MAIL first')
+            return
+        if sink.rcpt_max and len(self.rcpts) >= sink.rcpt_max:
+            self.reply('452 4.5.3 Too many recipients')
+            return
+        address = arg.partition(':')[2].strip().strip('<>').lower()
+        error = sink.injected_error(address)
+        if error:
+            self.reply(error)
+            return
+        self.rcpts.append(address)
+        self.reply('250 2.1.5 OK')
+
+    def smtp_DATA(self, arg):
+        sink = self.server.sink
+        if not self.rcpts:
+            self.reply('503 5.5.1 Need RCPT first')
+            return
+        self.reply('354 End data with <CR><LF>.<CR><LF>')
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line == b'.\r\n':
+                break
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        sink.delay(sink.data_latency)
+        with sink.stats.lock:
+            sink.stats.messages += 1
+            sink.stats.recipients += len(self.rcpts)
+            sink.stats.bytes += sum(len(line) for line in lines)
+            if sink.store:
+                sink.stats.stored.append((self.mail_from, list(self.rcpts), b''.join(lines)))
+        self.mail_from = None
+        self.rcpts = []
+        self.reply('250 2.0.0 OK queued')
+
+    def smtp_RSET(self, arg):
+        self.mail_from = None
+        self.rcpts = []
+        self.reply('250 2.0.0 OK')
+
+    def smtp_NOOP(self, arg):
+        self.reply('250 2.0.0 OK')
+
+    def smtp_QUIT(self, arg):
+        self.reply('221 2.0.0 Bye')
+        return False
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Threaded local SMTP server; use as a context manager
+
+    ``tls`` is 'none', 'ssl' (implicit TLS like port 465) or 'starttls'.
+    ``users`` maps usernames to passwords; when empty no AUTH is required.
+    ``temp_fail_rate`` / ``perm_fail_rate`` are the fractions of recipients
+    answered with 451 / 550, and ``reject`` is a set of addresses that always
+    get 550. ``latency`` is added before every command reply and
+    ``data_latency`` before the reply to DATA. ``rcpt_max`` caps the
+    recipients per message (advertised as LIMITS RCPTMAX, extras get 452).
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, tls='none', users=None,
+                 latency=0.0, data_latency=0.0, temp_fail_rate=0.0, perm_fail_rate=0.0,
+                 reject=(), pipelining=True, rcpt_max=None, store=False, seed=0):
+        self.tls = tls
+        self.users = dict(users or {})
+        self.latency = latency
+        self.data_latency = data_latency
+        self.temp_fail_rate = temp_fail_rate
+        self.perm_fail_rate = perm_fail_rate
+        self.reject = {address.lower() for address in reject}
+        self.pipelining = pipelining
+        self.rcpt_max = rcpt_max
+        self.store = store
+        self.stats = SinkStats()
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+        self.cert_dir = None
+        self.cert_file = None
+        self.ssl_context = None
+        if tls != 'none':
+            self.cert_dir = tempfile.TemporaryDirectory(prefix='smtp-sink-')
+            self.cert_file, key_file = make_self_signed_cert(self.cert_dir.name)
+            self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.ssl_context.load_cert_chain(self.cert_file, key_file)
+
+        self.server = _ThreadingServer((host, port), SMTPSinkHandler)
+        self.server.sink = self
+        self.host, self.port = self.server.server_address[:2]
+        self.thread = None
+
+    def delay(self, seconds=None):
+        seconds = self.latency if seconds is None else seconds
+        if seconds:
+            time.sleep(seconds)
+
+    def injected_error(self, address):
+        """SMTP error reply for this recipient, or None to accept it"""
+        if address in self.reject:
+            with self.stats.lock:
+                self.stats.rejected += 1
+            return '550 5.1.1 User unknown'
+        with self.random_lock:
+            roll = self.random.random()
+        if roll < self.perm_fail_rate:
+            with self.stats.lock:
+                self.stats.rejected += 1
+            return '550 5.1.1 User unknown'
+        if roll < self.perm_fail_rate + self.temp_fail_rate:
+            with self.stats.lock:
+                self.stats.deferred += 1
+            return '451 4.7.1 Try again later'
+        return None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='smtp-sink', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.cert_dir is not None:
+            self.cert_dir.cleanup()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2525)
+    parser.add_argument('--tls', choices=('none', 'ssl', 'starttls'), default='none')
+    parser.add_argument('--user', action='append', default=[], metavar='NAME:PASSWORD',
+                        help="Require AUTH with these credentials (repeatable)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every reply")
+    parser.add_argument('--data-latency', type=float, default=0.0, help="Seconds added to the DATA reply")
+    parser.add_argument('--temp-fail-rate', type=float, default=0.0, help="Fraction of recipients answered 451")
+    parser.add_argument('--perm-fail-rate', type=float, default=0.0, help="Fraction of recipients answered 550")
+    parser.add_argument('--no-pipelining', action='store_true', help="Don't advertise PIPELINING")
+    parser.add_argument('--rcpt-max', type=int, help="Most recipients accepted per message")
+    args = parser.parse_args(argv)
+
+    users = dict(user.split(':', 1) for user in args.user)
+    sink = SMTPSink(args.host, args.port, tls=args.tls, users=users, latency=args.latency,
+                    data_latency=args.data_latency, temp_fail_rate=args.temp_fail_rate,
+                    perm_fail_rate=args.perm_fail_rate, pipelining=not args.no_pipelining,
+                    rcpt_max=args.rcpt_max)
+    with sink:
+        print(f"SMTP sink listening on {sink.host}:{sink.port} (tls={args.tls})")
+        if sink.cert_file:
+            print(f"Certificate: {sink.cert_file}")
+        try:
+            while True:
+                time.sleep(5)
+                print(sink.stats.snapshot())
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,73 @@
-import pandas as pd
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formataddr
+import importlib
+from email.utils import formataddr, getaddresses
+from email import message_from_bytes
+from email.header import Header
 import getpass
 import time
 import ssl
-from datetime import datetime
-import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext, filedialog
+from datetime import datetime, timedelta
+try:
+    import tkinter as tk
+    from tkinter import ttk, messagebox, scrolledtext, filedialog
+except ImportError:  # Headless servers can still use the command line
+    tk = ttk = messagebox = scrolledtext = filedialog = None
 import logging
 from logging.handlers import RotatingFileHandler
 import traceback
 import os
 import base64
+import binascii
 import json
-import mailbox
+import csv
+import sqlite3
+import hashlib
+import pickle
+import tempfile
+import bisect
+import contextlib
+import itertools
+import mmap
+import concurrent.futures
 import re
+import html
+import queue
+import threading
+import socket
+import argparse
+import sys
+
+
+class _LazyModule:
+    """Stand-in for a heavy module, imported on first attribute access
+
+    pandas alone is most of this script's import time, and the window, the
+    command line help and the suppress commands never touch it.
+    """
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__['_module'] is not None else "not loaded yet"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+pd = _LazyModule("pandas")
+smtplib = _LazyModule("smtplib")
 
 class EmailCampaignApp:
     def __init__(self, root):
@@ -31,20 +82,17 @@ class EmailCampaignApp:
         # Setup logging
         self.setup_logging()
         
-        # Configuration
-        self.config = {
-            'excel_file': "",
-            'html_template': "",
-            'test_mode': False,
-            'log_file': "logs/email_campaign.log",
-            'failure_report': "reports/failed_contacts.xlsx"
-        }
-        
-        # Tracking failed sends
-        self.failed_contacts = []
+        # Configuration (shared with the headless CampaignEngine)
+        self.config = dict(DEFAULT_CAMPAIGN_CONFIG)
+        self.config['log_file'] = "logs/email_campaign.log"
         
-        # UI Setup
+        # UI Setup; the rest waits until the window is up so it appears right away
         self.setup_ui()
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        """Build the contact table and fill in saved settings once the window is showing"""
+        self.setup_contact_table()
         self.load_config()
         
         if not self.smtp_entry.get():
@@ -52,6 +100,8 @@ class EmailCampaignApp:
         if not self.port_entry.get():
             self.port_entry.insert(9, "465")
 
+        # pandas is only needed once contacts are loaded; import it while the user fills in the form
+        threading.Thread(target=lambda: pd.DataFrame, name="preload-pandas", daemon=True).start()
         self.log("Application initialized", "INFO")
 
     def setup_logging(self):
@@ -86,21 +136,9 @@ class EmailCampaignApp:
         elif level == "DEBUG":
             self.logger.debug(message)
         
-        # Update UI log if available
-        if hasattr(self, 'log_text'):
-            self.log_text.config(state=tk.NORMAL)
-            self.log_text.insert(tk.END, log_entry + "\n")
-            
-            # Color coding
-            if level == "ERROR":
-                self.log_text.tag_add("error", "end-2l linestart", "end-1c")
-                self.log_text.tag_config("error", foreground="red")
-            elif level == "WARNING":
-                self.log_text.tag_add("warning", "end-2l linestart", "end-1c")
-                self.log_text.tag_config("warning", foreground="orange")
-            
-            self.log_text.see(tk.END)
-            self.log_text.config(state=tk.DISABLED)
+        # Queue for the UI log; the handler writes it to the widget in batches
+        if hasattr(self, 'ui_log'):
+            self.ui_log.append(log_entry, level)
         
         # Update status bar for errors
         if level == "ERROR" and hasattr(self, 'status'):
@@ -211,6 +249,18 @@ class EmailCampaignApp:
             variable=self.test_mode
         ).grid(row=0, column=1, sticky="w", padx=5)
         
+        self.resume_mode = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            options_frame, 
+            text="Resume previous run (skip already sent)", 
+            variable=self.resume_mode
+        ).grid(row=2, column=0, columnspan=2, sticky="w", padx=5)
+        
+        ttk.Label(options_frame, text="Connections:").grid(row=1, column=0, sticky="w", padx=5)
+        self.connections_spin = ttk.Spinbox(options_frame, from_=1, to=DEFAULT_CONNECTION_LIMIT, width=5)
+        self.connections_spin.grid(row=1, column=1, sticky="w", padx=5)
+        self.connections_spin.set(3)
+        
         # Action Buttons
         button_frame = ttk.Frame(config_frame)
         button_frame.grid(row=4, column=0, columnspan=2, pady=10)
@@ -228,24 +278,13 @@ class EmailCampaignApp:
         main_frame.rowconfigure(0, weight=1)
         main_frame.columnconfigure(1, weight=1)
         
-        # Data Table Tab
-        table_frame = ttk.Frame(notebook)
-        notebook.add(table_frame, text="Contact List")
+        # Data Table Tab (filled in by setup_contact_table)
+        self.table_frame = ttk.Frame(notebook)
+        notebook.add(self.table_frame, text="Contact List")
         
         # Configure table frame grid
-        table_frame.columnconfigure(0, weight=1)
-        table_frame.rowconfigure(0, weight=1)
-        
-        # Treeview with improved resizing
-        self.tree = ttk.Treeview(table_frame)
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        
-        # Scrollbars - now properly attached to grid
-        ysb = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        ysb.grid(row=0, column=1, sticky="ns")
-        xsb = ttk.Scrollbar(table_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
-        xsb.grid(row=1, column=0, sticky="ew")
-        self.tree.configure(yscroll=ysb.set, xscroll=xsb.set)
+        self.table_frame.columnconfigure(0, weight=1)
+        self.table_frame.rowconfigure(0, weight=1)
         
         # Log Tab
         log_frame = ttk.Frame(notebook)
@@ -259,6 +298,7 @@ class EmailCampaignApp:
         self.log_text = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD)
         self.log_text.grid(row=0, column=0, sticky="nsew")
         self.log_text.config(state=tk.DISABLED)
+        self.ui_log = TextLogView(self.log_text)
         
         # Status bar
         self.status = ttk.Label(main_frame, text="Ready", relief=tk.SUNKEN)
@@ -269,6 +309,12 @@ class EmailCampaignApp:
         main_frame.columnconfigure(1, weight=3)  # Give more space to the notebook
         main_frame.rowconfigure(0, weight=1)  # Allow vertical expansion
 
+    def setup_contact_table(self):
+        # Virtualized table: only the visible rows exist as Treeview items
+        self.contact_table = ContactTableView(self.table_frame)
+        self.contact_table.frame.grid(row=0, column=0, sticky="nsew")
+        self.tree = self.contact_table.tree
+
     def toggle_gmail_mode(self):
         if self.gmail_mode.get():
             # Save current SMTP settings before switching to Gmail mode
@@ -354,7 +400,7 @@ class EmailCampaignApp:
             self.log(f"Selected HTML template: {abs_path}", "INFO")
 
     def load_data(self):
-        """Load and display contact data from Excel"""
+        """Load and display contact data, showing the first rows while the rest streams in"""
         excel_file = self.excel_entry.get()
         if not excel_file:
             error_msg = "Please select an Excel file first"
@@ -362,36 +408,53 @@ class EmailCampaignApp:
             messagebox.showerror("Error", error_msg)
             return
             
-        try:
-            self.log(f"Loading contacts from {excel_file}", "INFO")
-            self.df = pd.read_excel(excel_file)
-            self.display_data()
-            self.status.config(text=f"Loaded {len(self.df)} contacts")
-            self.log(f"Successfully loaded {len(self.df)} contacts", "INFO")
-        except Exception as e:
-            error_msg = f"Failed to load Excel file: {str(e)}"
-            self.log(error_msg, "ERROR")
-            self.log(traceback.format_exc(), "DEBUG")
-            messagebox.showerror("Error", error_msg)
-
-    def display_data(self):
-        """Display data in treeview"""
-        # Clear existing data
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-            
-        # Set up columns
-        self.tree["columns"] = list(self.df.columns)
-        self.tree["show"] = "headings"
+        self.log(f"Loading contacts from {excel_file}", "INFO")
+        updates = queue.Queue()
         
-        for col in self.df.columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=100, anchor=tk.W)
+        def read():
+            try:
+                for chunk in iter_contact_chunks(excel_file, cache_dir=self.config['contact_cache_dir']):
+                    updates.put(('chunk', chunk))
+                updates.put(('done', None))
+            except Exception as e:
+                updates.put(('error', (e, traceback.format_exc())))
         
-        # Add data
-        for _, row in self.df.iterrows():
-            self.tree.insert("", tk.END, values=list(row))
+        chunks = []
+        
+        def poll():
+            while True:
+                try:
+                    kind, payload = updates.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == 'chunk':
+                    chunks.append(payload)
+                    if len(chunks) == 1:
+                        # First page right away; the full frame replaces it when loading ends
+                        self.df = payload
+                        self.display_data()
+                    self.status.config(text=f"Loading contacts... {sum(len(c) for c in chunks)} rows")
+                elif kind == 'done':
+                    self.df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+                    self.display_data()
+                    self.status.config(text=f"Loaded {len(self.df)} contacts")
+                    self.log(f"Successfully loaded {len(self.df)} contacts", "INFO")
+                    return
+                else:
+                    e, details = payload
+                    error_msg = f"Failed to load Excel file: {str(e)}"
+                    self.log(error_msg, "ERROR")
+                    self.log(details, "DEBUG")
+                    messagebox.showerror("Error", error_msg)
+                    return
+            self.root.after(50, poll)
         
+        threading.Thread(target=read, name="load-contacts", daemon=True).start()
+        poll()
+
+    def display_data(self):
+        """Display data in treeview"""
+        self.contact_table.set_data(self.df)
         self.log("Contact data displayed in table", "INFO")
 
     def preview_email(self):
@@ -426,7 +489,6 @@ class EmailCampaignApp:
 
     def start_campaign(self):
         """Start email campaign with failure tracking"""
-        self.failed_contacts = []  # Reset failed contacts list
         self.log("Starting email campaign", "INFO")
         
         # Validate inputs
@@ -453,170 +515,144 @@ class EmailCampaignApp:
             return
             
         # Get configuration
+        gmail_mode = self.gmail_mode.get()
         self.config.update({
             'excel_file': self.excel_entry.get(),
             'html_template': self.html_entry.get(),
             'smtp_server': self.smtp_entry.get(),
             'smtp_port': int(self.port_entry.get()),
+            'gmail_mode': gmail_mode,
             'test_mode': self.test_mode.get(),
             'sender_email': self.email_entry.get(),
-            'password': self.pass_entry.get(),
-            'sender_name': self.sender_name_entry.get()
+            'password': self.app_pass_entry.get() if gmail_mode else self.pass_entry.get(),
+            'sender_name': self.sender_name_entry.get(),
+            'subject': self.subject_entry.get(),
+            'connections': int(self.connections_spin.get()),
+            'resume': self.resume_mode.get()
         })
         
-        # Load data
-        try:
-            self.log(f"Loading contacts from {self.config['excel_file']}", "INFO")
-            contacts = load_contacts(self.config['excel_file'])
-            self.log(f"Found {len(contacts)} valid contacts", "INFO")
-            
-            self.log(f"Loading HTML template from {self.config['html_template']}", "INFO")
-            with open(self.config['html_template'], 'r', encoding='utf-8') as f:
-                html_template = f.read()
-        except Exception as e:
-            error_msg = f"Failed to load files: {str(e)}"
-            self.log(error_msg, "ERROR")
-            self.log(traceback.format_exc(), "DEBUG")
-            messagebox.showerror("Error", error_msg)
-            return
-            
-        # Start sending
-        success_count = 0
-        total = len(contacts)
-        self.log(f"Starting to send {total} emails", "INFO")
+        # The engine runs in a background thread and reports through this queue,
+        # which the Tk loop polls; worker threads never touch widgets
+        events = queue.Queue()
+        engine = CampaignEngine(self.config, on_event=lambda event, data: events.put((event, data)))
+        meter = ThroughputMeter()
+        state = {'done': 0, 'total': None}
         
         progress = tk.Toplevel(self.root)
         progress.title("Sending Progress")
-        progress.geometry("600x400")
+        progress.geometry("600x450")
         
         ttk.Label(progress, text="Sending emails...").pack(pady=10)
-        progress_bar = ttk.Progressbar(progress, maximum=total, mode='determinate')
+        progress_bar = ttk.Progressbar(progress, maximum=1, mode='indeterminate')
         progress_bar.pack(fill=tk.X, padx=20, pady=10)
-        status_label = ttk.Label(progress, text="0/0 sent")
+        status_label = ttk.Label(progress, text="Preparing contacts...")
         status_label.pack()
+        rate_label = ttk.Label(progress, text="")
+        rate_label.pack()
+        
+        controls = ttk.Frame(progress)
+        controls.pack(pady=5)
+        
+        def toggle_pause():
+            if engine.paused:
+                engine.resume()
+                meter.resume()
+                pause_btn.config(text="Pause")
+            else:
+                engine.pause()
+                meter.pause()
+                pause_btn.config(text="Resume")
+        
+        def cancel():
+            if messagebox.askyesno("Cancel", "Stop the campaign? Unsent contacts can be sent later with Resume.", parent=progress):
+                engine.cancel()
+                pause_btn.config(state=tk.DISABLED)
+                cancel_btn.config(state=tk.DISABLED)
+        
+        pause_btn = ttk.Button(controls, text="Pause", command=toggle_pause)
+        pause_btn.pack(side=tk.LEFT, padx=5)
+        cancel_btn = ttk.Button(controls, text="Cancel", command=cancel)
+        cancel_btn.pack(side=tk.LEFT, padx=5)
+        progress.protocol("WM_DELETE_WINDOW", cancel)
         
         log_frame = ttk.LabelFrame(progress, text="Sending Log", padding="10")
         log_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         progress_log = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD)
         progress_log.pack(fill=tk.BOTH, expand=True)
+        progress_sink = TextLogView(progress_log)
         
-        with open(self.config['html_template'], 'r', encoding = 'utf-8') as f:
-            html_template = f.read()
-        
-        for i, contact in enumerate(contacts, 1):
-
-            personalized_html = html_template.replace('{{name}}', contact['Nombre Contacto']).replace('{{company}}', contact.get('Nombre Empresa', '')).replace('{{sender_name}}', self.config['sender_name'])
-            # Update UI
-            progress_bar['value'] = i
-            status_label.config(text=f"{i}/{total} sent")
-            progress.update()
-            
-            # Prepare email
-            company = contact.get('Nombre Empresa', '')
-            subject = f"{self.config['sender_name']} - Servicios que entregan valor"
-            recipient = self.config['sender_email'] if self.config['test_mode'] else contact['Email Contacto']
-            
-            log_msg = f"Sending to {recipient} ({contact['Nombre Contacto']} at {company})"
-            self.log(log_msg, "INFO")
-            progress_log.insert(tk.END, f"[{datetime.now().strftime('%H:%M:%S')}] {log_msg}\n")
-            progress_log.see(tk.END)
-            
-            # Send email with detailed error handling
+        def run_engine():
             try:
-                result, error_detail = self.send_email(
-                    self.config['sender_email'], self.config['sender_name'],
-                    recipient, contact['Nombre Contacto'],
-                    self.subject_entry.get(), 
-                    personalized_html,
-                    self.config['smtp_server'], 
-                    int(self.config['smtp_port'])
-                )
-                
-                if result:
-                    success_msg = f"Successfully sent to {recipient}"
-                    success_count += 1
-                    self.log(success_msg, "INFO")
-                    progress_log.insert(tk.END, f"[{datetime.now().strftime('%H:%M:%S')}] {success_msg}\n")
-                else:
-                    error_msg = f"Failed to send to {recipient}: {error_detail}"
-                    self.log(error_msg, "ERROR")
-                    progress_log.insert(tk.END, f"[{datetime.now().strftime('%H:%M:%S')}] ERROR: {error_msg}\n", "error")
-                    
-                    # Add to failed contacts list
-                    failed_contact = contact.copy()
-                    failed_contact['Error'] = error_detail
-                    failed_contact['Timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    self.failed_contacts.append(failed_contact)
-                    
+                engine.run()
             except Exception as e:
-                error_msg = f"Unexpected error sending to {recipient}: {str(e)}"
-                self.log(error_msg, "ERROR")
-                self.log(traceback.format_exc(), "DEBUG")
-                progress_log.insert(tk.END, f"[{datetime.now().strftime('%H:%M:%S')}] CRITICAL: {error_msg}\n", "error")
+                events.put(('error', {'error': e, 'traceback': traceback.format_exc()}))
+        
+        def poll():
+            for _ in range(500):  # Bound the work per tick so the window stays responsive
+                try:
+                    event, data = events.get_nowait()
+                except queue.Empty:
+                    break
                 
-                # Add to failed contacts list
-                failed_contact = contact.copy()
-                failed_contact['Error'] = str(e)
-                failed_contact['Timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                self.failed_contacts.append(failed_contact)
-            
-            progress_log.see(tk.END)
-            progress.update()
+                if event == 'log':
+                    self.log(data['message'], data['level'])
+                elif event == 'prepared':
+                    # total is an estimate from the file's row count (None if it can't be counted up front)
+                    state['total'] = data['total']
+                    if state['total']:
+                        progress_bar.config(mode='determinate', maximum=state['total'])
+                    meter.start()
+                elif event == 'result':
+                    state['done'] += 1
+                    meter.record()
+                    if data['ok']:
+                        progress_sink.append(f"[{datetime.now().strftime('%H:%M:%S')}] Successfully sent to {data['recipient']}")
+                    else:
+                        error_msg = f"Failed to send to {data['recipient']}: {data['error']}"
+                        progress_sink.append(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR: {error_msg}", "ERROR")
+                    if state['total']:
+                        progress_bar['value'] = state['done']
+                    else:
+                        progress_bar.step()
+                elif event == 'finished':
+                    campaign_done(data['summary'])
+                    return
+                elif event == 'error':
+                    engine.cancel()
+                    progress.destroy()
+                    error_msg = f"Failed to load files: {str(data['error'])}"
+                    self.log(error_msg, "ERROR")
+                    self.log(data['traceback'], "DEBUG")
+                    messagebox.showerror("Error", error_msg)
+                    return
             
-            # Delay between emails
-            time.sleep(3)
+            if meter.started:
+                status_label.config(text=f"{state['done']}/{state['total'] or '?'} sent"
+                                         + (" (paused)" if engine.paused else ""))
+                rate_label.config(text=meter.describe(state['total'] - state['done'] if state['total'] else None))
+            progress.after(100, poll)
         
-        # Save failure report if needed
-        if self.failed_contacts:
-            self.save_failure_report()
+        def campaign_done(summary):
+            # Show results
+            progress.destroy()
+            final_msg = f"Campaign {'cancelled' if summary['cancelled'] else 'finished'} - {summary['sent']} succeeded, {summary['failed']} failed"
+            if summary['skipped']:
+                final_msg += f", {summary['skipped']} skipped (already sent)"
+            if summary['failed']:
+                final_msg += f"\nFailed contacts saved to: {self.config['failure_report'] or self.config['failure_log']}"
+            self.log(final_msg, "INFO")
+            messagebox.showinfo("Complete", final_msg)
         
-        # Show results
-        progress.destroy()
-        final_msg = f"Campaign finished - {success_count} succeeded, {total - success_count} failed"
-        if self.failed_contacts:
-            final_msg += f"\nFailure report saved to: {self.config['failure_report']}"
-        self.log(final_msg, "INFO")
-        messagebox.showinfo("Complete", final_msg)
-
-    def save_failure_report(self):
-        """Save failed contacts to Excel file with error details"""
-        try:
-            df_failed = pd.DataFrame(self.failed_contacts)
-            
-            # Ensure all original columns are included, even if empty
-            original_df = pd.read_excel(self.config['excel_file'])
-            for col in original_df.columns:
-                if col not in df_failed.columns:
-                    df_failed[col] = ""
-            
-            # Reorder columns to match original + error info
-            cols = list(original_df.columns) + ['Error', 'Timestamp']
-            df_failed = df_failed[cols]
-            
-            # Save to Excel
-            df_failed.to_excel(self.config['failure_report'], index=False)
-            self.log(f"Saved failure report with {len(df_failed)} contacts to {self.config['failure_report']}", "INFO")
-        except Exception as e:
-            error_msg = f"Failed to save failure report: {str(e)}"
-            self.log(error_msg, "ERROR")
-            self.log(traceback.format_exc(), "DEBUG")
+        threading.Thread(target=run_engine, name="campaign", daemon=True).start()
+        poll()
 
     def _encode_config(self, data_dict: dict) -> str:
         """Obfuscate config data with base64"""
-        if not data_dict:
-            raise ValueError("Config data cannot be empty")
-        json_str = json.dumps(data_dict)
-        return base64.b64encode(json_str.encode()).decode()
+        return encode_config(data_dict)
     
     def _decode_config(self, encoded_str: str) -> dict:
         """Decode base64-obfuscated config"""
-        if not encoded_str:
-            raise ValueError("Encoded string cannot be empty")
-        try:
-            decoded = base64.b64decode(encoded_str.encode()).decode()
-            return json.loads(decoded)
-        except Exception as e:
-            raise ValueError(f"Decoding failed: {str(e)}")
+        return decode_config(encoded_str)
             
     def _get_relative_path(self, path):
         """Convert absolute path to relative if it's under current directory"""
@@ -749,27 +785,88 @@ class EmailCampaignApp:
                 if filepath:
                     process_mbox_file(filepath)
             
+            # Scan progress (the scan itself runs off the Tk thread)
+            progress_frame = ttk.Frame(dialog)
+            progress_frame.pack(fill=tk.X, padx=10)
+            progress_bar = ttk.Progressbar(progress_frame, maximum=100, mode='determinate')
+            progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+            progress_label = ttk.Label(progress_frame, text="")
+            progress_label.pack(side=tk.LEFT, padx=5)
+            cancel_event = threading.Event()
+            cancel_btn = ttk.Button(progress_frame, text="Cancel", command=cancel_event.set, state=tk.DISABLED)
+            cancel_btn.pack(side=tk.LEFT, padx=5)
+            
             def process_mbox_file(filepath):
+                updates = queue.Queue()
+                cancel_event.clear()
+                cancel_btn.config(state=tk.NORMAL)
+                browse_btn.config(state=tk.DISABLED)
+                self.log(f"Scanning MBOX file {filepath}", "INFO")
+                own_addresses = [addr for addr in (self.email_entry.get().strip(),) if addr]
+                
+                def scan():
+                    try:
+                        result = scan_mbox(
+                            filepath,
+                            progress=lambda done, total, messages: updates.put(('progress', (done, total, messages))),
+                            cancel_event=cancel_event,
+                            exclude=own_addresses
+                        )
+                        updates.put(('done', result))
+                    except Exception as e:
+                        updates.put(('error', e))
+                
+                def poll():
+                    while True:
+                        try:
+                            kind, payload = updates.get_nowait()
+                        except queue.Empty:
+                            break
+                        if kind == 'progress':
+                            done, total, messages = payload
+                            progress_bar['value'] = 100 * done / total if total else 100
+                            progress_label.config(text=f"{messages} messages scanned")
+                        else:
+                            cancel_btn.config(state=tk.DISABLED)
+                            browse_btn.config(state=tk.NORMAL)
+                            if kind == 'error':
+                                messagebox.showerror("Error", f"Failed to process MBOX file: {str(payload)}")
+                                self.log(f"MBOX processing error: {str(payload)}", "ERROR")
+                            else:
+                                finish(filepath, payload)
+                            return
+                    dialog.after(100, poll)
+                
+                threading.Thread(target=scan, name="mbox-scan", daemon=True).start()
+                poll()
+            
+            def finish(filepath, result):
+                bounces = result['bounces']
+                # Only dead addresses are suppressed; soft and transient bounces may deliver later
+                rejected_emails = {email for email, record in bounces.items() if record['kind'] == 'hard'}
+                if result['cancelled']:
+                    self.log(f"MBOX scan cancelled after {result['messages']} messages", "WARNING")
+                    progress_label.config(text=f"Cancelled ({result['messages']} messages scanned)")
+                    return
+                self.log(f"Processed {result['messages']} messages from MBOX", "INFO")
+                
                 try:
-                    rejected_emails = set()
-                    
-                    # Open the mbox file
-                    mbox = mailbox.mbox(filepath)
-                    
-                    self.log(f"Processing {len(mbox)} messages from MBOX", "INFO")
-                    
-                    for message in mbox:
-                        text_content = self._extract_text_content(message)
-                        found = self._parse_bounce_content(text_content)
-                        rejected_emails.update(found)
-                    
-                    self._display_results(rejected_emails, dialog)
+                    # Mark them in the send journal so resumed campaigns know they bounced
+                    with SendJournal(self.config['journal_file']) as journal:
+                        updated = journal.mark_bounced(rejected_emails)
+                    self.log(f"Marked {updated} journal entries as bounced", "INFO")
                     
+                    # ...and never mail them again
+                    with SuppressionList(self.config['suppression_file']) as suppression:
+                        added = suppression.add(rejected_emails, 'bounce', os.path.basename(filepath))
+                    self.log(f"Added {added} bounced addresses to the suppression list", "INFO")
                 except Exception as e:
-                    messagebox.showerror("Error", f"Failed to process MBOX file: {str(e)}")
-                    self.log(f"MBOX processing error: {str(e)}", "ERROR")
+                    self.log(f"Could not record bounces: {str(e)}", "ERROR")
+                
+                self._display_results(bounces, dialog)
             
-            ttk.Button(dialog, text="Browse MBOX File", command=browse_mbox).pack(pady=10)
+            browse_btn = ttk.Button(dialog, text="Browse MBOX File", command=browse_mbox)
+            browse_btn.pack(pady=10)
             
             # Result display area
             self.result_text = scrolledtext.ScrolledText(dialog, height=20)
@@ -779,70 +876,32 @@ class EmailCampaignApp:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to initialize: {str(e)}")
 
-    def _extract_text_content(self, msg):
-        """Extract text content from email message"""
-        text_content = ""
-        try:
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain":
-                        payload = part.get_payload(decode=True)
-                        if payload:
-                            text_content += payload.decode(errors="ignore") + "\n"
-            else:
-                payload = msg.get_payload(decode=True)
-                if payload:
-                    text_content = payload.decode(errors="ignore")
-        except Exception as e:
-            self.log(f"Error extracting content: {str(e)}", "WARNING")
-        return text_content
-
-    def _parse_bounce_content(self, text_content):
-        """Parse bounce message content for failed addresses"""
-        found = set()
-        
-        if not text_content:
-            return found
-        
-        # Patterns to match in bounce messages
-        patterns = [
-            r'failed:\s*\n\n\[([^\]]+)\]',  # [address] after "failed:"
-            r'RCPT TO\s*[<:]+([^\s>:]+)',   # RCPT TO:<address>
-            r'Original-Recipient:\s*rfc822;\s*([^\s]+)',  # Original-Recipient
-            r'Final-Recipient:\s*rfc822;\s*([^\s]+)',     # Final-Recipient
-            r'To:\s*([^\s<]+@[^\s>]+)',                  # To: address
-            r'<([^>]+@[^>]+)>'                           # <address>
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text_content, re.IGNORECASE)
-            for addr in matches:
-                clean_addr = addr.strip('<>:').lower()
-                if '@' in clean_addr and not any(x in clean_addr for x in ['mailer-daemon', 'postmaster']):
-                    found.add(clean_addr)
-        
-        return found
-
-    def _display_results(self, rejected_emails, parent):
-        """Display results in the text area"""
+    def _display_results(self, bounces, parent):
+        """Display results in the text area, grouped by bounce type"""
         self.result_text.config(state=tk.NORMAL)
         self.result_text.delete(1.0, tk.END)
         
-        if rejected_emails:
-            self.result_text.insert(tk.END, f"Found {len(rejected_emails)} rejected addresses:\n\n")
-            for email in sorted(rejected_emails):
-                self.result_text.insert(tk.END, f"{email}\n")
+        if bounces:
+            self.result_text.insert(tk.END, f"Found {len(bounces)} bounced addresses:\n")
+            for kind in ('hard', 'soft', 'transient', 'unknown'):
+                records = sorted((r for r in bounces.values() if r['kind'] == kind), key=lambda r: r['email'])
+                if not records:
+                    continue
+                self.result_text.insert(tk.END, f"\n{kind.capitalize()} bounces ({len(records)}):\n")
+                for record in records:
+                    detail = " ".join(x for x in (record['status'], record['diagnostic']) if x)
+                    self.result_text.insert(tk.END, f"{record['email']}  {detail}\n")
             
             # Add button to save results
             save_btn = ttk.Button(parent, text="Save to Excel", 
-                                command=lambda: self._save_results_to_excel(rejected_emails))
+                                command=lambda: self._save_results_to_excel(bounces))
             save_btn.pack(pady=10)
         else:
             self.result_text.insert(tk.END, "No rejected addresses found in the messages")
         
         self.result_text.config(state=tk.DISABLED)
 
-    def _save_results_to_excel(self, rejected_emails):
+    def _save_results_to_excel(self, bounces):
         """Save found addresses to Excel file"""
         filename = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
@@ -850,79 +909,3632 @@ class EmailCampaignApp:
             title="Save Rejected Addresses"
         )
         if filename:
-            df = pd.DataFrame(sorted(rejected_emails), columns=["Rejected Emails"])
+            df = pd.DataFrame(sorted(bounces.values(), key=lambda r: r['email']))
+            df = df.rename(columns={'email': 'Rejected Emails', 'kind': 'Bounce Type', 'action': 'Action',
+                                    'status': 'Status', 'diagnostic': 'Diagnostic', 'source': 'Source'})
             df.to_excel(filename, index=False)
-            messagebox.showinfo("Success", f"Saved {len(rejected_emails)} addresses to {filename}")
+            messagebox.showinfo("Success", f"Saved {len(bounces)} addresses to {filename}")
 
-    def send_email(self, sender_email, sender_name, recipient_email, 
-                recipient_name, subject, html_content, 
-                smtp_server, smtp_port):
-        """Universal email sender that handles both Gmail and regular SMTP"""
-        
-        password = self.app_pass_entry.get() if self.gmail_mode.get() else self.pass_entry.get()
-        
+
+class TextLogView:
+    """Feeds log lines to a Text widget in batches
+
+    Lines are queued (from any thread) and written by a Tk ``after`` callback
+    every ``flush_interval`` ms, one insert per batch. The widget keeps only the
+    last ``max_lines`` lines, and the level tags are configured once here.
+    """
+
+    TAG_COLORS = {"error": "red", "warning": "orange"}
+
+    def __init__(self, widget, max_lines=2000, flush_interval=100):
+        self.widget = widget
+        self.max_lines = max_lines
+        self.flush_interval = flush_interval
+        self.pending = queue.SimpleQueue()
+        for tag, color in self.TAG_COLORS.items():
+            widget.tag_config(tag, foreground=color)
+        self._schedule()
+
+    def append(self, line, level="INFO"):
+        """Queue a pre-formatted line; safe to call from worker threads"""
+        self.pending.put((line, level.lower()))
+
+    def _schedule(self):
         try:
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = formataddr((sender_name, sender_email))
-            msg['To'] = recipient_email
-            msg.attach(MIMEText(html_content, 'html'))
+            self.widget.after(self.flush_interval, self._flush)
+        except tk.TclError:
+            pass  # Widget destroyed
 
-            context = ssl.create_default_context()
-                
-            # Gmail mode handling
-            if self.gmail_mode.get():
-                if smtp_port == 465:
-                    with smtplib.SMTP_SSL(smtp_server, smtp_port, context=context) as server:
-                        server.login(sender_email, password)
-                        server.send_message(msg)
-                elif smtp_port == 587:
-                    with smtplib.SMTP(smtp_server, smtp_port) as server:
-                        server.starttls(context=context)
-                        server.login(sender_email, password)
-                        server.send_message(msg)
+    def _flush(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        if lines:
+            try:
+                self._write(lines[-self.max_lines:])
+            except tk.TclError:
+                return  # Widget destroyed; stop rescheduling
+        self._schedule()
+
+    def _write(self, lines):
+        # Interleave text and tag arguments so the whole batch is one insert call
+        args = []
+        for line, tag in lines:
+            args += [line + "\n", tag if tag in self.TAG_COLORS else ()]
+        state = self.widget.cget("state")
+        self.widget.config(state=tk.NORMAL)
+        self.widget.insert(tk.END, *args)
+        # Ring buffer: drop the oldest lines beyond max_lines
+        excess = int(self.widget.index("end-1c").split(".")[0]) - 1 - self.max_lines
+        if excess > 0:
+            self.widget.delete("1.0", f"{excess + 1}.0")
+        self.widget.see(tk.END)
+        self.widget.config(state=state)
+
+
+def _sort_key(column):
+    """Case-insensitive text for text and mixed columns (openpyxl often mixes int and str); blanks sort last"""
+    if pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column):
+        return column.astype(str).str.lower().where(column.notna())
+    return column
+
+
+class ContactTableView:
+    """Treeview over a DataFrame that only materializes the visible rows
+
+    A fixed pool of Treeview items is refilled from ``view.iloc[offset:...]``
+    as the user scrolls, so a 100k-row sheet costs the same as a screenful.
+    Sorting (click a heading) and filtering (text box) run on the DataFrame
+    with vectorized pandas operations and just reset the window.
+    """
+
+    ROW_HEIGHT = 20
+
+    def __init__(self, parent):
+        self.frame = ttk.Frame(parent)
+        self.frame.columnconfigure(1, weight=1)
+        self.frame.rowconfigure(1, weight=1)
+
+        ttk.Label(self.frame, text="Filter:").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        self.filter_var = tk.StringVar()
+        filter_entry = ttk.Entry(self.frame, textvariable=self.filter_var)
+        filter_entry.grid(row=0, column=1, sticky="ew", padx=5, pady=2)
+        filter_entry.bind("<KeyRelease>", self._schedule_filter)
+        self.count_label = ttk.Label(self.frame, text="")
+        self.count_label.grid(row=0, column=2, sticky="e", padx=5)
+
+        self.tree = ttk.Treeview(self.frame, show="headings", selectmode="browse")
+        self.tree.grid(row=1, column=0, columnspan=2, sticky="nsew")
+        self.ysb = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.ysb.grid(row=1, column=2, sticky="ns")
+        xsb = ttk.Scrollbar(self.frame, orient=tk.HORIZONTAL, command=self.tree.xview)
+        xsb.grid(row=2, column=0, columnspan=2, sticky="ew")
+        self.tree.configure(xscroll=xsb.set)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_to(self.offset - 3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_to(self.offset + 3))
+
+        self.df = pd.DataFrame()
+        self.view = self.df
+        self.search_columns = []
+        self.offset = 0
+        self.visible_rows = 25
+        self.items = []
+        self.sort_column = None
+        self.sort_ascending = True
+        self._filter_job = None
+
+    def set_data(self, df):
+        """Show a new DataFrame (sort and filter are reset)"""
+        self.df = df.reset_index(drop=True)
+        # Lower-cased text of every column, built once so each filter is a few vectorized contains()
+        self.search_columns = [self.df[col].fillna("").astype(str).str.lower() for col in self.df.columns]
+        self.sort_column = None
+        self.sort_ascending = True
+
+        self.tree["columns"] = list(self.df.columns)
+        for col in self.df.columns:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=100, anchor=tk.W)
+        self.apply_filter()
+
+    def apply_filter(self):
+        text = self.filter_var.get().strip().lower()
+        if text and len(self.df):
+            mask = pd.Series(False, index=self.df.index)
+            for column in self.search_columns:
+                mask |= column.str.contains(text, regex=False).fillna(False).astype(bool)
+            view = self.df[mask]
+        else:
+            view = self.df
+        if self.sort_column is not None:
+            view = view.sort_values(self.sort_column, ascending=self.sort_ascending, kind="stable", key=_sort_key)
+        self.view = view
+        self.offset = 0
+        self.count_label.config(text=f"{len(self.view)} of {len(self.df)} rows")
+        self.refresh()
+
+    def _schedule_filter(self, event=None):
+        # Filter once typing pauses rather than on every keystroke
+        if self._filter_job is not None:
+            self.tree.after_cancel(self._filter_job)
+        self._filter_job = self.tree.after(250, self.apply_filter)
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_ascending = not self.sort_ascending
+        else:
+            self.sort_column, self.sort_ascending = column, True
+        for col in self.df.columns:
+            arrow = (" \u25b2" if self.sort_ascending else " \u25bc") if col == column else ""
+            self.tree.heading(col, text=f"{col}{arrow}")
+        self.apply_filter()
+
+    def refresh(self):
+        """Fill the item pool with the rows at the current offset"""
+        page = self.view.iloc[self.offset:self.offset + self.visible_rows]
+        rows = [["" if pd.isna(value) else value for value in row] for row in page.itertuples(index=False)]
+
+        # Grow or shrink the item pool to the number of rows on screen
+        while len(self.items) < len(rows):
+            self.items.append(self.tree.insert("", tk.END))
+        while len(self.items) > len(rows):
+            self.tree.delete(self.items.pop())
+        for item, values in zip(self.items, rows):
+            self.tree.item(item, values=values)
+
+        total = len(self.view)
+        if total:
+            self.ysb.set(self.offset / total, min(1.0, (self.offset + self.visible_rows) / total))
+        else:
+            self.ysb.set(0, 1)
+
+    def scroll_to(self, offset):
+        max_offset = max(0, len(self.view) - self.visible_rows)
+        offset = min(max(0, int(offset)), max_offset)
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * len(self.view))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll_to(self.offset + int(amount) * step)
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll_to(self.offset - 3 * delta)
+
+    def _on_resize(self, event):
+        visible = max(1, event.height // self.ROW_HEIGHT - 1)  # minus the heading row
+        if visible != self.visible_rows:
+            self.visible_rows = visible
+            self.scroll_to(self.offset)
+            self.refresh()
+
+
+# Upper bound on simultaneous SMTP connections per provider (providers throttle or
+# reject logins beyond these)
+PROVIDER_CONNECTION_LIMITS = {
+    'smtp.gmail.com': 3,
+    'smtp.office365.com': 3,
+    'smtp-mail.outlook.com': 3,
+}
+DEFAULT_CONNECTION_LIMIT = 10
+
+
+def connection_limit_for(smtp_server):
+    """Maximum concurrent connections allowed for an SMTP host"""
+    return PROVIDER_CONNECTION_LIMITS.get((smtp_server or "").lower(), DEFAULT_CONNECTION_LIMIT)
+
+
+def delivery_error(exc, gmail_mode=False):
+    """Error detail reported for a failed send"""
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        if gmail_mode:
+            return ("Gmail authentication failed. Possible causes:\n"
+                    "1. Need App Password (if 2FA enabled)\n"
+                    "2. 'Less secure apps' not enabled\n"
+                    "3. Unlock captcha required\n"
+                    f"Technical details: {str(exc)}")
+        return f"SMTP Authentication Failed: {str(exc)}"
+    return f"Error: {str(exc)}"
+
+
+# Ports where the server expects plain SMTP upgraded with STARTTLS
+STARTTLS_PORTS = (25, 587, 2525)
+
+
+def smtp_security_for(smtp_port):
+    """Pick the transport security for a server port: STARTTLS on submission ports, otherwise SSL"""
+    return "starttls" if smtp_port in STARTTLS_PORTS else "ssl"
+
+
+class SMTPSession:
+    """Persistent authenticated SMTP connection shared by a whole campaign
+
+    Connects and logs in once, then sends many messages over the same
+    session. Idle connections are probed with NOOP, the transaction state is
+    reset with RSET after a failed message, the connection is transparently
+    re-opened on SMTPServerDisconnected and rotated after
+    ``max_messages`` sends so long campaigns don't hit per-connection limits.
+    When the server advertises PIPELINING, MAIL FROM, every RCPT TO and DATA
+    go out in one write and their replies are read back together, so a
+    message costs two round trips however many recipients it has.
+    """
+
+    def __init__(self, host, port, username, password, security="ssl",
+                 max_messages=100, keepalive_interval=30, timeout=60, ca_file=None, metrics=None,
+                 pipelining=True):
+        self.host = host
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.security = security
+        self.max_messages = max_messages
+        self.keepalive_interval = keepalive_interval
+        self.timeout = timeout
+        self.ca_file = ca_file
+        self.metrics = metrics
+        self.pipelining = pipelining
+
+        self.server = None
+        self.messages_on_connection = 0
+        self.last_activity = 0.0
+        self.needs_reset = False
+        self.connections_opened = 0
+        self.last_reply_code = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def connect(self):
+        """Open the TCP/TLS connection and authenticate"""
+        self.close()
+        context = ssl.create_default_context(cafile=self.ca_file)
+        started = time.perf_counter()
+        if self.security == "ssl":
+            server = smtplib.SMTP_SSL(self.host, self.port, context=context, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == "starttls":
+                server.starttls(context=context)
+        # Large TLS messages span several records; don't let Nagle hold the last one back
+        server.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.metrics is not None:
+            self.metrics.observe('connect', time.perf_counter() - started)
+        try:
+            if self.username and self.password:
+                started = time.perf_counter()
+                server.login(self.username, self.password)
+                if self.metrics is not None:
+                    self.metrics.observe('login', time.perf_counter() - started)
+        except Exception:
+            server.close()
+            raise
+
+        self.server = server
+        self.messages_on_connection = 0
+        self.needs_reset = False
+        self.last_activity = time.monotonic()
+        self.connections_opened += 1
+        logging.debug(f"Opened SMTP connection #{self.connections_opened} to {self.host}:{self.port}")
+
+    def close(self):
+        """Politely end the session, ignoring errors from dead connections"""
+        server, self.server = self.server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _is_alive(self):
+        """NOOP the server if the connection has been idle too long"""
+        if time.monotonic() - self.last_activity < self.keepalive_interval:
+            return True
+        try:
+            code, _ = self.server.noop()
+            return code == 250
+        except smtplib.SMTPException:
+            return False
+
+    def _ensure_connection(self):
+        """Make sure an authenticated, clean session is ready for the next message"""
+        if self.server is None:
+            self.connect()
+        elif self.messages_on_connection >= self.max_messages:
+            logging.debug(f"Rotating SMTP connection after {self.messages_on_connection} messages")
+            self.connect()
+        elif not self._is_alive():
+            self.connect()
+        elif self.needs_reset:
+            try:
+                self.server.rset()
+                self.needs_reset = False
+            except smtplib.SMTPServerDisconnected:
+                self.connect()
+
+    def send(self, msg, from_addr=None, to_addrs=None):
+        """Send one message (email.message or raw bytes), reconnecting once if the server dropped us"""
+        self.last_reply_code = None
+        for attempt in (1, 2):
+            self._ensure_connection()
+            started = time.perf_counter()
+            refused = {}
+            try:
+                if isinstance(msg, bytes):
+                    refused = self._sendmail(from_addr, to_addrs, msg)
                 else:
-                    return False, "Gmail requires port 465 (SSL) or 587 (TLS)"            
-            # Regular SMTP handling
-            else:
-                with smtplib.SMTP_SSL(smtp_server, smtp_port, context=context) as server:
-                    server.login(sender_email, password)
-                    server.send_message(msg)            
-            return True, None
-                
-        except smtplib.SMTPAuthenticationError as e:
-            if self.gmail_mode.get():
-                return False, ("Gmail authentication failed. Possible causes:\n"
-                            "1. Need App Password (if 2FA enabled)\n"
-                            "2. 'Less secure apps' not enabled\n"
-                            "3. Unlock captcha required\n"
-                            f"Technical details: {str(e)}")
+                    refused = self.server.send_message(msg, from_addr, to_addrs)
+            except smtplib.SMTPServerDisconnected:
+                self.server = None
+                if attempt == 2:
+                    raise
+                logging.info(f"SMTP server {self.host} disconnected, reconnecting")
+                continue
+            except smtplib.SMTPException as e:
+                self.last_reply_code = smtp_error_code(e)
+                self.needs_reset = True
+                if isinstance(e, smtplib.SMTPRecipientsRefused):
+                    refused = e.recipients
+                raise
+            finally:
+                self.last_activity = time.monotonic()
+                if self.metrics is not None:
+                    self.metrics.observe('send', time.perf_counter() - started)
+                    # Every refused RCPT counts, not just the reply that ended the transaction
+                    for code in [code for code, _ in refused.values()] or [self.last_reply_code]:
+                        self.metrics.count_reply(code)
+
+            self.messages_on_connection += 1
+            self.last_reply_code = 250
+            if self.metrics is not None:
+                self.metrics.count_reply(250)
+            return refused
+
+    @property
+    def max_recipients(self):
+        """RCPTMAX from the server's LIMITS extension (RFC 9422), or None if it gives none"""
+        if self.server is None:
+            return None
+        match = re.search(r'RCPTMAX=(\d+)', self.server.esmtp_features.get('limits', ''), re.IGNORECASE)
+        return int(match.group(1)) if match else None
+
+    def _sendmail(self, from_addr, to_addrs, msg):
+        server = self.server
+        server.ehlo_or_helo_if_needed()
+        if not (self.pipelining and server.has_extn('pipelining')):
+            return server.sendmail(from_addr, to_addrs, msg)
+
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+        options = f" SIZE={len(msg)}" if server.has_extn('size') else ""
+        commands = [f"MAIL FROM:{smtplib.quoteaddr(from_addr)}{options}"]
+        commands += [f"RCPT TO:{smtplib.quoteaddr(address)}" for address in to_addrs]
+        commands.append("DATA")
+        server.send("".join(command + "\r\n" for command in commands))
+
+        code, response = server.getreply()
+        if code != 250:
+            for _ in range(len(to_addrs) + 1):  # Keep the reply stream in step
+                server.getreply()
+            raise smtplib.SMTPSenderRefused(code, response, from_addr)
+        refused = {}
+        for address in to_addrs:
+            code, response = server.getreply()
+            if code not in (250, 251):
+                refused[address] = (code, response)
+        code, response = server.getreply()
+        if len(refused) == len(to_addrs):
+            if code == 354:
+                # Some servers accept DATA without recipients; an empty message ends it
+                server.send(b".\r\n")
+                server.getreply()
+            raise smtplib.SMTPRecipientsRefused(refused)
+        if code != 354:
+            raise smtplib.SMTPDataError(code, response)
+
+        data = re.sub(rb'(?m)^\.', b'..', msg)
+        if not data.endswith(b"\r\n"):
+            data += b"\r\n"
+        server.send(data + b".\r\n")
+        code, response = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+        return refused
+
+
+def smtp_error_code(exc):
+    """Extract the SMTP reply code carried by an smtplib exception, if any"""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in exc.recipients.values()]
+        return min(codes) if codes else None
+    return getattr(exc, 'smtp_code', None)
+
+
+# Sending quotas per mode. Gmail's published limits are 500 messages/day for
+# consumer accounts; the per-minute cap keeps bursts under its abuse heuristics.
+RATE_LIMIT_PRESETS = {
+    'gmail': {'per_minute': 20, 'per_hour': None, 'per_day': 500},
+    'smtp': {'per_minute': 60, 'per_hour': 1000, 'per_day': None},
+}
+
+# Reply codes meaning "slow down / try later" rather than a real failure
+THROTTLE_CODES = (421, 450, 451, 452)
+
+
+class TokenBucket:
+    """Token bucket holding up to ``capacity`` tokens refilled evenly over ``period`` seconds"""
+
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now, tokens=1):
+        """Seconds until ``tokens`` tokens are available (a full bucket always suffices)"""
+        self._refill(now)
+        needed = min(tokens, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def consume(self, tokens=1):
+        # May go negative for batches bigger than the bucket; later sends then wait it off
+        self.tokens -= tokens
+
+
+class RateLimiter:
+    """Thread-safe pacing shared by all send workers
+
+    Combines per-minute, per-hour and per-day token buckets, so a send only
+    waits as long as the tightest quota requires, plus an adaptive backoff
+    that kicks in when the server answers with a throttling code (421/450/451/452)
+    and decays again after successful sends.
+    """
+
+    PERIODS = {'per_minute': 60, 'per_hour': 3600, 'per_day': 86400}
+
+    def __init__(self, per_minute=None, per_hour=None, per_day=None, spacing=None,
+                 backoff_initial=30, backoff_max=900):
+        self.limits = {'per_minute': per_minute, 'per_hour': per_hour, 'per_day': per_day}
+        self.buckets = [
+            TokenBucket(limit, self.PERIODS[name])
+            for name, limit in self.limits.items() if limit
+        ]
+        # Even pacing: at most one send every ``spacing`` seconds, with no burst
+        self.spacing = spacing
+        if spacing:
+            self.buckets.append(TokenBucket(1, spacing))
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.backoff = 0.0
+        self.backoff_until = 0.0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_mode(cls, gmail_mode, overrides=None, **backoff):
+        """Build a limiter from the Gmail or generic SMTP preset"""
+        limits = dict(RATE_LIMIT_PRESETS['gmail' if gmail_mode else 'smtp'])
+        limits.update(overrides or {})
+        return cls(**limits, **backoff)
+
+    def describe(self):
+        parts = [f"{limit} {name.replace('_', ' ')}" for name, limit in self.limits.items() if limit]
+        if self.spacing:
+            parts.append(f"1 every {self.spacing:.1f}s")
+        return ", ".join(parts) or "unlimited"
+
+    def acquire(self, stop_event=None, tokens=1):
+        """Block until a send (to ``tokens`` recipients) is allowed; returns False if stop_event was set while waiting"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = max([self.backoff_until - now] + [b.wait_time(now, tokens) for b in self.buckets])
+                if wait <= 0:
+                    for bucket in self.buckets:
+                        bucket.consume(tokens)
+                    return True
+
+            # Sleep in short slices so a stop request is honoured promptly
+            if stop_event is not None:
+                if stop_event.wait(min(wait, 1.0)):
+                    return False
             else:
-                return False, f"SMTP Authentication Failed: {str(e)}"
+                time.sleep(min(wait, 1.0))
+
+    def report(self, reply_code):
+        """Feed the outcome of a send back into the adaptive backoff"""
+        with self.lock:
+            if reply_code in THROTTLE_CODES:
+                self.backoff = min(self.backoff_max, self.backoff * 2 or self.backoff_initial)
+                self.backoff_until = time.monotonic() + self.backoff
+                logging.warning(f"Server throttling (code {reply_code}), backing off {self.backoff:.0f}s")
+            elif reply_code == 250 and self.backoff:
+                self.backoff /= 2
+                if self.backoff < 1:
+                    self.backoff = 0.0
+
+
+class SendEngine:
+    """Concurrent send engine: a pool of worker threads draining a shared job queue
+
+    Every worker owns its own SMTP session (from ``session_factory``) and calls
+    ``send_func(session, job)`` for each job it pulls, which must return
+    ``(ok, error_detail)``. Jobs are produced lazily by a feeder thread into a
+    bounded queue, and results come back through ``drain()`` so the caller's
+    thread (e.g. the Tk loop) is the only one touching the UI.
+
+    ``pause()`` holds every worker before its next message and ``cancel()``
+    stops feeding; queued jobs are then dropped without being sent.
+    """
+
+    def __init__(self, session_factory, send_func, workers=1, rate_limiter=None,
+                 max_retries=2, queue_size=None, metrics=None, job_cost=None):
+        self.session_factory = session_factory
+        self.send_func = send_func
+        self.workers = max(1, int(workers))
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.metrics = metrics
+        self.job_cost = job_cost  # Rate limiter tokens a job uses (recipients); 1 when not given
+        self.jobs = queue.Queue(maxsize=queue_size or self.workers * 4)
+        self.results = queue.Queue()
+        self.worker_stats = []
+        self.feed_error = None
+        self.unpaused = threading.Event()
+        self.unpaused.set()
+        self.cancelled = threading.Event()
+        self._threads = []
+
+    def pause(self):
+        self.unpaused.clear()
+
+    def resume(self):
+        self.unpaused.set()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.unpaused.set()
+
+    def start(self, jobs=None):
+        """Start the worker threads, plus a feeder thread for an iterable of jobs
+
+        Without ``jobs`` the caller feeds the queue with ``put()`` and must
+        call ``close()`` when there are no more jobs.
+        """
+        for worker_id in range(1, self.workers + 1):
+            stats = {'worker': worker_id, 'sent': 0, 'failed': 0, 'busy_time': 0.0}
+            self.worker_stats.append(stats)
+            thread = threading.Thread(target=self._work, args=(stats,),
+                                      name=f"smtp-worker-{worker_id}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+        if jobs is not None:
+            feeder = threading.Thread(target=self._feed, args=(jobs,), name="smtp-feeder", daemon=True)
+            self._threads.append(feeder)
+            feeder.start()
+
+    def put(self, job):
+        """Queue one job, blocking while the queue is full"""
+        self.jobs.put(job)
+
+    def close(self):
+        """Tell every worker to exit once the queued jobs are done"""
+        for _ in range(self.workers):
+            self.jobs.put(None)
+
+    def _feed(self, jobs):
+        try:
+            for job in jobs:
+                if self.cancelled.is_set():
+                    break
+                self.jobs.put(job)
         except Exception as e:
-            return False, f"Error: {str(e)}"
-        
-def load_contacts(file_path):
+            self.feed_error = e
+            logging.error(f"Error preparing messages: {str(e)}")
+        finally:
+            self.close()
 
-    """Load and validate contacts with logging"""
-    try:
-        df = pd.read_excel(file_path)
-        df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
-        valid_contacts = df[df['Email Contacto'].str.contains('@', na=False)]
-        invalid_count = len(df) - len(valid_contacts)
-        
-        if invalid_count > 0:
-            logging.warning(f"Filtered out {invalid_count} invalid contacts")
-        
-        return valid_contacts.to_dict('records')
-    except Exception as e:
-        logging.error(f"Error loading contacts: {str(e)}")
-        raise
+    def _work(self, stats):
+        session = self.session_factory()
+        try:
+            while True:
+                if self.metrics is not None:
+                    self.metrics.set_queue_depth(self.jobs.qsize())
+                    with self.metrics.timer('queue_wait'):
+                        job = self.jobs.get()
+                else:
+                    job = self.jobs.get()
+                if job is None:
+                    break
+                self.unpaused.wait()
+                if self.cancelled.is_set():
+                    continue
 
+                ok = None
+                for attempt in range(self.max_retries + 1):
+                    waited = time.perf_counter()
+                    tokens = self.job_cost(job) if self.job_cost is not None else 1
+                    if not self.rate_limiter.acquire(stop_event=self.cancelled, tokens=tokens):
+                        break
+                    if self.metrics is not None:
+                        self.metrics.observe('rate_wait', time.perf_counter() - waited)
+                    started = time.monotonic()
+                    try:
+                        ok, detail = self.send_func(session, job)
+                    except Exception as e:
+                        logging.debug(traceback.format_exc())
+                        ok, detail = False, f"Unexpected error: {str(e)}"
+                    stats['busy_time'] += time.monotonic() - started
 
+                    # Throttled sends back off and are retried instead of failing the contact
+                    self.rate_limiter.report(session.last_reply_code)
+                    if ok or session.last_reply_code not in THROTTLE_CODES:
+                        break
 
+                if ok is None:  # Cancelled while waiting for the rate limiter
+                    continue
+                stats['sent' if ok else 'failed'] += 1
+                self.results.put((job, ok, detail, stats['worker'], session.last_reply_code))
+        finally:
+            session.close()
 
-if __name__ == "__main__":
-    root = tk.Tk()
-    app = EmailCampaignApp(root)
-    root.mainloop()
\ No newline at end of file
+    def is_running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def drain(self):
+        """Yield every result that is ready without blocking"""
+        while True:
+            try:
+                yield self.results.get_nowait()
+            except queue.Empty:
+                return
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+
+class ThroughputMeter:
+    """Messages/second and ETA for a running campaign, excluding paused time"""
+
+    def __init__(self):
+        self.started = None
+        self.paused_at = None
+        self.paused_total = 0.0
+        self.count = 0
+
+    def start(self):
+        self.started = time.monotonic()
+
+    def pause(self):
+        if self.paused_at is None:
+            self.paused_at = time.monotonic()
+
+    def resume(self):
+        if self.paused_at is not None:
+            self.paused_total += time.monotonic() - self.paused_at
+            self.paused_at = None
+
+    def record(self, count=1):
+        self.count += count
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        now = self.paused_at if self.paused_at is not None else time.monotonic()
+        return now - self.started - self.paused_total
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def describe(self, remaining=None):
+        rate = self.rate()
+        text = f"{rate:.2f} msgs/sec"
+        if remaining is not None and rate > 0:
+            eta = int(max(0, remaining) / rate)
+            text += f" - ETA {eta // 3600:d}:{eta % 3600 // 60:02d}:{eta % 60:02d}"
+        return text
+
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus-style, cumulative on export)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets + (self.max,), self.counts):
+            if count and seen + count >= rank:
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+            lower = upper
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'sum': round(self.sum, 6),
+                'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+                'p50': round(self.quantile(0.5), 6), 'p99': round(self.quantile(0.99), 6),
+                'max': round(self.max, 6)}
+
+
+class CampaignMetrics:
+    """Per-stage timings, SMTP reply codes and queue depth for one campaign
+
+    Stages: ``prepare`` (reading the sheet header and row count), ``build``
+    (the once-per-campaign template build), ``load``
+    (pulling the next contact from the streamed file), ``dns`` (looking up
+    the new recipient domains of a block of contacts), ``render``
+    (templating and message building), ``queue_wait`` (a worker waiting for a
+    message), ``rate_wait`` (limiter sleeps), ``connect`` (TCP + TLS),
+    ``login``, ``send`` (MAIL/RCPT/DATA) and ``report``. Recording is a lock,
+    a bisect and a few additions, so it stays on in production. Export with
+    ``to_prometheus()``, ``summary()`` or ``write(path)``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.reply_codes = {}
+        self.queue_depth = 0
+        self.queue_depth_max = 0
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def timed_iter(self, iterable, stage):
+        """Iterate, recording how long each next() takes"""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - started)
+            yield item
+
+    def count_reply(self, code):
+        if code is None:
+            return
+        with self.lock:
+            self.reply_codes[code] = self.reply_codes.get(code, 0) + 1
+
+    def set_queue_depth(self, depth):
+        self.queue_depth = depth
+        if depth > self.queue_depth_max:
+            self.queue_depth_max = depth
+
+    def summary(self):
+        with self.lock:
+            return {
+                'stages': {stage: histogram.summary() for stage, histogram in self.histograms.items()},
+                'smtp_replies': {str(code): count for code, count in sorted(self.reply_codes.items())},
+                'queue_depth': self.queue_depth,
+                'queue_depth_max': self.queue_depth_max,
+            }
+
+    def to_prometheus(self, prefix="email_campaign"):
+        """Prometheus text exposition format (for node_exporter's textfile collector)"""
+        lines = [f"# HELP {prefix}_stage_seconds Time spent per campaign stage",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        with self.lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for upper, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{upper}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            lines += [f"# HELP {prefix}_smtp_replies_total SMTP reply codes received",
+                      f"# TYPE {prefix}_smtp_replies_total counter"]
+            for code, count in sorted(self.reply_codes.items()):
+                lines.append(f'{prefix}_smtp_replies_total{{code="{code}"}} {count}')
+
+            lines += [f"# HELP {prefix}_queue_depth Messages rendered and waiting for a worker",
+                      f"# TYPE {prefix}_queue_depth gauge",
+                      f"{prefix}_queue_depth {self.queue_depth}",
+                      f"# HELP {prefix}_queue_depth_max Highest queue depth seen",
+                      f"# TYPE {prefix}_queue_depth_max gauge",
+                      f"{prefix}_queue_depth_max {self.queue_depth_max}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write Prometheus text (.prom/.txt) or a JSON summary (anything else)"""
+        metrics_dir = os.path.dirname(path)
+        if metrics_dir:
+            os.makedirs(metrics_dir, exist_ok=True)
+        if path.endswith(('.prom', '.txt')):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.summary(), indent=2)
+        # Write then rename so a scraper never reads a half-written file
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+
+    def describe(self):
+        """One line per stage for the campaign log"""
+        return [f"{stage}: {h['count']} x {h['mean'] * 1000:.2f} ms avg, p99 {h['p99'] * 1000:.2f} ms, "
+                f"{h['sum']:.2f}s total"
+                for stage, h in self.summary()['stages'].items()]
+
+
+class SendJournal:
+    """Crash-safe per-recipient delivery log backed by SQLite in WAL mode
+
+    Each recipient of a campaign has one row whose state moves through
+    queued -> sent / failed, and later bounced when a bounce report names the
+    address. Writes are committed in batches (every ``batch_size`` records or
+    ``flush_interval`` seconds), so a crash loses at most one batch, and
+    ``sent_addresses()`` gives resume a set for O(1) membership checks.
+    """
+
+    STATES = ('queued', 'sent', 'failed', 'bounced')
+
+    def __init__(self, path, campaign="default", batch_size=50, flush_interval=1.0):
+        journal_dir = os.path.dirname(path)
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+        self.path = path
+        self.campaign = campaign
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS deliveries (
+                campaign TEXT NOT NULL,
+                email TEXT NOT NULL,
+                state TEXT NOT NULL,
+                detail TEXT,
+                updated_at TEXT NOT NULL,
+                sender TEXT,
+                sent_at TEXT,
+                PRIMARY KEY (campaign, email)
+            )
+        """)
+        # Journals written before sender pools have no sender or sent_at column
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(deliveries)")}
+        if 'sender' not in columns:
+            self.db.execute("ALTER TABLE deliveries ADD COLUMN sender TEXT")
+        if 'sent_at' not in columns:
+            self.db.execute("ALTER TABLE deliveries ADD COLUMN sent_at TEXT")
+            self.db.execute("UPDATE deliveries SET sent_at = updated_at WHERE state = 'sent'")
+        self.db.execute("DROP INDEX IF EXISTS deliveries_sender")
+        self.db.execute("CREATE INDEX IF NOT EXISTS deliveries_sent_at ON deliveries (sender, sent_at)")
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def record(self, email, state, detail=None, sender=None):
+        """Set the state of one recipient, committing when the batch is full"""
+        if state not in self.STATES:
+            raise ValueError(f"Unknown journal state: {state}")
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO deliveries (campaign, email, state, detail, updated_at, sender, sent_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (campaign, email) DO UPDATE SET state = excluded.state, "
+                "detail = excluded.detail, updated_at = excluded.updated_at, "
+                "sender = COALESCE(excluded.sender, deliveries.sender), "
+                "sent_at = COALESCE(excluded.sent_at, deliveries.sent_at)",
+                (self.campaign, normalize_email(email), state, detail, now, sender,
+                 now if state == 'sent' else None)
+            )
+            self.pending += 1
+            if self.pending >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+                self._commit()
+
+    def _commit(self):
+        self.db.commit()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self._commit()
+
+    def close(self):
+        with self.lock:
+            self._commit()
+            self.db.close()
+
+    def sent_addresses(self):
+        """Addresses this campaign already delivered to"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT email FROM deliveries WHERE campaign = ? AND state IN ('sent', 'bounced')",
+                (self.campaign,)
+            )
+            return {email for (email,) in rows}
+
+    def mark_bounced(self, emails):
+        """Flag bounced addresses in every campaign that sent to them; returns rows updated"""
+        with self.lock:
+            cursor = self.db.executemany(
+                "UPDATE deliveries SET state = 'bounced', updated_at = ? WHERE email = ?",
+                [(datetime.now().isoformat(timespec='seconds'), normalize_email(email)) for email in emails]
+            )
+            self._commit()
+            return cursor.rowcount
+
+    def sent_today(self, sender):
+        """Messages a sender delivered since midnight, across every campaign in this journal
+
+        Counted on ``sent_at``, which a later bounce doesn't change, so bounces
+        imported today are charged to the day their message went out.
+        """
+        today = datetime.now().date().isoformat()
+        with self.lock:
+            (count,) = self.db.execute(
+                "SELECT COUNT(*) FROM deliveries WHERE sender = ? AND state IN ('sent', 'bounced') "
+                "AND sent_at >= ?", (normalize_email(sender), today)
+            ).fetchone()
+            return count
+
+    def counts(self):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT state, COUNT(*) FROM deliveries WHERE campaign = ? GROUP BY state", (self.campaign,)
+            )
+            return dict(rows)
+
+
+def normalize_email(email):
+    return str(email).strip().lower()
+
+
+def campaign_id_for(config):
+    """Stable id for a campaign: the same contact sheet and template resume the same journal"""
+    if config.get('campaign_id'):
+        campaign = config['campaign_id']
+    else:
+        key = "|".join(os.path.abspath(config[name]) for name in ('excel_file', 'html_template'))
+        campaign = hashlib.sha1(key.encode()).hexdigest()[:16]
+    # Test sends all go to the sender, so they must never count as sent to the contacts
+    return f"{campaign}-test" if config.get('test_mode') else campaign
+
+
+# Permanent, recipient-specific SMTP rejections (mailbox unknown, not local,
+# bad address); auth and content errors are not the recipient's fault
+PERMANENT_RECIPIENT_CODES = (550, 551, 553)
+_ENHANCED_STATUS_RE = re.compile(r'\s*([245])\.(\d{1,3})\.(\d{1,3})\b')
+
+
+def mailbox_rejected(code, response):
+    """Whether an RCPT TO refusal says the mailbox itself is bad, so it can be suppressed
+
+    Only the recipient stage counts: a 550 to MAIL FROM or DATA is about the
+    sender or the message (spam, blocklists, policy). When the reply has an
+    enhanced status code it must be 5.1.x (bad destination address).
+    """
+    if code not in PERMANENT_RECIPIENT_CODES:
+        return False
+    if isinstance(response, bytes):
+        response = response.decode('utf-8', 'replace')
+    status = _ENHANCED_STATUS_RE.match(response or "")
+    return status is None or status.group(1, 2) == ('5', '1')
+
+
+class SuppressionList:
+    """Persistent index of addresses that must not be mailed again
+
+    Backed by an SQLite table keyed by normalized address. Bounce imports,
+    hard failures and unsubscribes add to it; a campaign loads it once into
+    an in-memory set so checking a contact is a single hash lookup.
+    """
+
+    def __init__(self, path):
+        suppression_dir = os.path.dirname(path)
+        if suppression_dir:
+            os.makedirs(suppression_dir, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS suppressed (
+                email TEXT PRIMARY KEY,
+                reason TEXT NOT NULL,
+                source TEXT,
+                added_at TEXT NOT NULL
+            )
+        """)
+        self.db.commit()
+        self.addresses = {email for (email,) in self.db.execute("SELECT email FROM suppressed")}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __contains__(self, email):
+        return normalize_email(email) in self.addresses
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def add(self, emails, reason, source=None):
+        """Suppress addresses; returns how many were new"""
+        new = {normalize_email(email) for email in emails} - self.addresses
+        if not new:
+            return 0
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO suppressed (email, reason, source, added_at) VALUES (?, ?, ?, ?)",
+                [(email, reason, source, now) for email in new]
+            )
+            self.db.commit()
+            self.addresses |= new
+        return len(new)
+
+    def remove(self, emails):
+        """Lift the suppression of addresses; returns how many were removed"""
+        gone = {normalize_email(email) for email in emails} & self.addresses
+        with self.lock:
+            self.db.executemany("DELETE FROM suppressed WHERE email = ?", [(email,) for email in gone])
+            self.db.commit()
+            self.addresses -= gone
+        return len(gone)
+
+    def reasons(self):
+        """Number of suppressed addresses per reason"""
+        with self.lock:
+            return dict(self.db.execute("SELECT reason, COUNT(*) FROM suppressed GROUP BY reason"))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+# DNS record types and the response code the domain check tells apart (RFC 1035, 3596)
+DNS_TYPE_A = 1
+DNS_TYPE_MX = 15
+DNS_TYPE_AAAA = 28
+DNS_NXDOMAIN = 3
+
+
+# Used when the system's nameservers can't be found
+PUBLIC_NAMESERVERS = ("1.1.1.1", "8.8.8.8")
+
+
+def system_nameservers(path="/etc/resolv.conf"):
+    """Nameserver addresses from resolv.conf, or on Windows the registry; may be empty"""
+    if os.name == 'nt':
+        return _windows_nameservers()
+    servers = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == "nameserver":
+                    servers.append(fields[1])
+    except OSError:
+        pass
+    return servers
+
+
+def _windows_nameservers():
+    """Static and DHCP nameservers of every network interface, from the registry"""
+    import winreg
+    servers = []
+    try:
+        params = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SYSTEM\CurrentControlSet\Services\Tcpip\Parameters")
+        keys = [params]
+        interfaces = winreg.OpenKey(params, "Interfaces")
+        for i in range(winreg.QueryInfoKey(interfaces)[0]):
+            keys.append(winreg.OpenKey(interfaces, winreg.EnumKey(interfaces, i)))
+    except OSError:
+        return servers
+    for key in keys:
+        for name in ("NameServer", "DhcpNameServer"):
+            try:
+                value = winreg.QueryValueEx(key, name)[0]
+            except OSError:
+                continue
+            servers += str(value).replace(",", " ").split()
+    return list(dict.fromkeys(servers))
+
+
+def email_domain(email):
+    return email.rpartition('@')[2].lower()
+
+
+def _skip_dns_name(data, offset):
+    """Offset just past the (possibly compressed) domain name at offset"""
+    while True:
+        length = data[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        offset += length + 1
+
+
+class DNSResolver:
+    """Just enough of a DNS client to ask whether a domain can receive mail
+
+    Queries the nameservers over UDP for MX records, then A/AAAA (the
+    implicit MX of RFC 5321). ``nameservers`` are addresses, optionally
+    with a port ("127.0.0.1:5353", "[::1]:53"); by default the system's
+    (see system_nameservers).
+    """
+
+    def __init__(self, nameservers=None, timeout=2.0, attempts=2):
+        self.nameservers = [self._address(spec) for spec in nameservers or system_nameservers()]
+        self.timeout = timeout
+        self.attempts = attempts
+
+    @staticmethod
+    def _address(spec):
+        if spec.startswith('['):
+            host, _, port = spec[1:].partition(']')
+            return host, int(port.lstrip(':') or 53)
+        if spec.count(':') == 1:
+            host, port = spec.split(':')
+            return host, int(port)
+        return spec, 53
+
+    def lookup(self, domain):
+        """``(status, detail)``: 'ok' if the domain takes mail, 'missing' if it
+        can't, 'unknown' when there was no conclusive answer (timeout, SERVFAIL)"""
+        try:
+            labels = domain.rstrip('.').encode('idna').split(b'.')
+        except UnicodeError:
+            return 'missing', "Invalid domain name"
+        if not all(0 < len(label) < 64 for label in labels):
+            return 'missing', "Invalid domain name"
+        try:
+            rcode, records = self.query(labels, DNS_TYPE_MX)
+            if rcode == DNS_NXDOMAIN:
+                return 'missing', "Domain does not exist"
+            if rcode != 0:
+                return 'unknown', f"DNS error {rcode}"
+            if records is None:
+                return 'ok', "MX"
+            if records:
+                # A lone "0 ." MX says the domain never accepts mail (RFC 7505)
+                if all(rdata[2:] == b'\x00' for rdata in records):
+                    return 'missing', "Domain accepts no mail (null MX)"
+                return 'ok', "MX"
+            for qtype, label in ((DNS_TYPE_A, "A"), (DNS_TYPE_AAAA, "AAAA")):
+                rcode, records = self.query(labels, qtype)
+                if rcode not in (0, DNS_NXDOMAIN):
+                    return 'unknown', f"DNS error {rcode}"
+                if (rcode == 0 and records is None) or records:
+                    return 'ok', label
+        except (OSError, IndexError) as e:
+            return 'unknown', str(e) or type(e).__name__
+        return 'missing', "No MX or A record"
+
+    def query(self, labels, qtype):
+        """``(rcode, records)``: the rdata of each answer of qtype, None if truncated
+
+        Raises OSError when no nameserver answers.
+        """
+        if not self.nameservers:
+            raise OSError("No DNS servers configured")
+        query_id = os.urandom(2)
+        question = b''.join(bytes([len(label)]) + label for label in labels) + b'\x00'
+        packet = (query_id + b'\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00'  # Recursion desired, one question
+                  + question + qtype.to_bytes(2, 'big') + b'\x00\x01')
+        error = None
+        for _ in range(self.attempts):
+            for host, port in self.nameservers:
+                try:
+                    return self._parse(self._exchange(host, port, packet), qtype)
+                except OSError as e:
+                    error = e
+        raise error
+
+    def _exchange(self, host, port, packet):
+        family, _, _, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(address)
+            sock.send(packet)
+            while True:
+                response = sock.recv(4096)
+                if response[:2] == packet[:2]:  # Ignore late answers to earlier attempts
+                    return response
+
+    @staticmethod
+    def _parse(response, qtype):
+        flags = int.from_bytes(response[2:4], 'big')
+        rcode = flags & 0x000F
+        if flags & 0x0200:
+            # Truncated: the answer didn't fit in a datagram, so there is one
+            return rcode, None
+        questions = int.from_bytes(response[4:6], 'big')
+        answers = int.from_bytes(response[6:8], 'big')
+        offset = 12
+        for _ in range(questions):
+            offset = _skip_dns_name(response, offset) + 4
+        records = []
+        for _ in range(answers):
+            offset = _skip_dns_name(response, offset)
+            rtype = int.from_bytes(response[offset:offset + 2], 'big')
+            length = int.from_bytes(response[offset + 8:offset + 10], 'big')
+            offset += 10
+            if rtype == qtype:  # CNAMEs on the way are skipped
+                records.append(response[offset:offset + length])
+            offset += length
+        return rcode, records
+
+
+class DomainChecker:
+    """Drops contacts whose domain can't receive mail, looking each domain up once
+
+    The distinct domains of each block of contacts are looked up
+    concurrently with ``resolver(domain) -> (status, detail)`` (by default
+    DNSResolver.lookup). Answers are kept in a JSON file, 'ok' ones for
+    ``ttl`` seconds and 'missing' ones for at most MISSING_TTL in case the
+    domain gets fixed, so later campaigns only look up new domains.
+    'unknown' answers are neither cached nor a reason to drop a contact.
+    """
+
+    MISSING_TTL = 86400
+
+    def __init__(self, cache_file=None, ttl=7 * 86400, resolver=None, workers=32, metrics=None, clock=time.time):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.resolver = resolver or DNSResolver().lookup
+        self.workers = max(1, int(workers))
+        self.metrics = metrics
+        self.clock = clock
+        self.cache = {}
+        self.changed = False
+        self.stats = {'domains': 0, 'looked_up': 0, 'unknown': 0, 'dropped': 0}
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.debug(f"Ignoring unreadable domain cache {cache_file}: {str(e)}")
+
+    def _resolve(self, domain):
+        try:
+            return tuple(self.resolver(domain))
+        except Exception as e:
+            return 'unknown', str(e)
+
+    def check(self, domains):
+        """{domain: (status, detail)}, looking up the ones not cached concurrently"""
+        now = self.clock()
+        results = {}
+        pending = []
+        for domain in set(domains):
+            entry = self.cache.get(domain)
+            if entry is not None and entry['expires'] > now:
+                results[domain] = entry['status'], entry['detail']
+            else:
+                pending.append(domain)
+        self.stats['domains'] += len(results) + len(pending)
+        if not pending:
+            return results
+
+        started = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.workers, len(pending)),
+                                                   thread_name_prefix="dns") as executor:
+            results.update(zip(pending, executor.map(self._resolve, pending)))
+        if self.metrics is not None:
+            self.metrics.observe('dns', time.perf_counter() - started)
+
+        now = self.clock()
+        for domain in pending:
+            status, detail = results[domain]
+            self.stats['looked_up'] += 1
+            if status == 'unknown':
+                self.stats['unknown'] += 1
+                continue
+            ttl = self.ttl if status == 'ok' else min(self.ttl, self.MISSING_TTL)
+            self.cache[domain] = {'status': status, 'detail': detail, 'expires': now + ttl}
+            self.changed = True
+        return results
+
+    def filter(self, contacts, on_drop=None, block_size=1000):
+        """Yield the contacts whose domain can receive mail, in order
+
+        Dropped contacts are passed to ``on_drop(contact, detail)``.
+        """
+        contacts = iter(contacts)
+        while True:
+            block = list(itertools.islice(contacts, block_size))
+            if not block:
+                return
+            results = self.check(email_domain(contact['Email Contacto']) for contact in block)
+            self.save()
+            for contact in block:
+                status, detail = results[email_domain(contact['Email Contacto'])]
+                if status == 'missing':
+                    self.stats['dropped'] += 1
+                    if on_drop is not None:
+                        on_drop(contact, detail)
+                    continue
+                yield contact
+
+    def save(self):
+        """Write the cache, without expired entries, if anything new was learned"""
+        if not self.cache_file or not self.changed:
+            return
+        now = self.clock()
+        self.cache = {domain: entry for domain, entry in self.cache.items() if entry['expires'] > now}
+        try:
+            cache_dir = os.path.dirname(self.cache_file) or "."
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f)
+            os.replace(temp_path, self.cache_file)
+            self.changed = False
+        except OSError as e:
+            logging.debug(f"Could not save domain cache {self.cache_file}: {str(e)}")
+
+    def describe(self):
+        return (f"{self.stats['domains']} domains checked, {self.stats['looked_up']} looked up "
+                f"({self.stats['unknown']} unanswered), {self.stats['dropped']} contacts dropped")
+
+
+def encode_config(data_dict: dict) -> str:
+    """Obfuscate config data with base64"""
+    if not data_dict:
+        raise ValueError("Config data cannot be empty")
+    json_str = json.dumps(data_dict)
+    return base64.b64encode(json_str.encode()).decode()
+
+
+def decode_config(encoded_str: str) -> dict:
+    """Decode base64-obfuscated config"""
+    if not encoded_str:
+        raise ValueError("Encoded string cannot be empty")
+    try:
+        decoded = base64.b64decode(encoded_str.encode()).decode()
+        return json.loads(decoded)
+    except Exception as e:
+        raise ValueError(f"Decoding failed: {str(e)}")
+
+
+# Placeholders kept for templates written before any column could be used
+TEMPLATE_ALIASES = {
+    'name': 'Nombre Contacto',
+    'company': 'Nombre Empresa',
+}
+
+_PLACEHOLDER_RE = re.compile(r'\{\{\s*(.*?)\s*\}\}', re.DOTALL)
+_MISSING = object()
+
+
+def format_template_value(value):
+    """Turn a spreadsheet cell into text (empty for blanks, no '.0' on whole numbers)"""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return None
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+class CompiledTemplate:
+    """Template parsed once into literal text and placeholder slots
+
+    Any ``{{Column Name}}`` from the contact sheet can be used, with an
+    optional default after a pipe: ``{{Nombre Empresa|your company}}``.
+    Rendering fills the slots and does a single join, so personalizing a
+    message never rescans the template text.
+    """
+
+    def __init__(self, text, escape=True):
+        self.text = text
+        self.escape = escape
+        self._parts = []
+        self._slots = []  # (position in _parts, lookup keys, default)
+
+        pieces = _PLACEHOLDER_RE.split(text)
+        for i, piece in enumerate(pieces):
+            if i % 2 == 0:
+                self._parts.append(piece)
+                continue
+            key, _, default = piece.partition('|')
+            key = key.strip()
+            keys = (key, TEMPLATE_ALIASES[key]) if key in TEMPLATE_ALIASES else (key,)
+            self._slots.append((len(self._parts), keys, default.strip()))
+            self._parts.append(None)
+
+    @property
+    def placeholders(self):
+        return [keys[0] for _, keys, _ in self._slots]
+
+    def missing_placeholders(self, columns, context=None):
+        """Placeholders that neither the given columns nor the context can fill"""
+        available = set(columns) | set(context or ())
+        return [keys[0] for _, keys, default in self._slots
+                if not default and not any(key in available for key in keys)]
+
+    def render(self, contact, context=None):
+        parts = self._parts[:]
+        for position, keys, default in self._slots:
+            value = _MISSING
+            for key in keys:
+                value = contact.get(key, _MISSING)
+                if value is _MISSING and context:
+                    value = context.get(key, _MISSING)
+                if value is not _MISSING:
+                    break
+            text = format_template_value(value) if value is not _MISSING else None
+            if not text:
+                text = default
+            elif self.escape:
+                text = html.escape(text)
+            parts[position] = text
+        return ''.join(parts)
+
+
+# Whitespace next to these tags is never rendered, so minifying drops it
+_BLOCK_TAGS = r'(?:html|head|body|title|meta|link|style|table|thead|tbody|tfoot|tr|td|th|div|p|h[1-6]|ul|ol|li|center|br|hr|blockquote)'
+_BLOCK_TAG_RE = re.compile(r'\s*(</?' + _BLOCK_TAGS + r'\b(?:"[^"]*"|\'[^\']*\'|[^\'">])*>)\s*', re.IGNORECASE)
+_COMMENT_RE = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)  # Outlook conditional comments are kept
+# Quoted attribute values may contain '>'
+_TAG_BODY = r'(?:"[^"]*"|\'[^\']*\'|[^\'"<>])'
+_STYLE_BLOCK_RE = re.compile(r'<style\b' + _TAG_BODY + r'*>(.*?)</style>', re.DOTALL | re.IGNORECASE)
+_START_TAG_RE = re.compile(r'<([a-zA-Z][\w-]*)((?:\s+' + _TAG_BODY + r'*?)?)(\s*/?)>')
+_ANY_TAG_RE = re.compile(r'<' + _TAG_BODY + r'+>')
+# Selectors simple enough to inline: tag, .class, tag.class, #id
+_SIMPLE_SELECTOR_RE = re.compile(r'^([a-zA-Z][\w-]*)?(?:\.([\w-]+)|#([\w-]+))?$')
+_PRESERVE_RE = re.compile(r'<(pre|textarea)\b.*?</\1>', re.DOTALL | re.IGNORECASE)
+
+
+def _protect(pattern, text, store, mark):
+    """Swap matches for opaque tokens so later rewrites leave them alone"""
+    def stash(match):
+        store.append(match.group(0))
+        return f"\x00{mark}{len(store) - 1}\x00"
+    return pattern.sub(stash, text)
+
+
+def _restore(text, store, mark):
+    return re.sub(f'\x00{mark}(\\d+)\x00', lambda match: store[int(match.group(1))], text)
+
+
+def _split_css_rules(css):
+    """(selector, declarations) pairs of a stylesheet, at-rules as (rule, None)"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    rules = []
+    i = 0
+    while i < len(css):
+        brace = css.find('{', i)
+        if brace == -1:
+            break
+        selector = css[i:brace].strip()
+        depth, j = 1, brace + 1
+        while j < len(css) and depth:
+            depth += {'{': 1, '}': -1}.get(css[j], 0)
+            j += 1
+        if selector.startswith('@'):
+            rules.append((css[i:j].strip(), None))
+        else:
+            rules.append((selector, css[brace + 1:j - 1].strip().rstrip(';')))
+        i = j
+    return rules
+
+
+def _compact_style(style):
+    return re.sub(r'\s*([:;,])\s*', r'\1', ' '.join(style.split())).strip(';')
+
+
+def inline_css(html_text):
+    """Move simple <style> rules into style="" attributes, as most webmail clients drop <style>
+
+    Rules are applied in specificity order and an element's own style=""
+    still wins. At-rules (@media) and selectors that need a real CSS engine
+    (descendants, pseudo-classes) stay in a <style> block.
+    """
+    blocks = _STYLE_BLOCK_RE.findall(html_text)
+    if not blocks:
+        return html_text
+    inlined = []  # (specificity, order, tag, class, id, declarations)
+    kept = []
+    for selector, declarations in _split_css_rules('\n'.join(blocks)):
+        if declarations is None:
+            kept.append(selector)
+            continue
+        leftovers = []
+        for part in selector.split(','):
+            part = part.strip()
+            match = _SIMPLE_SELECTOR_RE.match(part)
+            if not part or not match:
+                leftovers.append(part)
+                continue
+            tag, cls, ident = match.groups()
+            specificity = (1 if ident else 0, 1 if cls else 0, 1 if tag else 0)
+            inlined.append((specificity, len(inlined), (tag or '').lower(), cls, ident, declarations))
+        if leftovers:
+            kept.append(f"{', '.join(leftovers)} {{{declarations}}}")
+    inlined.sort(key=lambda rule: rule[:2])
+
+    def apply(match):
+        tag, attrs, close = match.group(1).lower(), match.group(2), match.group(3)
+        if tag in ('style', 'script', 'head', 'html', 'meta', 'link', 'title'):
+            return match.group(0)
+        classes = set((re.search(r'(?:^|\s)class\s*=\s*["\']([^"\']*)', attrs) or [None, ''])[1].split())
+        ident = (re.search(r'(?:^|\s)id\s*=\s*["\']([^"\']*)', attrs) or [None, None])[1]
+        styles = [declarations for _, _, rule_tag, rule_class, rule_id, declarations in inlined
+                  if (not rule_tag or rule_tag == tag) and (not rule_class or rule_class in classes)
+                  and (not rule_id or rule_id == ident)]
+        if not styles:
+            return match.group(0)
+        existing = re.search(r'(?:^|\s)style\s*=\s*(?:"([^"]*)"|\'([^\']*)\')', attrs)
+        if existing:
+            styles.append(existing.group(1) if existing.group(1) is not None else existing.group(2))
+            attrs = attrs[:existing.start()] + attrs[existing.end():]
+        style = '; '.join(style.strip().rstrip(';') for style in styles)
+        return f'<{match.group(1)}{attrs.rstrip()} style="{style}"{close}>'
+
+    body = _STYLE_BLOCK_RE.sub('', html_text)
+    body = _START_TAG_RE.sub(apply, body)
+    if kept:
+        style_block = "<style>" + "\n".join(kept) + "</style>"
+        if re.search(r'</head>', body, re.IGNORECASE):
+            body = re.sub(r'</head>', lambda _: style_block + "</head>", body, count=1, flags=re.IGNORECASE)
+        else:
+            body = style_block + body
+    return body
+
+
+def minify_html(html_text):
+    """Drop comments and whitespace that can't change how the email renders"""
+    preserved = []
+    text = _protect(_PRESERVE_RE, html_text, preserved, 'k')
+    text = _COMMENT_RE.sub('', text)
+    text = ' '.join(text.split())
+    text = _BLOCK_TAG_RE.sub(r'\1', text)
+    text = re.sub(r'\bstyle="([^"]*)"', lambda match: f'style="{_compact_style(match.group(1))}"', text)
+    return _restore(text, preserved, 'k').strip()
+
+
+def html_to_text(html_text):
+    """Plain-text rendering of an HTML email for its text/plain alternative"""
+    body = re.search(r'<body\b' + _TAG_BODY + r'*>(.*)</body>', html_text, re.DOTALL | re.IGNORECASE)
+    text = body.group(1) if body else html_text
+    text = re.sub(r'<(head|style|script|title)\b.*?</\1>', '', text, flags=re.DOTALL | re.IGNORECASE)
+    text = re.sub(r'<!--.*?-->', '', text, flags=re.DOTALL)
+    text = ' '.join(text.split())
+
+    def link(match):
+        href, label = match.group(1), _ANY_TAG_RE.sub('', match.group(2)).strip()
+        if not label or href.startswith('#') or href.lower().startswith(('mailto:', 'tel:')) \
+                or href.rstrip('/') == label.rstrip('/'):
+            return label or href
+        return f"{label} ({href})"
+    text = re.sub(r'<a\b' + _TAG_BODY + r'*?\shref\s*=\s*["\']([^"\']*)["\']' + _TAG_BODY + r'*>(.*?)</a>',
+                  link, text, flags=re.DOTALL | re.IGNORECASE)
+    text = re.sub(r'<br\s*/?>', '\n', text, flags=re.IGNORECASE)
+    text = re.sub(r'<li\b' + _TAG_BODY + r'*>', '\n- ', text, flags=re.IGNORECASE)
+    text = re.sub(r'</?(p|div|h[1-6]|table|blockquote|ul|ol)\b' + _TAG_BODY + r'*>', '\n\n', text, flags=re.IGNORECASE)
+    text = re.sub(r'</tr\s*>', '\n', text, flags=re.IGNORECASE)
+    text = re.sub(r'</t[dh]\s*>', ' ', text, flags=re.IGNORECASE)
+    text = html.unescape(_ANY_TAG_RE.sub('', text))
+    lines = [' '.join(line.split()) for line in text.split('\n')]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip() + '\n'
+
+
+class TemplateBuild:
+    """An HTML template prepared once per campaign for sending
+
+    CSS from <style> blocks is inlined, the HTML is minified and a
+    plain-text alternative is derived from it; ``{{placeholders}}`` pass
+    through untouched. Builds are cached by a hash of the template source,
+    so a template used again (another campaign, another sender) is free.
+    """
+
+    VERSION = 1
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, source):
+        self.source = source
+        placeholders = []
+        protected = _protect(_PLACEHOLDER_RE, source, placeholders, 'p')
+        self.html = _restore(minify_html(inline_css(protected)), placeholders, 'p')
+        self.text = _restore(html_to_text(protected), placeholders, 'p')
+
+    @classmethod
+    def key(cls, source):
+        return hashlib.sha256(f"{cls.VERSION}\0{source}".encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get(cls, source):
+        """The build of this template source, from the cache when it was built before"""
+        key = cls.key(source)
+        with cls._cache_lock:
+            build = cls._cache.get(key)
+        if build is None:
+            build = cls(source)
+            with cls._cache_lock:
+                if len(cls._cache) >= 32:
+                    cls._cache.clear()
+                cls._cache[key] = build
+        return build
+
+    def describe(self):
+        source, built = len(self.source.encode('utf-8')), len(self.html.encode('utf-8'))
+        return (f"HTML {source / 1024:.1f} KB -> {built / 1024:.1f} KB "
+                f"({100 - built * 100 // max(source, 1)}% smaller), text part {len(self.text.encode('utf-8')) / 1024:.1f} KB")
+
+
+def encode_header(name, value):
+    """Fold and RFC 2047-encode one header line as CRLF-terminated bytes"""
+    value = ' '.join(str(value).splitlines())  # No header injection from contact data
+    try:
+        value.encode('ascii')
+        charset = 'us-ascii'
+    except UnicodeEncodeError:
+        charset = 'utf-8'
+    encoded = Header(value, charset, header_name=name).encode(linesep='\r\n')
+    return f"{name}: {encoded}\r\n".encode('ascii')
+
+
+class MessageBuilder:
+    """Builds raw ``multipart/alternative`` HTML messages for sendmail()
+
+    Everything that is the same for every recipient (From, MIME headers,
+    boundary, part headers) is encoded once when the builder is created. When
+    the subject or body templates have no placeholders their encoded form is
+    cached too, so a message is a handful of byte joins. With a
+    ``text_template`` a text/plain part comes before the HTML one. Parts are
+    quoted-printable, which for mostly-ASCII HTML is far smaller than base64.
+    """
+
+    def __init__(self, sender_email, sender_name, html_template=None, subject_template=None, context=None,
+                 text_template=None):
+        self.html_template = html_template
+        self.subject_template = subject_template
+        self.text_template = text_template
+        self.context = context
+
+        boundary = f"==============={int.from_bytes(os.urandom(8), 'big'):019d}==".encode('ascii')
+        self._head = (b'Content-Type: multipart/alternative; boundary="' + boundary + b'"\r\n'
+                      b'MIME-Version: 1.0\r\n')
+        self._from = encode_header('From', formataddr((sender_name, sender_email)))
+        self._text_head = self._part_header(boundary, b'text/plain')
+        self._part_head = self._part_header(boundary, b'text/html')
+        self._tail = b'\r\n--' + boundary + b'--\r\n'
+
+        # Templates without placeholders render the same for everyone
+        self._static_subject = None
+        if subject_template is not None and not subject_template.placeholders:
+            self._static_subject = encode_header('Subject', subject_template.render({}, context))
+        self._static_body = None
+        if html_template is not None and not html_template.placeholders:
+            self._static_body = self.encode_body(html_template.render({}, context))
+        self._static_text = None
+        if text_template is not None and not text_template.placeholders:
+            self._static_text = self.encode_body(text_template.render({}, context))
+
+    @staticmethod
+    def _part_header(boundary, content_type):
+        return (b'\r\n--' + boundary + b'\r\n'
+                b'Content-Type: ' + content_type + b'; charset="utf-8"\r\n'
+                b'MIME-Version: 1.0\r\n'
+                b'Content-Transfer-Encoding: quoted-printable\r\n\r\n')
+
+    @staticmethod
+    def encode_body(content):
+        data = content.encode('utf-8').replace(b'\r\n', b'\n').replace(b'\n', b'\r\n')
+        encoded = binascii.b2a_qp(data, istext=True)
+        # binascii matches the data's line ends; a single line (minified HTML) gets bare-LF soft breaks
+        return encoded if b'\r\n' in data else encoded.replace(b'\n', b'\r\n')
+
+    def build(self, recipient_email, subject, html_content, text_content=None):
+        """Raw message for explicit subject and HTML (and optional plain) text"""
+        text = self.encode_body(text_content) if text_content is not None else None
+        return self._assemble(encode_header('Subject', subject), recipient_email,
+                              self.encode_body(html_content), text)
+
+    def render(self, contact, recipient_email):
+        """Raw message for one contact from the builder's templates"""
+        subject = self._static_subject or encode_header('Subject', self.subject_template.render(contact, self.context))
+        body = self._static_body or self.encode_body(self.html_template.render(contact, self.context))
+        text = None
+        if self.text_template is not None:
+            text = self._static_text or self.encode_body(self.text_template.render(contact, self.context))
+        return self._assemble(subject, recipient_email, body, text)
+
+    @property
+    def shared(self):
+        """True when every recipient gets the same subject and body"""
+        return (self._static_subject is not None and self._static_body is not None
+                and (self.text_template is None or self._static_text is not None))
+
+    def render_shared(self):
+        """One message for many recipients, who are only named in RCPT TO (like Bcc)"""
+        return self._assemble(self._static_subject, "undisclosed-recipients:;", self._static_body, self._static_text)
+
+    def _assemble(self, subject, recipient_email, body, text=None):
+        parts = [self._head, subject, self._from, encode_header('To', recipient_email)]
+        if text is not None:
+            parts += [self._text_head, text]
+        parts += [self._part_head, body, self._tail]
+        return b''.join(parts)
+
+
+def report_value(value):
+    """Cell value for a CSV/JSONL report row (blank for missing and NaN)"""
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return value
+
+
+class FailureLog:
+    """Append-only CSV or JSON Lines file of contacts that were not sent
+
+    The column schema is fixed when the log is created (the contact sheet's
+    columns plus the error fields), rows are written and flushed as they
+    happen so a crash keeps every failure recorded so far, and the file is
+    only created on the first write. Unless ``append`` is set, the previous
+    run's file is removed up front; appended logs are tidied with
+    ``prune()``. ``read()`` loads it back for the optional Excel conversion
+    at the end of a campaign.
+    """
+
+    def __init__(self, path, columns, append=False):
+        self.path = path
+        self.columns = list(dict.fromkeys(columns))
+        self.append = append
+        self.format = 'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv'
+        self.count = 0
+        self.file = None
+        self.writer = None
+        self.lock = threading.Lock()
+        if not append and os.path.exists(path):
+            os.remove(path)
+
+    def _open(self):
+        log_dir = os.path.dirname(self.path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        self.file = open(self.path, 'a' if self.append else 'w', newline='', encoding='utf-8')
+        if self.format == 'csv':
+            self.writer = csv.DictWriter(self.file, fieldnames=self.columns, extrasaction='ignore')
+            if self.file.tell() == 0:
+                self.writer.writeheader()
+
+    def _write_row(self, record):
+        row = {column: report_value(record.get(column)) for column in self.columns}
+        if self.writer is not None:
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        self.count += 1
+
+    def write(self, record):
+        """Append one row and flush it to disk"""
+        self.write_many([record])
+
+    def write_many(self, records):
+        with self.lock:
+            if self.file is None:
+                self._open()
+            for record in records:
+                self._write_row(record)
+            self.file.flush()
+
+    def exists(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def read(self):
+        """The whole log as a DataFrame (empty with the schema's columns if nothing was written)"""
+        if not self.exists():
+            return pd.DataFrame(columns=self.columns)
+        if self.format == 'csv':
+            return pd.read_csv(self.path, dtype=str, keep_default_na=False)
+        return pd.read_json(self.path, lines=True, dtype=False)
+
+    def prune(self, delivered=(), key='Email Contacto'):
+        """Rewrite the log without repeats and without rows for ``delivered`` addresses
+
+        Rows are matched on the ``key`` column, keeping each address's latest
+        row, or on the whole row when ``key`` is None. Returns the rows left.
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+                self.writer = None
+            if not self.exists():
+                return 0
+            df = self.read()
+            if key is not None and key in df.columns:
+                addresses = df[key].map(normalize_email)
+                keep = ~addresses.isin(set(delivered)) & ~addresses.duplicated(keep='last')
+                df = df[keep]
+            else:
+                df = df.drop_duplicates()
+            if df.empty:
+                os.remove(self.path)
+                return 0
+            tmp_path = self.path + '.tmp'
+            if self.format == 'csv':
+                df.to_csv(tmp_path, index=False, encoding='utf-8')
+            else:
+                df.to_json(tmp_path, orient='records', lines=True, force_ascii=False)
+            os.replace(tmp_path, self.path)
+            return len(df)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+                self.writer = None
+
+
+def rejects_log_path(failure_log):
+    """Where rejected and suppressed contacts go, next to the failure log"""
+    root, ext = os.path.splitext(failure_log)
+    return f"{root}_rejected{ext}"
+
+
+class SenderAccount:
+    """One sending account or relay in a campaign's sender pool
+
+    ``config`` is the campaign config with this account's settings laid over
+    it, so anything an account doesn't set (server, port, connections, rate
+    limits, daily quota...) comes from the campaign. ``daily_quota`` caps how
+    many messages the account sends per day; ``remaining`` counts down from
+    what is left of it today (None means unlimited).
+    """
+
+    SETTINGS = ('sender_email', 'sender_name', 'password', 'smtp_server', 'smtp_port', 'smtp_security',
+                'smtp_ca_file', 'gmail_mode', 'connections', 'rate_limits', 'daily_quota')
+
+    def __init__(self, settings, campaign_config):
+        unknown = set(settings) - set(self.SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown sender settings: {', '.join(sorted(unknown))}")
+        self.config = dict(campaign_config)
+        self.config.update(settings)
+        self.email = self.config['sender_email']
+        self.daily_quota = self.config['daily_quota']
+        self.remaining = self.daily_quota
+        self.assigned = 0
+        self.message_builder = None
+        self.shared_message = None
+        self.send_engine = None
+
+    def take(self):
+        self.assigned += 1
+        if self.remaining is not None:
+            self.remaining -= 1
+
+    @property
+    def exhausted(self):
+        return self.remaining is not None and self.remaining <= 0
+
+
+class SenderPool:
+    """Shards the contact stream across sender accounts
+
+    ``round_robin`` hands contacts to the accounts in turn. ``quota`` is a
+    smooth weighted round robin on each account's remaining daily quota, so
+    an account with twice the room left gets twice the contacts, interleaved
+    rather than in runs. Accounts at their quota are skipped, and ``next()``
+    returns None once every account is used up.
+    """
+
+    STRATEGIES = ('round_robin', 'quota')
+
+    def __init__(self, accounts, strategy="round_robin"):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown sender strategy: {strategy} (use {' or '.join(self.STRATEGIES)})")
+        self.accounts = list(accounts)
+        self.strategy = strategy
+        self.position = 0
+        self.current = [0.0] * len(self.accounts)
+
+    def next(self):
+        """Pick the account for the next contact and charge it against its quota"""
+        available = [i for i, account in enumerate(self.accounts) if not account.exhausted]
+        if not available:
+            return None
+        if self.strategy == "round_robin":
+            index = min(available, key=lambda i: (i - self.position) % len(self.accounts))
+            self.position = index + 1
+        else:
+            # Unlimited accounts weigh as much as the roomiest limited one
+            finite = [self.accounts[i].remaining for i in available if self.accounts[i].remaining is not None]
+            unlimited_weight = max(finite) if finite else 1
+            weights = {i: self.accounts[i].remaining if self.accounts[i].remaining is not None else unlimited_weight
+                       for i in available}
+            for i, weight in weights.items():
+                self.current[i] += weight
+            index = max(available, key=lambda i: self.current[i])
+            self.current[index] -= sum(weights.values())
+        account = self.accounts[index]
+        account.take()
+        return account
+
+
+# Everything a campaign needs, independent of any UI
+DEFAULT_CAMPAIGN_CONFIG = {
+    'excel_file': "",
+    'html_template': "",
+    'sender_email': "",
+    'sender_name': "",
+    'password': "",
+    'subject': "About our services",
+    'smtp_server': "smtp.gmail.com",
+    'smtp_port': 465,
+    'smtp_security': None,                    # 'ssl', 'starttls' or 'none'; derived from the port when None
+    'smtp_ca_file': None,                     # Extra CA bundle, e.g. for a local test server's certificate
+    'gmail_mode': False,
+    'test_mode': False,
+    'failure_log': "reports/failed_contacts.csv",     # Appended as failures happen (.csv or .jsonl)
+    'failure_report': "reports/failed_contacts.xlsx",  # Excel copy of the logs at the end; None to skip
+    'smtp_max_messages_per_connection': 100,  # Rotate connection after this many sends
+    'smtp_keepalive_interval': 30,            # Seconds idle before a NOOP probe
+    'connections': 3,                         # Concurrent SMTP connections
+    'rate_limits': None,                      # Override the Gmail/SMTP preset, e.g. {'per_minute': 20}
+    'throttle_backoff': 30,                   # Seconds to pause after the first 421/450/451/452 reply
+    'throttle_backoff_max': 900,              # Cap on the pause as throttling replies keep coming
+    'journal_file': "reports/send_journal.db",
+    'campaign_id': None,                      # Defaults to a hash of the contact and template paths
+    'resume': False,                          # Skip contacts the journal already has as sent
+    'suppression_file': "data/suppression.db",
+    'contact_cache_dir': "data/.contact_cache",  # Parsed copies of Excel contact files; None to disable
+    'check_domains': True,                    # Drop contacts whose domain has no MX/A record before rendering
+    'dns_servers': None,                      # e.g. ["127.0.0.1:5353"]; None uses the system's, else public ones
+    'domain_cache_file': "data/domain_cache.json",
+    'domain_cache_ttl': 7 * 86400,            # Seconds a domain lookup is trusted (at most a day when missing)
+    'senders': None,                          # Sender pool: list of per-account settings (see SenderAccount)
+    'daily_quota': None,                      # Messages per sender per day (a sender's own setting wins)
+    'send_until': None,                       # Epoch seconds: spread the day's quota until then, then stop
+    'send_windows': None,                     # Scheduler windows, e.g. ["mon-fri 09:00-18:00"] (local time)
+    'schedule_state_file': "reports/schedule_state.json",
+    'sender_strategy': "round_robin",         # How contacts are sharded across senders: round_robin or quota
+    'max_recipients_per_message': 1,          # >1: send non-personalized templates once to up to this many recipients
+    'build_template': True,                   # Inline CSS, minify and add a plain-text part once per campaign
+    'metrics_file': "reports/campaign_metrics.json"  # .prom/.txt for Prometheus text; None to skip
+}
+
+
+class CampaignEngine:
+    """Widget-free campaign core shared by the GUI and the command line
+
+    Takes a plain config dict (see DEFAULT_CAMPAIGN_CONFIG) and reports what
+    it is doing through ``on_event(event, data)``: ``'log'`` events carry a
+    message and level, ``'result'`` events carry one send outcome. Without a
+    callback, events go to the standard logging module.
+
+    Use ``run()`` for a blocking campaign, or ``prepare()``/``start()`` then
+    ``process_results()`` until ``is_running()`` is false and ``finish()``
+    when the caller has its own loop to keep alive. ``run()`` also emits
+    ``'prepared'`` (with the estimated total) and ``'finished'`` (with the
+    summary) so it can run in a background thread; ``pause()``, ``resume()``
+    and ``cancel()`` are safe to call from any thread.
+    """
+
+    def __init__(self, config, on_event=None):
+        self.config = dict(DEFAULT_CAMPAIGN_CONFIG)
+        self.config.update(config)
+        self.on_event = on_event
+        self.contacts = iter(())
+        self.columns = []
+        self.expected_total = None
+        self.queued = 0
+        self.load_stats = {}
+        self.already_sent = set()
+        self.html_template = None
+        self.text_template = None
+        self.subject_template = None
+        self.template_context = {}
+        self.accounts = []
+        self.sender_pool = None
+        self.dispatcher = None
+        self.feed_error = None
+        self.quota_reached = False
+        self.window_closed = False
+        self.failed = 0
+        self.sent = 0
+        self.skipped = 0
+        self.journal = None
+        self.closed = False
+        self.suppression = None
+        self.suppressed = 0
+        self.domain_checker = None
+        self.bad_domains = 0
+        self.failure_log = None
+        self.rejects_log = None
+        self.paused = False
+        self.cancelled = False
+        self.metrics = CampaignMetrics()
+
+    def emit(self, event, **data):
+        if self.on_event is not None:
+            self.on_event(event, data)
+        elif event == 'log':
+            self.logger.log(getattr(logging, data['level']), data['message'])
+
+    @property
+    def logger(self):
+        return logging.getLogger()
+
+    def log(self, message, level="INFO"):
+        self.emit('log', message=message, level=level)
+
+    def validate(self):
+        """Raise ValueError if the config can't run a campaign"""
+        required = ('excel_file', 'html_template', 'smtp_server')
+        if not self.config['senders']:
+            required += ('sender_email', 'password')
+        missing = [key for key in required if not self.config.get(key)]
+        if missing:
+            raise ValueError(f"Missing required settings: {', '.join(missing)}")
+        for sender in self.config['senders'] or [self.config]:
+            email = sender.get('sender_email') or "(unnamed sender)"
+            if not sender.get('sender_email') or not sender.get('password'):
+                raise ValueError(f"Sender {email} needs a sender_email and a password")
+            gmail_mode = sender.get('gmail_mode', self.config['gmail_mode'])
+            if gmail_mode and int(sender.get('smtp_port', self.config['smtp_port'])) not in (465, 587):
+                raise ValueError(f"Gmail requires port 465 (SSL) or 587 (TLS) (sender {email})")
+
+    def prepare(self):
+        """Validate config, load contacts and template; returns the number of contacts"""
+        self.validate()
+        self.log(f"Loading contacts from {self.config['excel_file']}", "INFO")
+        with self.metrics.timer('prepare'):
+            cache_dir = self.config['contact_cache_dir']
+            self.columns = read_contact_columns(self.config['excel_file'], cache_dir)
+            if 'Email Contacto' not in self.columns:
+                raise ValueError("Contact file has no 'Email Contacto' column")
+            self.expected_total = count_contact_rows(self.config['excel_file'], cache_dir)
+        # Failures are streamed to disk as they happen, with the sheet's columns captured once here
+        append = bool(self.config['resume'])
+        self.failure_log = FailureLog(self.config['failure_log'], list(self.columns) + ['Error', 'Timestamp'], append)
+        self.rejects_log = FailureLog(rejects_log_path(self.config['failure_log']),
+                                      list(self.columns) + ['Reason'], append)
+        if self.config['failure_report'] and os.path.exists(self.config['failure_report']):
+            os.remove(self.config['failure_report'])  # Rebuilt from the logs by finish()
+        self.load_stats = {}
+        contacts = iter_contacts(self.config['excel_file'], stats=self.load_stats,
+                                 on_rejects=lambda rejects: self.rejects_log.write_many(rejects.to_dict('records')),
+                                 cache_dir=cache_dir)
+        self.contacts = self.metrics.timed_iter(contacts, 'load')
+
+        self.domain_checker = None
+        if self.config['check_domains']:
+            nameservers = self.config['dns_servers'] or system_nameservers()
+            if not nameservers:
+                nameservers = list(PUBLIC_NAMESERVERS)
+                self.log(f"No system DNS servers found; checking recipient domains with {', '.join(nameservers)}",
+                         "INFO")
+            resolver = DNSResolver(nameservers)
+            # The sender's own domain receives the bounces, so a resolver that says otherwise
+            # (offline, or a sinkhole answering NXDOMAIN for everything) can't be trusted either
+            sender_domain = email_domain((self.config['senders'] or [self.config])[0]['sender_email'])
+            status, detail = resolver.lookup(sender_domain)
+            if status == 'ok':
+                # Each block of contacts has its new domains looked up together before any is rendered
+                self.domain_checker = DomainChecker(self.config['domain_cache_file'], self.config['domain_cache_ttl'],
+                                                    resolver.lookup, metrics=self.metrics)
+                self.contacts = self.domain_checker.filter(self.contacts, on_drop=self._drop_bad_domain)
+            else:
+                self.log(f"Recipient domains won't be checked: DNS lookup of {sender_domain} failed ({detail})",
+                         "WARNING")
+
+        self.journal = SendJournal(self.config['journal_file'], campaign_id_for(self.config))
+        self.already_sent = self.journal.sent_addresses() if self.config['resume'] else set()
+        if self.already_sent:
+            self.log(f"Resuming campaign: {len(self.already_sent)} contacts were already sent", "INFO")
+
+        self.suppression = SuppressionList(self.config['suppression_file'])
+        if len(self.suppression):
+            self.log(f"Suppression list has {len(self.suppression)} addresses", "INFO")
+
+        self.log(f"Loading HTML template from {self.config['html_template']}", "INFO")
+        with open(self.config['html_template'], 'r', encoding='utf-8') as f:
+            source = f.read()
+        self.text_template = None
+        if self.config['build_template']:
+            with self.metrics.timer('build'):
+                build = TemplateBuild.get(source)
+            self.log(f"Template built: {build.describe()}", "INFO")
+            source = build.html
+            self.text_template = CompiledTemplate(build.text, escape=False)
+        self.html_template = CompiledTemplate(source)
+        self.subject_template = CompiledTemplate(self.config['subject'], escape=False)
+        self.template_context = {
+            'sender_name': self.config['sender_name'],
+            'sender_email': self.config['sender_email'],
+        }
+
+        for template in (self.html_template, self.subject_template):
+            missing = template.missing_placeholders(self.columns, self.template_context)
+            if missing:
+                self.log(f"Placeholders with no matching column will be left empty: {', '.join(missing)}", "WARNING")
+
+        # One account unless a sender pool is configured; each gets its own From line and quota
+        self.accounts = [SenderAccount(settings, self.config) for settings in self.config['senders'] or [{}]]
+        for account in self.accounts:
+            context = dict(self.template_context, sender_name=account.config['sender_name'],
+                           sender_email=account.email)
+            account.message_builder = MessageBuilder(account.email, account.config['sender_name'],
+                                                     self.html_template, self.subject_template, context,
+                                                     self.text_template)
+            if account.daily_quota is not None:
+                account.remaining = max(0, account.daily_quota - self.journal.sent_today(account.email))
+                self.log(f"Sender {account.email}: {account.remaining} of {account.daily_quota} "
+                         f"daily messages left", "INFO")
+        self.sender_pool = SenderPool(self.accounts, self.config['sender_strategy'])
+
+        # Contacts are streamed, so this is an estimate from the file's row count
+        if self.expected_total is None:
+            return None
+        return max(0, self.expected_total - len(self.already_sent))
+
+    def _drop_bad_domain(self, contact, detail):
+        self.bad_domains += 1
+        self.rejects_log.write(dict(contact, Reason=detail))
+
+    def recipient_for(self, contact):
+        if self.config['test_mode']:
+            return self.config['sender_email'] or self.accounts[0].email
+        return contact['Email Contacto']
+
+    def _jobs(self):
+        for contact in self.contacts:
+            if self.already_sent and normalize_email(contact['Email Contacto']) in self.already_sent:
+                self.skipped += 1
+                continue
+            if contact['Email Contacto'] in self.suppression:
+                self.suppressed += 1
+                self.rejects_log.write(dict(contact, Reason='Suppressed'))
+                continue
+            self.queued += 1
+            self.journal.record(contact['Email Contacto'], 'queued')
+            yield {
+                'contact': contact,
+                'recipient': self.recipient_for(contact)
+            }
+
+    def _dispatch(self):
+        """Feeder thread: shard contacts across the sender accounts' queues"""
+        jobs = self._jobs()
+        # Identical messages are grouped per account and sent once with many RCPT TOs
+        batch_size = 1 if self.config['test_mode'] else max(1, int(self.config['max_recipients_per_message'] or 1))
+        batches = {}
+        try:
+            while not self.cancelled:
+                # Take the contact first: running out of quota only matters if one is left
+                job = next(jobs, None)
+                if job is None:
+                    break
+                account = self.sender_pool.next()
+                if account is None:
+                    self.queued -= 1  # Left for Resume, like the rest of the file
+                    self.quota_reached = True
+                    self.log("Every sender has reached its daily quota; "
+                             "the remaining contacts can be sent later with Resume", "WARNING")
+                    break
+                if batch_size > 1 and account.message_builder.shared:
+                    batch = batches.setdefault(account.email, [])
+                    batch.append(job)
+                    if len(batch) >= batch_size:
+                        self._queue_batch(account, batches.pop(account.email))
+                    continue
+                with self.metrics.timer('render'):
+                    job['message'] = account.message_builder.render(job['contact'], job['recipient'])
+                job['account'] = account
+                account.send_engine.put(job)
+            if not self.cancelled:
+                for account in self.accounts:
+                    if batches.get(account.email):
+                        self._queue_batch(account, batches.pop(account.email))
+        except Exception as e:
+            self.feed_error = e
+            logging.error(f"Error preparing messages: {str(e)}")
+        finally:
+            for account in self.accounts:
+                account.send_engine.close()
+
+    def _queue_batch(self, account, jobs):
+        if account.shared_message is None:
+            account.shared_message = account.message_builder.render_shared()
+        account.send_engine.put({'batch': jobs, 'pending': list(jobs), 'outcomes': [],
+                                 'message': account.shared_message, 'account': account})
+
+    def _session_factory(self, account):
+        config = account.config
+        return SMTPSession(
+            config['smtp_server'],
+            config['smtp_port'],
+            account.email,
+            config['password'],
+            security=(config['smtp_security']
+                      or smtp_security_for(int(config['smtp_port']))),
+            max_messages=config['smtp_max_messages_per_connection'],
+            keepalive_interval=config['smtp_keepalive_interval'],
+            ca_file=config['smtp_ca_file'],
+            metrics=self.metrics
+        )
+
+    def _send_job(self, session, job):
+        if 'batch' in job:
+            return self._send_batch(session, job)
+        account = job['account']
+        job['bad_mailbox'] = False
+        try:
+            session.send(job['message'], account.email, job['recipient'])
+            ok, detail = True, None
+        except Exception as e:
+            ok, detail = False, delivery_error(e, account.config['gmail_mode'])
+            if isinstance(e, smtplib.SMTPRecipientsRefused):
+                job['bad_mailbox'] = any(mailbox_rejected(code, response) for code, response in e.recipients.values())
+        # Journal right away from the worker so a crash can't lose a delivered message
+        self.journal.record(job['contact']['Email Contacto'], 'sent' if ok else 'failed', detail,
+                            sender=account.email if ok else None)
+        return ok, detail
+
+    def _send_batch(self, session, job):
+        """Send one shared message to every pending recipient of a batch job
+
+        Accepted and permanently refused recipients move to job['outcomes'];
+        throttled ones stay pending. They are retried at once after partial
+        progress (e.g. 452 too many recipients), taking rate limiter tokens
+        again, otherwise by the send engine after its backoff.
+        """
+        account = job['account']
+        send_engine = account.send_engine
+        retried = 0
+        while job['pending']:
+            # The engine paid for every recipient once; resending deferred ones costs again
+            if retried and not send_engine.rate_limiter.acquire(stop_event=send_engine.cancelled, tokens=retried):
+                return None, "Cancelled"
+            chunk = job['pending'][:session.max_recipients or len(job['pending'])]
+            try:
+                refused = session.send(job['message'], account.email, [sub['recipient'] for sub in chunk])
+            except smtplib.SMTPRecipientsRefused as e:
+                refused = e.recipients
+            except Exception as e:
+                return False, delivery_error(e, account.config['gmail_mode'])
+
+            deferred = []
+            for sub in chunk:
+                if sub['recipient'] not in refused:
+                    job['outcomes'].append((sub, True, None, 250))
+                    self.journal.record(sub['contact']['Email Contacto'], 'sent', sender=account.email)
+                    continue
+                code, response = refused[sub['recipient']]
+                detail = f"Error: {code} {response.decode('utf-8', 'replace') if isinstance(response, bytes) else response}"
+                if code in THROTTLE_CODES:
+                    deferred.append((sub, code, detail))
+                else:
+                    sub['bad_mailbox'] = mailbox_rejected(code, response)
+                    job['outcomes'].append((sub, False, detail, code))
+                    self.journal.record(sub['contact']['Email Contacto'], 'failed', detail)
+
+            job['pending'] = [sub for sub, _, _ in deferred] + job['pending'][len(chunk):]
+            retried = len(deferred)
+            if deferred and len(deferred) == len(chunk):
+                session.last_reply_code = deferred[0][1]
+                return False, deferred[0][2]
+        session.last_reply_code = 250
+        return True, None
+
+    def start(self):
+        """Start sending in background threads"""
+        self.failed = 0
+        self.sent = 0
+        self.queued = 0
+        self.skipped = 0
+        self.suppressed = 0
+        self.bad_domains = 0
+        self.log(f"Starting to send {self.expected_total if self.expected_total is not None else 'all'} emails", "INFO")
+        if len(self.accounts) > 1:
+            self.log(f"Sharding contacts across {len(self.accounts)} senders ({self.config['sender_strategy']})", "INFO")
+        batch_size = int(self.config['max_recipients_per_message'] or 1)
+        if batch_size > 1 and not self.config['test_mode']:
+            if all(account.message_builder.shared for account in self.accounts):
+                self.log(f"Sending one message per {batch_size} recipients", "INFO")
+            else:
+                self.log("The subject or template is personalized: sending one message per contact", "WARNING")
+
+        for account in self.accounts:
+            config = account.config
+            workers = min(int(config['connections']), connection_limit_for(config['smtp_server']))
+            rate_limits = dict(config['rate_limits'] or {})
+            if self.config['send_until'] and account.remaining:
+                # Spread what is left of today's quota evenly over the time left
+                seconds_left = self.config['send_until'] - time.time()
+                if seconds_left > 0:
+                    rate_limits['spacing'] = seconds_left / account.remaining
+            rate_limiter = RateLimiter.for_mode(config['gmail_mode'], rate_limits,
+                                                backoff_initial=config['throttle_backoff'],
+                                                backoff_max=config['throttle_backoff_max'])
+            prefix = f"{account.email}: " if len(self.accounts) > 1 else ""
+            self.log(f"{prefix}Using {workers} concurrent SMTP connection(s)", "INFO")
+            self.log(f"{prefix}Rate limits: {rate_limiter.describe()}", "INFO")
+
+            account.send_engine = SendEngine(lambda account=account: self._session_factory(account), self._send_job,
+                                             workers=workers, rate_limiter=rate_limiter, metrics=self.metrics,
+                                             job_cost=lambda job: len(job['pending']) if 'batch' in job else 1)
+            if self.paused:
+                account.send_engine.pause()
+            if self.cancelled:
+                account.send_engine.cancel()
+            account.send_engine.start()
+
+        self.dispatcher = threading.Thread(target=self._dispatch, name="smtp-dispatcher", daemon=True)
+        self.dispatcher.start()
+
+    def _send_engines(self):
+        return [account.send_engine for account in self.accounts if account.send_engine is not None]
+
+    def is_running(self):
+        if self.dispatcher is not None and self.dispatcher.is_alive():
+            return True
+        return any(send_engine.is_running() for send_engine in self._send_engines())
+
+    def pause(self):
+        self.paused = True
+        for send_engine in self._send_engines():
+            send_engine.pause()
+        self.log("Campaign paused", "INFO")
+
+    def resume(self):
+        self.paused = False
+        for send_engine in self._send_engines():
+            send_engine.resume()
+        self.log("Campaign resumed", "INFO")
+
+    def cancel(self):
+        self.log("Campaign cancelled, waiting for messages in flight", "WARNING")
+        self._stop()
+
+    def _stop(self):
+        self.cancelled = True
+        for send_engine in self._send_engines():
+            send_engine.cancel()
+
+    def check_send_window(self):
+        """Stop sending once ``send_until`` has passed; unsent contacts stay queued for a resume"""
+        send_until = self.config['send_until']
+        if send_until and not self.cancelled and time.time() >= send_until:
+            self.window_closed = True
+            self.log("Send window closed, waiting for messages in flight", "INFO")
+            self._stop()
+
+    def process_results(self):
+        """Record every finished send and yield it as a result dict"""
+        for send_engine in self._send_engines():
+            yield from self._process_engine_results(send_engine)
+
+    def _process_engine_results(self, send_engine):
+        for job, ok, detail, worker, reply_code in send_engine.drain():
+            sender = job['account'].email
+            if 'batch' in job:
+                # Recipients still pending ran out of retries
+                for sub in job['pending']:
+                    self.journal.record(sub['contact']['Email Contacto'], 'failed', detail)
+                outcomes = job['outcomes'] + [(sub, False, detail, reply_code) for sub in job['pending']]
+            else:
+                outcomes = [(job, ok, detail, reply_code)]
+            for sub, ok, detail, reply_code in outcomes:
+                yield self._record_result(sub, sender, ok, detail, worker, reply_code)
+
+    def _record_result(self, job, sender, ok, detail, worker, reply_code):
+        contact = job['contact']
+        result = {'contact': contact, 'recipient': job['recipient'], 'sender': sender,
+                  'ok': ok, 'error': detail, 'worker': worker, 'reply_code': reply_code}
+        via = f"{sender} worker {worker}" if len(self.accounts) > 1 else f"worker {worker}"
+        if ok:
+            self.sent += 1
+            self.log(f"Successfully sent to {job['recipient']} "
+                     f"({contact.get('Nombre Contacto', '')} at {contact.get('Nombre Empresa', '')}) [{via}]", "INFO")
+        else:
+            self.log(f"Failed to send to {job['recipient']}: {detail}", "ERROR")
+            # The server refused this mailbox as nonexistent: never try it again
+            if job.get('bad_mailbox') and not self.config['test_mode']:
+                self.suppression.add([contact['Email Contacto']], 'hard failure', f"SMTP {reply_code}")
+            self.failed += 1
+            self.failure_log.write(dict(contact, Error=detail,
+                                        Timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        self.emit('result', **result)
+        return result
+
+    def close(self):
+        """Stop sending and close the journal, suppression list and logs
+
+        Safe to call more than once. ``finish()`` calls it on the way out, and
+        ``run()`` on any error, so the journal always keeps the sends so far.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self.is_running():
+                self._stop()
+            if self.dispatcher is not None:
+                self.dispatcher.join()
+            for send_engine in self._send_engines():
+                send_engine.join()
+        finally:
+            for resource in (self.journal, self.suppression, self.failure_log, self.rejects_log):
+                if resource is not None:
+                    resource.close()
+            if self.domain_checker is not None:
+                self.domain_checker.save()
+
+    def finish(self):
+        """Collect the last results, write the failure report and return a summary"""
+        try:
+            if self.dispatcher is not None:
+                self.dispatcher.join()
+            for send_engine in self._send_engines():
+                send_engine.join()
+            for _ in self.process_results():
+                pass
+            delivered = self.journal.sent_addresses() if self.config['resume'] else set()
+        finally:
+            self.close()
+
+        if self.feed_error:
+            self.log(f"Stopped queueing messages: {self.feed_error}", "ERROR")
+        for account in self.accounts:
+            prefix = f"{account.email} " if len(self.accounts) > 1 else ""
+            for stats in account.send_engine.worker_stats:
+                self.log(f"{prefix}Worker {stats['worker']}: {stats['sent']} sent, {stats['failed']} failed, "
+                         f"{stats['busy_time']:.1f}s busy", "INFO")
+
+        if self.suppressed:
+            self.log(f"Skipped {self.suppressed} suppressed contacts", "INFO")
+        if self.domain_checker is not None:
+            self.log(f"Recipient domains: {self.domain_checker.describe()}", "INFO")
+            if self.bad_domains:
+                self.log(f"Skipped {self.bad_domains} contacts whose domain can't receive mail", "WARNING")
+        if self.config['resume']:
+            # Earlier runs' rows are still in the logs: keep each contact's latest
+            # failure, and none for contacts that have been delivered since
+            self.failure_log.prune(delivered)
+            self.rejects_log.prune(key=None)
+        if self.failure_log.exists() or self.rejects_log.exists():
+            self.log(f"Failed contacts logged to {self.failure_log.path}, rejected to {self.rejects_log.path}", "INFO")
+            if self.config['failure_report']:
+                with self.metrics.timer('report'):
+                    self.save_failure_report()
+
+        for line in self.metrics.describe():
+            self.log(f"Timing - {line}", "INFO")
+        if self.config['metrics_file']:
+            try:
+                self.metrics.write(self.config['metrics_file'])
+                self.log(f"Metrics saved to {self.config['metrics_file']}", "INFO")
+            except Exception as e:
+                self.log(f"Failed to save metrics: {str(e)}", "WARNING")
+
+        if self.load_stats.get('invalid'):
+            self.log(f"Filtered out {self.load_stats['invalid']} invalid contacts "
+                     f"({self.load_stats['duplicates']} duplicates)", "WARNING")
+        if self.skipped:
+            self.log(f"Skipped {self.skipped} contacts already sent in a previous run", "INFO")
+
+        summary = {'total': self.queued, 'sent': self.sent, 'failed': self.failed,
+                   'skipped': self.skipped, 'suppressed': self.suppressed, 'bad_domains': self.bad_domains,
+                   'cancelled': self.cancelled and not self.window_closed,
+                   'window_closed': self.window_closed, 'quota_reached': self.quota_reached}
+        status = 'paused until the next window' if self.window_closed else 'cancelled' if self.cancelled else 'finished'
+        self.log(f"Campaign {status} - "
+                 f"{summary['sent']} succeeded, {summary['failed']} failed", "INFO")
+        self.emit('finished', summary=summary)
+        return summary
+
+    def run(self):
+        """Run a whole campaign, blocking until it is done"""
+        try:
+            self.emit('prepared', total=self.prepare())
+            self.start()
+            while self.is_running():
+                for _ in self.process_results():
+                    pass
+                self.check_send_window()
+                time.sleep(0.05)
+            return self.finish()
+        finally:
+            self.close()
+
+    def save_failure_report(self):
+        """Convert the streamed failure and reject logs into one Excel workbook"""
+        try:
+            df_failed = self.failure_log.read().reindex(columns=self.failure_log.columns)
+            df_rejected = self.rejects_log.read().reindex(columns=self.rejects_log.columns)
+
+            report_dir = os.path.dirname(self.config['failure_report'])
+            if report_dir:
+                os.makedirs(report_dir, exist_ok=True)
+            with pd.ExcelWriter(self.config['failure_report']) as writer:
+                df_failed.to_excel(writer, sheet_name="Failed", index=False)
+                df_rejected.to_excel(writer, sheet_name="Rejected", index=False)
+            self.log(f"Saved failure report with {len(df_failed)} failed and {len(df_rejected)} rejected "
+                     f"contacts to {self.config['failure_report']}", "INFO")
+        except Exception as e:
+            error_msg = f"Failed to save failure report: {str(e)}"
+            self.log(error_msg, "ERROR")
+            self.log(traceback.format_exc(), "DEBUG")
+
+
+class SendWindows:
+    """Weekly send windows in local time, such as ``"mon-fri 09:00-18:00"``
+
+    A window is an optional day list (``mon-fri``, ``sat,sun``, ``daily``)
+    and a time range; a range ending before it starts runs past midnight
+    (``fri 22:00-02:00``). With no windows every moment is allowed.
+    """
+
+    DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+    SPEC_RE = re.compile(r'^(?:([a-z,\-]+)\s+)?(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})$')
+
+    def __init__(self, specs=None):
+        self.specs = list(specs or [])
+        self.windows = [self.parse(spec) for spec in self.specs]
+
+    @classmethod
+    def parse(cls, spec):
+        """(weekdays, start minute, end minute) for one window spec"""
+        match = cls.SPEC_RE.match(spec.strip().lower())
+        if not match:
+            raise ValueError(f"Invalid send window {spec!r}; expected e.g. 'mon-fri 09:00-18:00'")
+        days_spec, start_h, start_m, end_h, end_m = match.groups()
+        start, end = int(start_h) * 60 + int(start_m), int(end_h) * 60 + int(end_m)
+        if start >= 24 * 60 or end > 24 * 60 or int(start_m) >= 60 or int(end_m) >= 60 or start == end:
+            raise ValueError(f"Invalid times in send window {spec!r}")
+        days = set()
+        for part in (days_spec or 'daily').split(','):
+            if part in ('daily', '*'):
+                days.update(range(7))
+                continue
+            first, _, last = part.partition('-')
+            if first not in cls.DAYS or (last and last not in cls.DAYS):
+                raise ValueError(f"Invalid days in send window {spec!r}")
+            first = cls.DAYS.index(first)
+            last = cls.DAYS.index(last) if last else first
+            days.update(day % 7 for day in range(first, first + (last - first) % 7 + 1))
+        return days, start, end
+
+    def _intervals(self, now):
+        """Concrete (start, end) datetimes of the windows around ``now``, merged and sorted"""
+        midnight = datetime.combine(now.date(), datetime.min.time())
+        intervals = []
+        for offset in range(-1, 9):
+            day = midnight + timedelta(days=offset)
+            for days, start, end in self.windows:
+                if day.weekday() in days:
+                    end_day = day if end > start else day + timedelta(days=1)
+                    intervals.append((day + timedelta(minutes=start), end_day + timedelta(minutes=end)))
+        merged = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def current(self, now):
+        """End of the window ``now`` falls in, or None outside every window"""
+        if not self.windows:
+            return datetime.max
+        for start, end in self._intervals(now):
+            if start <= now < end:
+                return end
+        return None
+
+    def next_start(self, now):
+        """Start of the next window at or after ``now``"""
+        if not self.windows or self.current(now) is not None:
+            return now
+        return min(start for start, _ in self._intervals(now) if start > now)
+
+    def describe(self):
+        return ", ".join(self.specs) or "any time"
+
+
+class CampaignScheduler:
+    """Runs a campaign inside its send windows until every contact is done
+
+    Each window runs the CampaignEngine in resume mode, so the send journal
+    is the saved position: contacts already sent are skipped and the rest
+    are picked up in the next window, even after a restart. Within a window
+    each sender's remaining daily quota is spaced evenly up to the window's
+    end, or midnight if that comes first (the quota is per day). Senders
+    without a quota send as fast as their rate limits allow.
+    When the window closes or the quotas run out, the scheduler sleeps until
+    the next window (on the next day for a quota). Progress is written to
+    ``schedule_state_file`` for monitoring.
+    """
+
+    def __init__(self, config, on_event=None, clock=datetime.now):
+        self.config = dict(DEFAULT_CAMPAIGN_CONFIG)
+        self.config.update(config)
+        self.config['resume'] = True
+        self.on_event = on_event
+        self.clock = clock
+        self.windows = SendWindows(self.config['send_windows'])
+        self.stopped = threading.Event()
+        self.engine = None
+        self.runs = 0
+        self.totals = {'sent': 0, 'failed': 0}
+
+    def log(self, message, level="INFO"):
+        if self.on_event is not None:
+            self.on_event('log', {'message': message, 'level': level})
+        else:
+            logging.getLogger().log(getattr(logging, level), message)
+
+    def stop(self):
+        """Stop waiting and cancel the window being sent; safe from any thread"""
+        self.stopped.set()
+        if self.engine is not None:
+            self.engine.cancel()
+
+    def save_state(self, status, **extra):
+        path = self.config['schedule_state_file']
+        if not path:
+            return
+        state = dict({'campaign': campaign_id_for(self.config), 'status': status,
+                      'windows': self.windows.specs, 'runs': self.runs,
+                      'updated': self.clock().isoformat(timespec='seconds')}, **self.totals, **extra)
+        try:
+            state_dir = os.path.dirname(path)
+            if state_dir:
+                os.makedirs(state_dir, exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            self.log(f"Failed to save schedule state: {str(e)}", "WARNING")
+
+    def has_quota(self):
+        senders = self.config['senders'] or []
+        return self.config['daily_quota'] is not None or any(s.get('daily_quota') is not None for s in senders)
+
+    def resume_time(self, quota_reached):
+        """When sending may start again: the next window, or tomorrow's for a used-up quota"""
+        now = self.clock()
+        if quota_reached:
+            now = max(now, datetime.combine(now.date() + timedelta(days=1), datetime.min.time()))
+        return self.windows.next_start(now)
+
+    def wait_until(self, when):
+        """Sleep until ``when``; returns False if stopped first"""
+        self.save_state('waiting', next_window=when.isoformat(timespec='seconds'))
+        self.log(f"Waiting for the next send window at {when:%a %Y-%m-%d %H:%M}", "INFO")
+        while not self.stopped.is_set():
+            seconds = (when - self.clock()).total_seconds()
+            if seconds <= 0:
+                return True
+            self.stopped.wait(min(seconds, 60))
+        return False
+
+    def run(self):
+        """Send window after window until the campaign is done; returns the overall summary"""
+        self.log(f"Scheduling campaign in send windows: {self.windows.describe()}", "INFO")
+        quota_reached = False
+        while not self.stopped.is_set():
+            now = self.clock()
+            window_end = self.windows.current(now)
+            if window_end is None or quota_reached:
+                if not self.wait_until(self.resume_time(quota_reached)):
+                    break
+                quota_reached = False
+                continue
+
+            config = dict(self.config)
+            send_until = window_end
+            if self.has_quota():
+                # Quotas are per day: spread today's over what is left of today, tomorrow's starts afresh
+                send_until = min(send_until, datetime.combine(now.date() + timedelta(days=1), datetime.min.time()))
+            if send_until != datetime.max:
+                config['send_until'] = time.time() + (send_until - now).total_seconds()
+            self.runs += 1
+            self.save_state('sending', window_end=None if window_end == datetime.max
+                            else window_end.isoformat(timespec='seconds'))
+            self.engine = CampaignEngine(config, on_event=self.on_event)
+            summary = self.engine.run()
+            self.engine = None
+            self.totals['sent'] += summary['sent']
+            self.totals['failed'] += summary['failed']
+
+            if summary['cancelled']:
+                break
+            if not summary['window_closed'] and not summary['quota_reached']:
+                self.save_state('done')
+                self.log(f"Scheduled campaign complete after {self.runs} window(s): "
+                         f"{self.totals['sent']} sent, {self.totals['failed']} failed", "INFO")
+                return dict(self.totals, done=True, runs=self.runs)
+            quota_reached = summary['quota_reached']
+
+        self.save_state('stopped')
+        return dict(self.totals, done=False, runs=self.runs)
+
+
+# Fallback for bounces without a delivery-status part: the old heuristics as one
+# alternation, so the text is scanned once instead of once per pattern
+_BOUNCE_FALLBACK_RE = re.compile(
+    r'failed:\s*\n\n\[([^\]]+)\]'                 # [address] after "failed:"
+    r'|RCPT TO\s*[<:]+([^\s>:]+)'                  # RCPT TO:<address>
+    r'|Original-Recipient:\s*rfc822;\s*([^\s]+)'  # Original-Recipient
+    r'|Final-Recipient:\s*rfc822;\s*([^\s]+)'     # Final-Recipient
+    r'|To:\s*([^\s<]+@[^\s>]+)'                   # To: address
+    r'|<([^>]+@[^>]+)>',                           # <address>
+    re.IGNORECASE
+)
+_PERMANENT_CODE_RE = re.compile(r'\b(?:5\d\d[\s-]|5\.\d{1,3}\.\d{1,3}\b)')
+_TRANSIENT_CODE_RE = re.compile(r'\b(?:4\d\d[\s-]|4\.\d{1,3}\.\d{1,3}\b)')
+_DAEMON_ADDRESSES = ('mailer-daemon', 'postmaster')
+# Where a bounce starts quoting the original message (Exim, qmail, Gmail and others);
+# addresses after it are the original's senders and Cc's, not failed recipients
+_QUOTED_ORIGINAL_RE = re.compile(
+    r'^[\s>-]*(?:-+\s*)?(?:original message|this is a copy of the message|'
+    r'below this line is a copy of the message|the original message (?:was|follows)|'
+    r'original message follows|message headers follow)',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# RFC 3463 statuses that mean the address itself is dead (bad mailbox or
+# domain, disabled mailbox, unroutable). Other permanent statuses (mailbox
+# full, message too big, policy) are soft: the address may work later.
+HARD_BOUNCE_STATUSES = ('5.1.', '5.2.1', '5.4.4')
+BOUNCE_SEVERITY = {'hard': 3, 'soft': 2, 'transient': 1, 'unknown': 0}
+
+
+def parse_bounce_content(text_content, exclude=()):
+    """Parse bounce message content for failed addresses"""
+    found = set()
+    
+    if not text_content:
+        return found
+    
+    for match in _BOUNCE_FALLBACK_RE.finditer(text_content):
+        addr = next(group for group in match.groups() if group)
+        clean_addr = addr.strip('<>:').lower()
+        if '@' in clean_addr and clean_addr not in exclude and not any(x in clean_addr for x in _DAEMON_ADDRESSES):
+            found.add(clean_addr)
+    
+    return found
+
+
+def classify_dsn_status(status, action=""):
+    """Classify an RFC 3464 Status/Action pair as hard, soft or transient (None if delivered)"""
+    action = (action or "").strip().lower()
+    status = (status or "").strip()
+    if action in ('delivered', 'relayed', 'expanded'):
+        return None
+    if action == 'delayed' or status.startswith('4.'):
+        return 'transient'
+    if status.startswith(HARD_BOUNCE_STATUSES):
+        return 'hard'
+    if status.startswith('5.'):
+        return 'soft'
+    return 'hard' if action == 'failed' else 'unknown'
+
+
+def _dsn_address(value):
+    """'rfc822; user@example.com' -> 'user@example.com'"""
+    if not value:
+        return ""
+    return value.split(';', 1)[-1].strip().strip('<>').lower()
+
+
+def parse_delivery_status(message):
+    """Bounce records from the message/delivery-status parts of a DSN (RFC 3464)"""
+    records = []
+    for part in message.walk():
+        if part.get_content_type() != 'message/delivery-status':
+            continue
+        # The email package parses the part into one header block per field group:
+        # the first is per-message, the rest are per-recipient
+        for fields in part.get_payload() or []:
+            recipient = _dsn_address(fields.get('Final-Recipient') or fields.get('Original-Recipient'))
+            if '@' not in recipient:
+                continue
+            action = fields.get('Action', '')
+            status = fields.get('Status', '')
+            kind = classify_dsn_status(status, action)
+            if kind is None:
+                continue
+            records.append({
+                'email': recipient,
+                'kind': kind,
+                'action': action.strip().lower(),
+                'status': status.strip(),
+                'diagnostic': ' '.join((fields.get('Diagnostic-Code') or '').split()),
+                'source': 'dsn',
+            })
+    return records
+
+
+_DSN_PART_RE = re.compile(rb'^Content-Type:[ \t]*message/delivery-status', re.IGNORECASE | re.MULTILINE)
+_HEADER_END_RE = re.compile(rb'\r?\n\r?\n')
+_DSN_FIELD_RE = re.compile(
+    rb'^(Final-Recipient|Original-Recipient|Action|Status|Diagnostic-Code):[ \t]*(.*(?:\r?\n[ \t].*)*)',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+def fast_delivery_status(raw):
+    """Bounce records read straight from a raw DSN, skipping the MIME parser
+
+    Returns None when the message has no plain delivery-status part (or it is
+    transfer-encoded), meaning the caller should fall back to a full parse.
+    """
+    match = _DSN_PART_RE.search(raw)
+    if match is None:
+        return None
+    header_end = _HEADER_END_RE.search(raw, match.end())
+    if header_end is None:
+        return None
+    if re.search(rb'Content-Transfer-Encoding:[ \t]*(base64|quoted-printable)',
+                 raw[match.start():header_end.start()], re.IGNORECASE):
+        return None
+    body_end = raw.find(b'\n--', header_end.end())
+    body = raw[header_end.end():body_end if body_end != -1 else len(raw)]
+
+    records = []
+    for block in _HEADER_END_RE.split(body):
+        fields = {name.decode().title(): value.decode(errors='ignore')
+                  for name, value in _DSN_FIELD_RE.findall(block)}
+        recipient = _dsn_address(fields.get('Final-Recipient') or fields.get('Original-Recipient'))
+        if '@' not in recipient:
+            continue
+        kind = classify_dsn_status(fields.get('Status'), fields.get('Action'))
+        if kind is None:
+            continue
+        records.append({
+            'email': recipient,
+            'kind': kind,
+            'action': fields.get('Action', '').strip().lower(),
+            'status': fields.get('Status', '').strip(),
+            'diagnostic': ' '.join(fields.get('Diagnostic-Code', '').split()),
+            'source': 'dsn',
+        })
+    return records
+
+
+def bounce_report_text(message):
+    """The bounce's own text: attached originals are skipped and quoted ones cut off"""
+    text_content = ""
+    parts = [message]
+    while parts:
+        part = parts.pop(0)
+        if part.get_content_type() in ('message/rfc822', 'text/rfc822-headers'):
+            continue
+        if part.is_multipart():
+            parts[:0] = part.get_payload()
+        elif part is message or part.get_content_type() == "text/plain":
+            payload = part.get_payload(decode=True)
+            if payload:
+                text_content += payload.decode(errors="ignore") + "\n"
+    quote = _QUOTED_ORIGINAL_RE.search(text_content)
+    return text_content[:quote.start()] if quote else text_content
+
+
+def classify_bounce(message, exclude=()):
+    """Bounce records for one message: structured DSN fields, or the regex fallback
+
+    Fallback records are always 'unknown': free text can't tell the failed
+    recipient from other addresses it mentions, so they are reported but
+    never suppressed. The 4xx/5xx codes seen go in 'diagnostic'.
+    """
+    records = parse_delivery_status(message)
+    if records:
+        return records
+
+    try:
+        text_content = bounce_report_text(message)
+    except Exception as e:
+        logging.warning(f"Error extracting content: {str(e)}")
+        return []
+    if not text_content:
+        return []
+
+    # The bounce is addressed to us: never report our own addresses as failed
+    exclude = set(exclude)
+    for header in ('To', 'Delivered-To', 'Return-Path'):
+        exclude.update(addr.lower() for _, addr in getaddresses(message.get_all(header, [])))
+
+    if _PERMANENT_CODE_RE.search(text_content):
+        diagnostic = 'permanent (5xx) error in text'
+    elif _TRANSIENT_CODE_RE.search(text_content):
+        diagnostic = 'temporary (4xx) error in text'
+    else:
+        diagnostic = ''
+    return [
+        {'email': addr, 'kind': 'unknown', 'action': '', 'status': '', 'diagnostic': diagnostic, 'source': 'text'}
+        for addr in parse_bounce_content(text_content, exclude)
+    ]
+
+
+def merge_bounces(bounces, records):
+    """Add records to an email -> record dict, keeping the most severe per address"""
+    for record in records:
+        current = bounces.get(record['email'])
+        if current is None or BOUNCE_SEVERITY[record['kind']] > BOUNCE_SEVERITY[current['kind']]:
+            bounces[record['email']] = record
+    return bounces
+
+
+# Bytes of MBOX handed to each worker process
+MBOX_CHUNK_SIZE = 32 * 1024 * 1024
+
+
+def split_mbox(path, chunk_size=MBOX_CHUNK_SIZE):
+    """Split an MBOX file into (start, end) byte ranges that begin on a "From " line"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        ranges = []
+        start = 0
+        while start < size:
+            target = start + chunk_size
+            if target >= size:
+                end = size
+            else:
+                boundary = mm.find(b'\nFrom ', target)
+                end = size if boundary == -1 else boundary + 1
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+
+def iter_mbox_messages(mm, start, end):
+    """Yield the raw bytes of each message in mm[start:end] (without its From_ line)"""
+    position = start
+    while position < end:
+        next_start = mm.find(b'\nFrom ', position, end)
+        message_end = end if next_start == -1 else next_start + 1
+        raw = mm[position:message_end]
+        header_end = raw.find(b'\n')
+        if raw.startswith(b'From ') and header_end != -1:
+            raw = raw[header_end + 1:]
+        if raw.strip():
+            yield raw
+        position = message_end
+
+
+def scan_mbox_range(path, start, end, exclude=()):
+    """Worker: classify the bounces in one byte range of an MBOX file"""
+    bounces = {}
+    messages = 0
+    exclude = {addr.lower() for addr in exclude}
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for raw in iter_mbox_messages(mm, start, end):
+            records = fast_delivery_status(raw)
+            if records is None:
+                records = classify_bounce(message_from_bytes(raw), exclude)
+            merge_bounces(bounces, records)
+            messages += 1
+    return bounces, messages, end - start
+
+
+def scan_mbox(path, workers=None, progress=None, cancel_event=None, chunk_size=MBOX_CHUNK_SIZE, exclude=()):
+    """Find bounced addresses in an MBOX file without loading it whole
+
+    The file is split on "From " boundaries and the ranges are parsed in a
+    process pool (in-process for files that fit in one chunk).
+    ``progress(bytes_done, bytes_total, messages)`` is called as ranges
+    finish; setting ``cancel_event`` stops the scan early. ``exclude`` lists
+    our own addresses, which are never reported.
+
+    Returns a dict with 'bounces' (email -> record, see classify_bounce),
+    'messages' and 'cancelled'.
+    """
+    total = os.path.getsize(path)
+    ranges = split_mbox(path, chunk_size)
+    exclude = tuple(exclude)
+    bounces = {}
+    messages = 0
+    done = 0
+    cancelled = False
+
+    def collect(result):
+        nonlocal messages, done
+        found, count, size = result
+        merge_bounces(bounces, found.values())
+        messages += count
+        done += size
+        if progress:
+            progress(done, total, messages)
+
+    if len(ranges) <= 1:
+        for start, end in ranges:
+            collect(scan_mbox_range(path, start, end, exclude))
+        return {'bounces': bounces, 'messages': messages, 'cancelled': False}
+
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = {executor.submit(scan_mbox_range, path, start, end, exclude) for start, end in ranges}
+        while pending:
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                break
+            finished, pending = concurrent.futures.wait(
+                pending, timeout=0.2, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in finished:
+                collect(future.result())
+    finally:
+        executor.shutdown(wait=not cancelled, cancel_futures=True)
+    return {'bounces': bounces, 'messages': messages, 'cancelled': cancelled}
+
+
+# Rows per chunk when streaming a contact file
+CONTACT_CHUNK_SIZE = 5000
+
+# Excel is by far the slowest format to parse, so those sheets are cached
+CONTACT_CACHE_DIR = os.path.join("data", ".contact_cache")
+CACHED_CONTACT_FORMATS = ('.xlsx', '.xlsm', '.xls')
+
+
+class ContactCache:
+    """Parsed copies of contact sheets, keyed by the source file's path, mtime and size
+
+    A sheet is stored the first time it is read in full, as a stream of
+    pickled DataFrame chunks (cell types exactly as read from Excel) plus a
+    small JSON index with its row count and columns. Later reads unpickle
+    the chunks instead of parsing the workbook; saving or replacing the
+    source file changes its fingerprint and the entry is rebuilt.
+    """
+
+    VERSION = 1
+
+    def __init__(self, directory=CONTACT_CACHE_DIR):
+        self.directory = directory
+
+    def _paths(self, file_path):
+        key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:20]
+        base = os.path.join(self.directory, key)
+        return base + ".pkl", base + ".json"
+
+    def fingerprint(self, file_path):
+        stat = os.stat(file_path)
+        return {'source': os.path.abspath(file_path), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                'version': self.VERSION, 'pandas': pd.__version__}
+
+    def lookup(self, file_path):
+        """Index of a valid entry for file_path ({'rows', 'columns', ...}), or None"""
+        data_path, index_path = self._paths(file_path)
+        try:
+            with open(index_path, encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('fingerprint') != self.fingerprint(file_path) or not os.path.exists(data_path):
+                return None
+            return index
+        except (OSError, ValueError):
+            return None
+
+    def iter_chunks(self, file_path, chunk_size=CONTACT_CHUNK_SIZE):
+        """Yield the cached sheet as DataFrames of at most chunk_size rows"""
+        data_path, _ = self._paths(file_path)
+        with open(data_path, 'rb') as f:
+            while True:
+                try:
+                    chunk = pickle.load(f)
+                except EOFError:
+                    return
+                for start in range(0, len(chunk), chunk_size):
+                    yield chunk.iloc[start:start + chunk_size]
+
+    def write_through(self, file_path, chunks):
+        """Pass chunks on while storing them; the entry is only kept if all of them are read"""
+        fingerprint = self.fingerprint(file_path)
+        data_path, index_path = self._paths(file_path)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError as e:
+            logging.debug(f"Contact cache disabled: {str(e)}")
+            yield from chunks
+            return
+
+        out = os.fdopen(fd, 'wb')
+        complete = False
+        rows = 0
+        columns = []
+        pending = []
+        try:
+            for chunk in chunks:
+                yield chunk
+                if out is None:
+                    continue
+                rows += len(chunk)
+                columns = [str(column) for column in chunk.columns]
+                pending.append(chunk)
+                # Few large pickles load faster than many small ones
+                if sum(len(c) for c in pending) >= CONTACT_CHUNK_SIZE:
+                    out = self._dump(out, pending)
+                    pending = []
+            if out is not None and pending:
+                out = self._dump(out, pending)
+            complete = out is not None
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            if out is not None:
+                out.close()
+            try:
+                if complete:
+                    os.replace(temp_path, data_path)
+                    index = {'fingerprint': fingerprint, 'rows': rows, 'columns': columns,
+                             'created': datetime.now().isoformat(timespec='seconds')}
+                    fd, temp_index = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        json.dump(index, f)
+                    os.replace(temp_index, index_path)
+                else:
+                    os.remove(temp_path)
+            except OSError as e:
+                logging.debug(f"Could not save contact cache for {file_path}: {str(e)}")
+
+    def _dump(self, out, chunks):
+        try:
+            pickle.dump(pd.concat(chunks, ignore_index=True), out, protocol=pickle.HIGHEST_PROTOCOL)
+            return out
+        except (OSError, pickle.PicklingError) as e:
+            logging.debug(f"Contact cache disabled: {str(e)}")
+            out.close()
+            return None
+
+
+def _contact_cache(file_path, cache_dir):
+    """The ContactCache to use for file_path, or None when it isn't cached"""
+    if cache_dir and _contact_format(file_path) in CACHED_CONTACT_FORMATS:
+        return ContactCache(cache_dir)
+    return None
+
+
+def _contact_format(file_path):
+    return os.path.splitext(file_path)[1].lower()
+
+
+def _strip_cell(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def read_contact_columns(file_path, cache_dir=CONTACT_CACHE_DIR):
+    """Column names of a contact file, read without parsing the rows"""
+    cache = _contact_cache(file_path, cache_dir)
+    index = cache.lookup(file_path) if cache is not None else None
+    if index is not None:
+        return list(index['columns'])
+    for chunk in iter_contact_chunks(file_path, chunk_size=1, cache_dir=None):
+        return list(chunk.columns)
+    return []
+
+
+def count_contact_rows(file_path, cache_dir=CONTACT_CACHE_DIR):
+    """Cheap row count (for progress bars); None when it can't be known up front"""
+    cache = _contact_cache(file_path, cache_dir)
+    index = cache.lookup(file_path) if cache is not None else None
+    if index is not None:
+        return index['rows']
+    ext = _contact_format(file_path)
+    try:
+        if ext in ('.xlsx', '.xlsm'):
+            import openpyxl
+            workbook = openpyxl.load_workbook(file_path, read_only=True)
+            try:
+                rows = workbook.worksheets[0].max_row
+            finally:
+                workbook.close()
+            return rows - 1 if rows else None
+        if ext == '.csv':
+            with open(file_path, 'rb') as f:
+                return max(0, sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b'')) - 1)
+        if ext == '.parquet':
+            import pyarrow.parquet as pq
+            return pq.ParquetFile(file_path).metadata.num_rows
+    except Exception as e:
+        logging.debug(f"Could not count rows in {file_path}: {str(e)}")
+    return None
+
+
+def iter_contact_chunks(file_path, chunk_size=CONTACT_CHUNK_SIZE, cache_dir=CONTACT_CACHE_DIR):
+    """Yield a contact file as DataFrames of at most chunk_size rows
+
+    .xlsx uses openpyxl's read-only row iterator, .csv and .parquet use their
+    chunked readers, so memory stays bounded by one chunk. Older .xls files
+    have no streaming reader and are loaded whole, then sliced. Excel files
+    are served from the ContactCache in ``cache_dir`` once read in full.
+    """
+    cache = _contact_cache(file_path, cache_dir)
+    if cache is None:
+        yield from _parse_contact_chunks(file_path, chunk_size)
+    elif cache.lookup(file_path) is not None:
+        yield from cache.iter_chunks(file_path, chunk_size)
+    else:
+        yield from cache.write_through(file_path, _parse_contact_chunks(file_path, chunk_size))
+
+
+def _parse_contact_chunks(file_path, chunk_size):
+    ext = _contact_format(file_path)
+    if ext in ('.xlsx', '.xlsm'):
+        import openpyxl
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(name).strip() if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+            batch = []
+            for row in rows:
+                if any(cell is not None for cell in row):
+                    batch.append(row)
+                if len(batch) >= chunk_size:
+                    yield pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns)
+        finally:
+            workbook.close()
+    elif ext == '.csv':
+        yield from pd.read_csv(file_path, chunksize=chunk_size, dtype=str)
+    elif ext == '.parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        df = pd.read_excel(file_path)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+
+# Practical address check (not full RFC 5322): local part, then one or more
+# dot-separated labels and an alphabetic TLD. Applied to lower-cased input.
+EMAIL_PATTERN = re.compile(
+    r"[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    r"@(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}"
+)
+
+
+def _strip_column(column):
+    """Strip whitespace from the text cells of a column, vectorized where possible"""
+    kind = pd.api.types.infer_dtype(column, skipna=True)
+    if kind == 'string':
+        return column.str.strip()
+    if kind in ('mixed', 'mixed-integer'):
+        return column.map(_strip_cell)
+    return column
+
+
+def clean_contacts_frame(df, seen=None):
+    """Normalize, validate and dedupe a chunk of contacts in one vectorized pass
+
+    Addresses are stripped, lower-cased and cleared of ``mailto:`` prefixes and
+    angle brackets, then checked against EMAIL_PATTERN for the whole column at
+    once. Repeats within the chunk, or of anything in ``seen`` (which is
+    updated with the accepted addresses), are duplicates.
+
+    Returns ``(valid, rejects)``; ``rejects`` has the original columns plus a
+    'Reason' column.
+    """
+    if seen is None:
+        seen = set()
+    df = df.copy()
+    for col in df.columns:
+        if col != 'Email Contacto' and (pd.api.types.is_string_dtype(df[col]) or pd.api.types.is_object_dtype(df[col])):
+            df[col] = _strip_column(df[col])
+
+    email = df['Email Contacto'].astype('string').str.strip().str.lower()
+    # Only the few wrapped addresses pay for the "mailto:" / <...> cleanup
+    wrapped = email.str.startswith('mailto:').fillna(False) | email.str.startswith('<').fillna(False)
+    if wrapped.any():
+        email[wrapped] = email[wrapped].str.replace(r'^mailto:', '', regex=True).str.strip('<> ')
+    missing = email.isna() | (email == '')
+    malformed = ~missing & ~email.str.fullmatch(EMAIL_PATTERN.pattern).fillna(False).astype(bool)
+    duplicate = ~missing & ~malformed & (email.duplicated() | email.isin(seen))
+
+    reason = pd.Series('', index=df.index, dtype=object)
+    reason[missing] = 'Missing email'
+    reason[malformed] = 'Invalid email format'
+    reason[duplicate] = 'Duplicate email'
+    rejected = missing | malformed | duplicate
+
+    df['Email Contacto'] = email.astype(object).where(~missing, None)
+    valid = df[~rejected]
+    seen.update(valid['Email Contacto'])
+
+    rejects = df[rejected].copy()
+    rejects['Reason'] = reason[rejected]
+    return valid, rejects
+
+
+def iter_contacts(file_path, chunk_size=CONTACT_CHUNK_SIZE, stats=None, on_rejects=None,
+                  cache_dir=CONTACT_CACHE_DIR):
+    """Lazily yield validated, normalized and de-duplicated contact dicts
+
+    ``stats`` (a dict) is updated as the file is consumed: 'valid',
+    'invalid' and 'duplicates' counts, and 'rejects', a list of DataFrames
+    of the rejected rows with their 'Reason'. When ``on_rejects`` is given,
+    each rejected DataFrame is passed to it instead of kept in 'rejects'.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault('valid', 0)
+    stats.setdefault('invalid', 0)
+    stats.setdefault('duplicates', 0)
+    stats.setdefault('rejects', [])
+
+    seen = set()
+    for chunk in iter_contact_chunks(file_path, chunk_size, cache_dir):
+        valid, rejects = clean_contacts_frame(chunk, seen)
+        stats['valid'] += len(valid)
+        stats['invalid'] += len(rejects)
+        if len(rejects):
+            stats['duplicates'] += int((rejects['Reason'] == 'Duplicate email').sum())
+            if on_rejects is not None:
+                on_rejects(rejects)
+            else:
+                stats['rejects'].append(rejects)
+        yield from valid.to_dict('records')
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Email campaign sender (runs the GUI when no command is given)")
+    subparsers = parser.add_subparsers(dest="command")
+
+    # Options shared by every command that runs a campaign
+    campaign = argparse.ArgumentParser(add_help=False)
+    campaign.add_argument("--contacts", required=True, help="Excel file with the contact list")
+    campaign.add_argument("--template", required=True, help="HTML template file")
+    campaign.add_argument("--subject", help="Email subject")
+    campaign.add_argument("--sender-email", help="Sender address (defaults to the saved .creds)")
+    campaign.add_argument("--sender-name", help="Sender display name")
+    campaign.add_argument("--smtp-server", help="SMTP server host")
+    campaign.add_argument("--smtp-port", type=int, help="SMTP server port")
+    campaign.add_argument("--gmail", action="store_true", default=None, help="Use Gmail mode (app password, Gmail quotas)")
+    campaign.add_argument("--test-mode", action="store_true", help="Send every email to the sender address")
+    campaign.add_argument("--connections", type=int, help="Concurrent SMTP connections")
+    campaign.add_argument("--senders", help="JSON file with a list of sender accounts to shard the campaign across")
+    campaign.add_argument("--sender-strategy", choices=SenderPool.STRATEGIES,
+                          help="Shard contacts round robin (default) or weighted by remaining daily quota")
+    campaign.add_argument("--batch-recipients", type=int, metavar="N",
+                          help="Send a non-personalized template once per N recipients (they are not named in To)")
+    campaign.add_argument("--raw-template", action="store_true",
+                          help="Send the template as written (no CSS inlining, minifying or plain-text part)")
+    campaign.add_argument("--no-domain-check", action="store_true",
+                          help="Don't drop contacts whose domain has no MX/A record")
+    campaign.add_argument("--dns-server", action="append", dest="dns_servers", metavar="HOST[:PORT]",
+                          help="Nameserver for the domain check (repeatable; default the system's)")
+    campaign.add_argument("--failure-log", help="CSV or .jsonl file failures are appended to as they happen")
+    campaign.add_argument("--failure-report", help="Excel copy of the failure log written at the end")
+    campaign.add_argument("--no-failure-report", action="store_true", help="Keep only the CSV/JSONL failure log")
+    campaign.add_argument("--creds", default=".creds", help="Saved credentials file from the GUI")
+    campaign.add_argument("--journal", help="Send journal database (default reports/send_journal.db)")
+    campaign.add_argument("--metrics", help="Metrics file: .prom/.txt for Prometheus text, otherwise JSON")
+    campaign.add_argument("--daily-quota", type=int, help="Most messages each sender sends per day")
+
+    send = subparsers.add_parser("send", parents=[campaign], help="Send a campaign without the GUI")
+    send.add_argument("--resume", action="store_true", help="Skip contacts already sent by an interrupted run")
+
+    schedule = subparsers.add_parser("schedule", parents=[campaign],
+                                     help="Send a campaign in its send windows, resuming in the next one until done")
+    schedule.add_argument("--window", action="append", dest="windows", metavar="SPEC",
+                          help="Send window in local time, e.g. 'mon-fri 09:00-18:00' (repeatable; default any time)")
+    schedule.add_argument("--state-file", help="Where the scheduler saves its progress "
+                          "(default reports/schedule_state.json)")
+
+    suppress = subparsers.add_parser("suppress", help="Manage the suppression list (bounces, unsubscribes)")
+    suppress.add_argument("action", choices=["add", "remove", "import", "stats"])
+    suppress.add_argument("values", nargs="*", help="Addresses, or contact files for 'import'")
+    suppress.add_argument("--reason", default="unsubscribe", help="Why the addresses are suppressed")
+    suppress.add_argument("--file", default=DEFAULT_CAMPAIGN_CONFIG['suppression_file'], help="Suppression database")
+    return parser
+
+
+def run_suppress(args):
+    """Apply a 'suppress' command and report what changed"""
+    with SuppressionList(args.file) as suppression:
+        if args.action == "add":
+            logging.info(f"Suppressed {suppression.add(args.values, args.reason, 'command line')} new addresses")
+        elif args.action == "remove":
+            logging.info(f"Removed {suppression.remove(args.values)} addresses")
+        elif args.action == "import":
+            for path in args.values:
+                emails = (contact['Email Contacto'] for contact in iter_contacts(path))
+                added = suppression.add(emails, args.reason, os.path.basename(path))
+                logging.info(f"Suppressed {added} new addresses from {path}")
+        logging.info(f"{len(suppression)} suppressed addresses: {suppression.reasons()}")
+    return 0
+
+
+def load_senders(path):
+    """Read a sender pool file: a JSON list of SenderAccount settings
+
+    Passwords can be given inline or, better, as ``"password_env"``: the name
+    of an environment variable holding them.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        senders = json.load(f)
+    if not isinstance(senders, list) or not senders:
+        raise ValueError(f"{path} must contain a non-empty list of senders")
+    for sender in senders:
+        variable = sender.pop("password_env", None)
+        if variable:
+            sender["password"] = os.environ.get(variable, "")
+            if not sender["password"]:
+                raise ValueError(f"Environment variable {variable} for {sender.get('sender_email')} is not set")
+    return senders
+
+
+def config_from_args(args):
+    """Build a campaign config from saved credentials, then command line overrides"""
+    config = dict(DEFAULT_CAMPAIGN_CONFIG)
+
+    if args.creds and os.path.exists(args.creds):
+        with open(args.creds, "r") as f:
+            saved = decode_config(f.read().strip())
+        config.update({
+            'sender_email': saved.get("email", ""),
+            'sender_name': saved.get("sender_name", ""),
+            'smtp_server': saved.get("smtp_server") or config['smtp_server'],
+            'smtp_port': int(saved.get("smtp_port") or config['smtp_port']),
+            'gmail_mode': saved.get("is_gmail", False),
+        })
+        config['password'] = saved.get("app_password") if config['gmail_mode'] else saved.get("password", "")
+
+    overrides = {
+        'excel_file': args.contacts,
+        'html_template': args.template,
+        'subject': args.subject,
+        'sender_email': args.sender_email,
+        'sender_name': args.sender_name,
+        'smtp_server': args.smtp_server,
+        'smtp_port': args.smtp_port,
+        'gmail_mode': args.gmail,
+        'connections': args.connections,
+        'failure_log': args.failure_log,
+        'failure_report': args.failure_report,
+        'journal_file': args.journal,
+        'metrics_file': args.metrics,
+        'sender_strategy': args.sender_strategy,
+        'max_recipients_per_message': args.batch_recipients,
+        'daily_quota': args.daily_quota,
+        'dns_servers': args.dns_servers,
+    }
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    config['test_mode'] = args.test_mode
+    config['resume'] = getattr(args, 'resume', False)
+    if args.no_failure_report:
+        config['failure_report'] = None
+    if args.raw_template:
+        config['build_template'] = False
+    if args.no_domain_check:
+        config['check_domains'] = False
+
+    if args.senders:
+        config['senders'] = load_senders(args.senders)
+
+    # Never take the password on the command line where it ends up in shell history
+    config['password'] = os.environ.get("EMAIL_CAMPAIGN_PASSWORD") or config['password']
+    if not config['password'] and not config['senders']:
+        config['password'] = getpass.getpass(f"Password for {config['sender_email']}: ")
+    return config
+
+
+def run_cli(argv):
+    """Entry point for headless campaigns; returns a process exit code"""
+    args = build_arg_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "send":
+        try:
+            summary = CampaignEngine(config_from_args(args)).run()
+        except Exception as e:
+            logging.error(f"Campaign failed: {str(e)}")
+            logging.debug(traceback.format_exc())
+            return 2
+        return 0 if summary['failed'] == 0 else 1
+    if args.command == "schedule":
+        try:
+            config = config_from_args(args)
+            config['send_windows'] = args.windows
+            if args.state_file:
+                config['schedule_state_file'] = args.state_file
+            summary = CampaignScheduler(config).run()
+        except Exception as e:
+            logging.error(f"Scheduled campaign failed: {str(e)}")
+            logging.debug(traceback.format_exc())
+            return 2
+        return 0 if summary['done'] and summary['failed'] == 0 else 1
+    if args.command == "suppress":
+        return run_suppress(args)
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return run_cli(argv)
+    if tk is None:
+        print("tkinter is not available; use 'python execute.py send --help' for headless campaigns")
+        return 2
+
+    root = tk.Tk()
+    EmailCampaignApp(root)
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
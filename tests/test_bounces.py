@@ -0,0 +1,126 @@
+import email
+
+from execute import classify_bounce, classify_dsn_status, fast_delivery_status, merge_bounces, parse_delivery_status
+
+DSN = b"""From: Mail Delivery System <MAILER-DAEMON@mx.example.net>
+To: news@example.com
+Subject: Undelivered Mail Returned to Sender
+MIME-Version: 1.0
+Content-Type: multipart/report; report-type=delivery-status; boundary="BOUND"
+
+--BOUND
+Content-Type: text/plain
+
+Your message could not be delivered. Cc: innocent@friend.com was not affected.
+
+--BOUND
+Content-Type: message/delivery-status
+
+Reporting-MTA: dns; mx.example.net
+
+Final-Recipient: rfc822; Gone@Example.org
+Action: failed
+Status: 5.1.1
+Diagnostic-Code: smtp; 550 5.1.1 <gone@example.org>:
+ Recipient address rejected
+
+Final-Recipient: rfc822; full@example.org
+Action: failed
+Status: 5.2.2
+
+Final-Recipient: rfc822; slow@example.org
+Action: delayed
+Status: 4.4.1
+
+Final-Recipient: rfc822; fine@example.org
+Action: delivered
+Status: 2.0.0
+
+--BOUND
+Content-Type: message/rfc822
+
+From: news@example.com
+To: gone@example.org
+Cc: innocent@friend.com
+
+Hola
+--BOUND--
+"""
+
+# Exim-style bounce with no delivery-status part and the original quoted inline
+TEXT_BOUNCE = b"""From: Mail Delivery System <Mailer-Daemon@mx.example.net>
+To: news@example.com
+Subject: Mail delivery failed: returning message to sender
+
+This message was created automatically by mail delivery software.
+
+A message that you sent could not be delivered to one or more of its
+recipients. This is a permanent error. The following address(es) failed:
+
+  gone@example.org
+    host mx.example.org [192.0.2.1]
+    SMTP error from remote mail server after RCPT TO:<gone@example.org>:
+    550 5.1.1 User unknown
+
+------ This is a copy of the message, including all the headers. ------
+
+From: news@example.com
+To: gone@example.org
+Cc: innocent@friend.com
+Subject: Hola
+"""
+
+
+def test_classify_dsn_status():
+    assert classify_dsn_status('5.1.1', 'failed') == 'hard'
+    assert classify_dsn_status('5.4.4', 'failed') == 'hard'
+    assert classify_dsn_status('5.2.2', 'failed') == 'soft'
+    assert classify_dsn_status('4.4.1', 'failed') == 'transient'
+    assert classify_dsn_status('', 'delayed') == 'transient'
+    assert classify_dsn_status('', 'failed') == 'hard'
+    assert classify_dsn_status('', '') == 'unknown'
+    assert classify_dsn_status('2.0.0', 'delivered') is None
+
+
+def test_parse_delivery_status():
+    records = parse_delivery_status(email.message_from_bytes(DSN))
+    assert [(r['email'], r['kind'], r['status']) for r in records] == [
+        ('gone@example.org', 'hard', '5.1.1'),
+        ('full@example.org', 'soft', '5.2.2'),
+        ('slow@example.org', 'transient', '4.4.1'),
+    ]
+    assert records[0]['diagnostic'] == 'smtp; 550 5.1.1 <gone@example.org>: Recipient address rejected'
+
+
+def test_fast_delivery_status_matches_full_parse():
+    assert fast_delivery_status(DSN) == parse_delivery_status(email.message_from_bytes(DSN))
+    assert fast_delivery_status(TEXT_BOUNCE) is None
+
+
+def test_classify_bounce_prefers_dsn_fields():
+    emails = {record['email'] for record in classify_bounce(email.message_from_bytes(DSN))}
+    assert emails == {'gone@example.org', 'full@example.org', 'slow@example.org'}
+
+
+def test_text_fallback_skips_quoted_original():
+    records = classify_bounce(email.message_from_bytes(TEXT_BOUNCE))
+    assert records == [{'email': 'gone@example.org', 'kind': 'unknown', 'action': '', 'status': '',
+                        'diagnostic': 'permanent (5xx) error in text', 'source': 'text'}]
+
+
+def test_text_fallback_skips_attached_original():
+    raw = (b'From: postmaster@mx.example.net\nTo: news@example.com\nMIME-Version: 1.0\n'
+           b'Content-Type: multipart/mixed; boundary="B"\n\n'
+           b'--B\nContent-Type: text/plain\n\nDelivery to <gone@example.org> failed: 550 User unknown\n'
+           b'--B\nContent-Type: message/rfc822\n\nFrom: news@example.com\nCc: <innocent@friend.com>\n\nHola\n'
+           b'--B--\n')
+    records = classify_bounce(email.message_from_bytes(raw), exclude={'news@example.com'})
+    assert [(r['email'], r['kind']) for r in records] == [('gone@example.org', 'unknown')]
+
+
+def test_merge_bounces_keeps_most_severe():
+    bounces = merge_bounces({}, [{'email': 'a@example.org', 'kind': 'transient'}])
+    merge_bounces(bounces, [{'email': 'a@example.org', 'kind': 'hard'}, {'email': 'b@example.org', 'kind': 'unknown'}])
+    merge_bounces(bounces, [{'email': 'a@example.org', 'kind': 'soft'}])
+    assert {email: record['kind'] for email, record in bounces.items()} == {'a@example.org': 'hard',
+                                                                             'b@example.org': 'unknown'}
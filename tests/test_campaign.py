@@ -0,0 +1,160 @@
+import os
+
+import pandas as pd
+import pytest
+
+from execute import CampaignEngine, RateLimiter, SendJournal, SenderAccount, SenderPool, smtp_security_for
+from smtp_sink import SMTPSink
+
+USERS = {'news@example.com': 'secret'}
+
+
+def write_contacts(path, count):
+    pd.DataFrame({
+        'Email Contacto': [f'contact{i}@example.com' for i in range(count)] + ['not-an-email'],
+        'Nombre Contacto': [f'Contacto {i}' for i in range(count)] + ['Nadie'],
+        'Nombre Empresa': [f'Empresa {i}' for i in range(count)] + [''],
+    }).to_csv(path, index=False)
+
+
+@pytest.fixture
+def campaign(tmp_path):
+    """Config factory for a campaign against a local SMTP sink, with every file in tmp_path"""
+    write_contacts(str(tmp_path / 'contacts.csv'), 10)
+    (tmp_path / 'template.html').write_text('<p>Hola {{name}} de {{company}}</p>', encoding='utf-8')
+    (tmp_path / 'shared.html').write_text('<p>Novedades de la semana</p>', encoding='utf-8')
+
+    def make(sink, **overrides):
+        config = {
+            'excel_file': str(tmp_path / 'contacts.csv'),
+            'html_template': str(tmp_path / 'template.html'),
+            'sender_email': 'news@example.com',
+            'sender_name': 'News',
+            'password': 'secret',
+            'subject': 'Para {{company}}',
+            'smtp_server': sink.host,
+            'smtp_port': sink.port,
+            'smtp_security': 'none',
+            'connections': 2,
+            'rate_limits': {'per_minute': None, 'per_hour': None, 'per_day': None},
+            'throttle_backoff': 0.1,
+            'throttle_backoff_max': 0.2,
+            'check_domains': False,
+            'failure_log': str(tmp_path / 'failed.csv'),
+            'failure_report': str(tmp_path / 'failed.xlsx'),
+            'journal_file': str(tmp_path / 'journal.db'),
+            'suppression_file': str(tmp_path / 'suppression.db'),
+            'contact_cache_dir': None,
+            'metrics_file': None,
+        }
+        config.update(overrides)
+        return config
+    make.shared_template = str(tmp_path / 'shared.html')
+    return make
+
+
+def run(config):
+    return CampaignEngine(config, on_event=lambda event, data: None).run()
+
+
+def failed_addresses(path):
+    if not os.path.exists(path):
+        return None
+    return sorted(pd.read_excel(path, sheet_name='Failed')['Email Contacto'])
+
+
+def test_campaign_sends_personalized_messages(campaign):
+    with SMTPSink(users=USERS, store=True) as sink:
+        summary = run(campaign(sink))
+    assert (summary['sent'], summary['failed']) == (10, 0)
+    assert sink.stats.messages == 10
+    mail_from, rcpts, data = sorted(sink.stats.stored, key=lambda stored: stored[1])[0]
+    assert 'news@example.com' in mail_from and rcpts == ['contact0@example.com']
+    assert b'Subject: Para Empresa 0' in data and b'Hola Contacto 0' in data
+
+
+def test_rejected_mailboxes_are_suppressed(campaign):
+    with SMTPSink(users=USERS, reject={'contact3@example.com'}) as sink:
+        config = campaign(sink)
+        summary = run(config)
+        assert (summary['sent'], summary['failed']) == (9, 1)
+        summary = run(dict(config, resume=True))
+    assert (summary['sent'], summary['skipped'], summary['suppressed']) == (0, 9, 1)
+
+
+def test_resume_drops_contacts_delivered_since(campaign):
+    failing = {'contact5@example.com', 'contact7@example.com'}
+    with SMTPSink(users=USERS) as sink:
+        sink.injected_error = lambda address: '554 5.7.1 Blocked' if address in failing else None
+        config = campaign(sink, resume=True)
+        assert run(config)['failed'] == 2
+        assert failed_addresses(config['failure_report']) == sorted(failing)
+
+        failing = {'contact7@example.com'}
+        summary = run(config)
+        assert (summary['sent'], summary['failed'], summary['skipped']) == (1, 1, 8)
+        assert failed_addresses(config['failure_report']) == ['contact7@example.com']
+        assert len(pd.read_csv(config['failure_log'])) == 1
+
+        failing = set()
+        run(config)
+    # Only the invalid address is left, on the Rejected sheet
+    assert failed_addresses(config['failure_report']) == []
+    assert not os.path.exists(config['failure_log'])
+
+
+def test_batched_send_counts_every_refused_recipient(campaign):
+    with SMTPSink(users=USERS, reject={'contact2@example.com'}, rcpt_max=4) as sink:
+        engine = CampaignEngine(campaign(sink, subject='Novedades', max_recipients_per_message=6,
+                                         html_template=campaign.shared_template),
+                                on_event=lambda event, data: None)
+        summary = engine.run()
+    assert (summary['sent'], summary['failed']) == (9, 1)
+    replies = engine.metrics.summary()['smtp_replies']
+    assert replies['550'] == 1 and replies['452'] >= 1
+
+
+def test_daily_quota_ignores_old_bounces(campaign):
+    with SMTPSink(users=USERS) as sink:
+        config = campaign(sink, daily_quota=5)
+        with SendJournal(config['journal_file'], 'earlier') as journal:
+            journal.record('old@example.com', 'sent', sender='news@example.com')
+            journal.db.execute("UPDATE deliveries SET sent_at = '2020-01-01T10:00:00'")
+            journal.record('today@example.com', 'sent', sender='news@example.com')
+            journal.mark_bounced(['old@example.com'])
+        summary = run(config)
+    assert summary['sent'] == 4
+    assert summary['quota_reached']
+
+
+def test_sender_pool_strategies():
+    accounts = [SenderAccount({'sender_email': f'sender{i}@example.com', 'daily_quota': quota}, {'daily_quota': None})
+                for i, quota in enumerate([2, 4, None])]
+    pool = SenderPool(accounts)
+    assert [pool.next().email[:7] for _ in range(5)] == ['sender0', 'sender1', 'sender2', 'sender0', 'sender1']
+    assert pool.next().email == 'sender2@example.com'
+    assert pool.next().email == 'sender1@example.com'
+    assert accounts[0].exhausted and accounts[2].remaining is None
+
+    accounts = [SenderAccount({'sender_email': f'sender{i}@example.com', 'daily_quota': quota}, {'daily_quota': None})
+                for i, quota in enumerate([1, 2])]
+    pool = SenderPool(accounts, 'quota')
+    assert sorted(pool.next().email for _ in range(3)) == ['sender0@example.com'] + ['sender1@example.com'] * 2
+    assert pool.next() is None
+    with pytest.raises(ValueError):
+        SenderAccount({'smtp_host': 'x'}, {})
+
+
+@pytest.mark.parametrize('port, security', [(465, 'ssl'), (587, 'starttls'), (25, 'starttls'), (2465, 'ssl')])
+def test_security_is_derived_from_the_port(port, security):
+    assert smtp_security_for(port) == security
+
+
+def test_throttling_backoff_settings():
+    limiter = RateLimiter.for_mode(False, {'per_minute': None, 'per_hour': None}, backoff_initial=0.5, backoff_max=2)
+    for expected in (0.5, 1, 2, 2):
+        limiter.report(451)
+        assert limiter.backoff == expected
+    limiter.report(250)
+    assert limiter.backoff == 1
+    assert RateLimiter.for_mode(True).backoff_initial == 30
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from dns_stub import DNSStub, mx_domain
+from execute import DNSResolver, DomainChecker
+
+
+@pytest.fixture(scope='module')
+def stub():
+    zones = {
+        'mail.example': mx_domain('mail.example'),
+        'a-only.example': {'A': ['127.0.0.1']},
+        'v6-only.example': {'AAAA': ['::1']},
+        'nomail.example': {'MX': [(0, '.')], 'A': ['127.0.0.1']},
+        'parked.example': {},
+    }
+    with DNSStub(zones, servfail=['broken.example'], drop=['silent.example']) as stub:
+        yield stub
+
+
+@pytest.mark.parametrize('domain, expected', [
+    ('mail.example', ('ok', "MX")),
+    ('MAIL.example.', ('ok', "MX")),
+    ('a-only.example', ('ok', "A")),
+    ('v6-only.example', ('ok', "AAAA")),
+    ('nomail.example', ('missing', "Domain accepts no mail (null MX)")),
+    ('parked.example', ('missing', "No MX or A record")),
+    ('typo.example', ('missing', "Domain does not exist")),
+    ('bad..example', ('missing', "Invalid domain name")),
+])
+def test_lookup(stub, domain, expected):
+    assert DNSResolver([stub.address]).lookup(domain) == expected
+
+
+def test_lookup_without_a_conclusive_answer(stub):
+    assert DNSResolver([stub.address]).lookup('broken.example') == ('unknown', "DNS error 2")
+    status, _ = DNSResolver([stub.address], timeout=0.1, attempts=1).lookup('silent.example')
+    assert status == 'unknown'
+
+
+def test_nameserver_addresses():
+    resolver = DNSResolver(['127.0.0.1:5353', '[::1]:5300', '[::1]', '192.0.2.53'])
+    assert resolver.nameservers == [('127.0.0.1', 5353), ('::1', 5300), ('::1', 53), ('192.0.2.53', 53)]
+
+
+class FakeResolver:
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    def __call__(self, domain):
+        self.calls.append(domain)
+        return self.answers[domain]
+
+
+def test_domain_checker_filters_and_caches(tmp_path):
+    cache_file = str(tmp_path / 'domains.json')
+    resolver = FakeResolver({'good.example': ('ok', "MX"), 'typo.example': ('missing', "Domain does not exist"),
+                             'flaky.example': ('unknown', "timed out")})
+    contacts = [{'Email Contacto': f'user{i}@{domain}'}
+                for i, domain in enumerate(['good.example', 'typo.example', 'flaky.example', 'Good.example'])]
+    dropped = []
+    checker = DomainChecker(cache_file, resolver=resolver, clock=lambda: 1000.0)
+    kept = list(checker.filter(contacts, on_drop=lambda contact, detail: dropped.append((contact, detail))))
+    assert [contact['Email Contacto'] for contact in kept] == ['user0@good.example', 'user2@flaky.example',
+                                                               'user3@Good.example']
+    assert dropped == [(contacts[1], "Domain does not exist")]
+    assert sorted(resolver.calls) == ['flaky.example', 'good.example', 'typo.example']
+
+    # Unknown answers are not cached, missing ones for at most a day
+    with open(cache_file, encoding='utf-8') as f:
+        cache = json.load(f)
+    assert set(cache) == {'good.example', 'typo.example'}
+    assert cache['typo.example']['expires'] == 1000.0 + DomainChecker.MISSING_TTL
+
+    resolver.calls.clear()
+    checker = DomainChecker(cache_file, resolver=resolver, clock=lambda: 2000.0)
+    assert len(list(checker.filter(contacts))) == 3
+    assert resolver.calls == ['flaky.example']
+
+    checker = DomainChecker(cache_file, resolver=resolver, clock=lambda: 1000.0 + DomainChecker.MISSING_TTL + 1)
+    checker.check(['typo.example'])
+    assert 'typo.example' in resolver.calls
+
+
+def test_domain_checker_treats_resolver_errors_as_unknown():
+    def resolver(domain):
+        raise OSError("network down")
+    checker = DomainChecker(resolver=resolver)
+    assert checker.check(['mail.example']) == {'mail.example': ('unknown', "network down")}
+    assert checker.stats['unknown'] == 1
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+
+from execute import CampaignScheduler, SendWindows
+
+# 2024-01-05 is a Friday
+FRIDAY = datetime(2024, 1, 5)
+
+
+def at(day, hour, minute=0):
+    return FRIDAY.replace(day=day, hour=hour, minute=minute)
+
+
+def test_parse_days_and_times():
+    assert SendWindows.parse('mon-fri 09:00-18:00') == ({0, 1, 2, 3, 4}, 540, 1080)
+    assert SendWindows.parse('sat,sun 10:30-12:00') == ({5, 6}, 630, 720)
+    assert SendWindows.parse('fri-mon 22:00-02:00') == ({4, 5, 6, 0}, 1320, 120)
+    assert SendWindows.parse('08:00-24:00') == (set(range(7)), 480, 1440)
+
+
+@pytest.mark.parametrize('spec', ['mon-fri', 'funday 09:00-10:00', '09:00-09:00', '25:00-26:00', '09:75-10:00'])
+def test_parse_rejects_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        SendWindows.parse(spec)
+
+
+def test_no_windows_means_always_open():
+    windows = SendWindows()
+    assert windows.current(FRIDAY) == datetime.max
+    assert windows.next_start(FRIDAY) == FRIDAY
+    assert windows.describe() == "any time"
+
+
+def test_current_and_next_start_on_weekdays():
+    windows = SendWindows(['mon-fri 09:00-18:00'])
+    assert windows.current(at(5, 10)) == at(5, 18)
+    assert windows.current(at(5, 18)) is None
+    # Friday evening waits for Monday morning
+    assert windows.next_start(at(5, 19)) == at(8, 9)
+    assert windows.next_start(at(5, 8)) == at(5, 9)
+
+
+def test_window_past_midnight_and_merged_windows():
+    windows = SendWindows(['fri 22:00-02:00'])
+    assert windows.current(at(6, 1)) == at(6, 2)
+    assert windows.current(at(6, 3)) is None
+    windows = SendWindows(['09:00-12:00', '11:00-14:00'])
+    assert windows.current(at(5, 10)) == at(5, 14)
+
+
+def test_scheduler_resumes_quota_tomorrow():
+    config = {'send_windows': ['daily 08:00-20:00'], 'daily_quota': 100, 'schedule_state_file': None}
+    scheduler = CampaignScheduler(config, clock=lambda: at(5, 15))
+    assert scheduler.has_quota()
+    assert scheduler.resume_time(quota_reached=False) == at(5, 15)
+    assert scheduler.resume_time(quota_reached=True) == at(6, 8)
+    assert not CampaignScheduler({'senders': [{'sender_email': 'a@example.com'}]}).has_quota()
+    assert CampaignScheduler({'senders': [{'daily_quota': 5}]}).has_quota()
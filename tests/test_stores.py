@@ -0,0 +1,102 @@
+import sqlite3
+
+import pandas as pd
+
+from execute import FailureLog, SendJournal, SuppressionList
+
+
+def test_journal_states_and_resume_set(tmp_path):
+    with SendJournal(str(tmp_path / 'journal.db'), 'spring') as journal:
+        journal.record('Ana@Example.com ', 'queued')
+        journal.record('ana@example.com', 'sent', sender='news@example.com')
+        journal.record('ben@example.com', 'failed', '554 Blocked')
+        assert journal.sent_addresses() == {'ana@example.com'}
+        assert journal.counts() == {'sent': 1, 'failed': 1}
+    # Another campaign in the same file has its own rows
+    with SendJournal(str(tmp_path / 'journal.db'), 'autumn') as journal:
+        assert journal.sent_addresses() == set()
+        assert journal.mark_bounced(['ANA@example.com']) == 1
+    with SendJournal(str(tmp_path / 'journal.db'), 'spring') as journal:
+        assert journal.counts() == {'bounced': 1, 'failed': 1}
+        assert journal.sent_addresses() == {'ana@example.com'}
+
+
+def test_journal_rejects_unknown_state(tmp_path):
+    with SendJournal(str(tmp_path / 'journal.db')) as journal:
+        try:
+            journal.record('ana@example.com', 'delivered')
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected a ValueError")
+
+
+def test_sent_today_ignores_bounces_imported_today(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    with SendJournal(path) as journal:
+        journal.record('old@example.com', 'sent', sender='news@example.com')
+        journal.db.execute("UPDATE deliveries SET sent_at = '2020-01-01T10:00:00'")
+        journal.record('new@example.com', 'sent', sender='news@example.com')
+        journal.record('other@example.com', 'sent', sender='other@example.com')
+        assert journal.sent_today('News@example.com') == 1
+        # Importing an old bounce today must not charge it to today's quota
+        journal.mark_bounced(['old@example.com'])
+        assert journal.sent_today('news@example.com') == 1
+        journal.mark_bounced(['new@example.com'])
+        assert journal.sent_today('news@example.com') == 1
+
+
+def test_journal_upgrades_old_schema(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE deliveries (campaign TEXT NOT NULL, email TEXT NOT NULL, state TEXT NOT NULL, "
+               "detail TEXT, updated_at TEXT NOT NULL, PRIMARY KEY (campaign, email))")
+    db.execute("INSERT INTO deliveries VALUES ('default', 'ana@example.com', 'sent', NULL, '2099-01-01T10:00:00')")
+    db.commit()
+    db.close()
+    with SendJournal(path) as journal:
+        assert journal.sent_addresses() == {'ana@example.com'}
+        (sent_at,) = journal.db.execute("SELECT sent_at FROM deliveries").fetchone()
+        assert sent_at == '2099-01-01T10:00:00'
+
+
+def test_suppression_list_persists(tmp_path):
+    path = str(tmp_path / 'suppression.db')
+    with SuppressionList(path) as suppression:
+        assert suppression.add(['Ana@example.com', 'ben@example.com'], 'bounce', 'mbox') == 2
+        assert suppression.add(['ana@example.com'], 'rejected') == 0
+        assert 'ANA@EXAMPLE.COM ' in suppression
+    with SuppressionList(path) as suppression:
+        assert len(suppression) == 2
+        assert suppression.reasons() == {'bounce': 2}
+        assert suppression.remove(['ben@example.com', 'nobody@example.com']) == 1
+        assert 'ben@example.com' not in suppression
+    with SuppressionList(path) as suppression:
+        assert len(suppression) == 1
+
+
+def test_failure_log_starts_fresh_unless_appending(tmp_path):
+    path = str(tmp_path / 'failed.csv')
+    log = FailureLog(path, ['Email Contacto', 'Error'])
+    assert not log.exists()
+    log.write({'Email Contacto': 'ana@example.com', 'Error': 'x', 'Ignored': 1})
+    log.close()
+    log = FailureLog(path, ['Email Contacto', 'Error'], append=True)
+    log.write({'Email Contacto': 'ben@example.com', 'Error': float('nan')})
+    log.close()
+    assert log.read().to_dict('records') == [{'Email Contacto': 'ana@example.com', 'Error': 'x'},
+                                             {'Email Contacto': 'ben@example.com', 'Error': ''}]
+    assert not FailureLog(path, ['Email Contacto', 'Error']).exists()
+
+
+def test_failure_log_prune(tmp_path):
+    for name in ('failed.csv', 'failed.jsonl'):
+        log = FailureLog(str(tmp_path / name), ['Email Contacto', 'Error'])
+        log.write_many([{'Email Contacto': 'ana@example.com', 'Error': 'first run'},
+                        {'Email Contacto': 'ben@example.com', 'Error': 'first run'},
+                        {'Email Contacto': 'Ana@example.com', 'Error': 'second run'}])
+        assert log.prune(delivered={'ben@example.com'}) == 1
+        assert log.read().to_dict('records') == [{'Email Contacto': 'Ana@example.com', 'Error': 'second run'}]
+        assert log.prune(delivered={'ana@example.com'}) == 0
+        assert not log.exists()
+        assert isinstance(log.read(), pd.DataFrame)
@@ -0,0 +1,81 @@
+import email
+import email.policy
+
+from execute import CompiledTemplate, MessageBuilder, TemplateBuild, html_to_text, inline_css, minify_html
+
+
+def test_html_to_text_blocks_and_links():
+    html_text = ('<html><head><title>T</title><style>p {color: red}</style></head><body>'
+                 '<h1>Hola</h1><p>Visit <a href="https://example.com">our site</a> or '
+                 '<a href="mailto:info@example.com">write to us</a>.</p>'
+                 '<ul><li>one</li><li>two</li></ul><!-- note --></body></html>')
+    assert html_to_text(html_text) == ("Hola\n\nVisit our site (https://example.com) or write to us.\n\n"
+                                       "- one\n- two\n")
+
+
+def test_html_to_text_gt_inside_quoted_attributes():
+    html_text = ('<body class="a>b"><p data-x="a>b">Hola</p>'
+                 '<a title="1>0" data-href="x" href="https://example.com">Go <b data-y="q>">here</b></a>'
+                 '<ul><li data-z="c>d">one</li></ul></body>')
+    assert html_to_text(html_text) == "Hola\n\nGo here (https://example.com)\n\n- one\n"
+
+
+def test_compiled_template_placeholders_defaults_and_escaping():
+    template = CompiledTemplate("Hola {{name}} de {{Nombre Empresa|su empresa}} ({{ Cargo }}) {{sender_name}}")
+    assert template.placeholders == ['name', 'Nombre Empresa', 'Cargo', 'sender_name']
+    assert template.missing_placeholders(['Nombre Contacto'], {'sender_name': 'Ana'}) == ['Cargo']
+    contact = {'Nombre Contacto': 'Ben & Co', 'Nombre Empresa': float('nan'), 'Cargo': 42.0}
+    assert template.render(contact, {'sender_name': 'Ana'}) == "Hola Ben &amp; Co de su empresa (42) Ana"
+    assert CompiledTemplate("{{name}}", escape=False).render({'Nombre Contacto': 'Ben & Co'}) == "Ben & Co"
+
+
+def test_inline_css_and_minify():
+    source = ('<html><head><style>p {color: red} .big {font-size: 20px} a:hover {color: blue}</style></head>'
+              '<body>\n  <p class="big" data-x="a>b" style="margin: 0">Hola</p>\n  <!-- gone -->\n</body></html>')
+    html_text = minify_html(inline_css(source))
+    assert '<p class="big" data-x="a>b" style="color:red;font-size:20px;margin:0">Hola</p>' in html_text
+    assert '<style>a:hover {color: blue}</style></head>' in html_text
+    assert 'gone' not in html_text and '\n' not in html_text
+
+
+def test_template_build_keeps_placeholders():
+    build = TemplateBuild.get('<style>p {color: red}</style><p>Hola {{name}}</p>')
+    assert build.html == '<p style="color:red">Hola {{name}}</p>'
+    assert build.text == "Hola {{name}}\n"
+    assert TemplateBuild.get('<style>p {color: red}</style><p>Hola {{name}}</p>') is build
+
+
+def parse(raw):
+    return email.message_from_bytes(raw, policy=email.policy.default)
+
+
+def test_message_builder_personalized():
+    builder = MessageBuilder('news@example.com', 'Ñandú News', CompiledTemplate('<p>Hola {{name}} ✓</p>'),
+                             CompiledTemplate('Para {{company}}', escape=False),
+                             text_template=CompiledTemplate('Hola {{name}}', escape=False))
+    assert not builder.shared
+    message = parse(builder.render({'Nombre Contacto': 'Ana', 'Nombre Empresa': 'Acme'}, 'ana@example.com'))
+    assert message['Subject'] == 'Para Acme'
+    assert message['To'] == 'ana@example.com'
+    assert message['From'].addresses[0].display_name == 'Ñandú News'
+    text, html_part = message.get_payload()
+    assert text.get_content_type() == 'text/plain' and text.get_content() == 'Hola Ana'
+    assert html_part['Content-Transfer-Encoding'] == 'quoted-printable'
+    assert html_part.get_content() == '<p>Hola Ana ✓</p>'
+
+
+def test_message_builder_shared_message():
+    builder = MessageBuilder('news@example.com', 'News', CompiledTemplate('<p>Hola</p>'),
+                             CompiledTemplate('Novedades', escape=False))
+    assert builder.shared
+    message = parse(builder.render_shared())
+    assert message['To'] == 'undisclosed-recipients:;'
+    assert message.get_payload()[0].get_content() == '<p>Hola</p>'
+
+
+def test_header_injection_is_folded_away():
+    builder = MessageBuilder('news@example.com', 'News', CompiledTemplate('<p>x</p>'),
+                             CompiledTemplate('{{name}}', escape=False))
+    message = parse(builder.render({'Nombre Contacto': 'Ana\r\nBcc: victim@example.com'}, 'ana@example.com'))
+    assert message['Bcc'] is None
+    assert message['Subject'] == 'Ana Bcc: victim@example.com'